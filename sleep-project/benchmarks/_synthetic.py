@@ -0,0 +1,52 @@
+"""
+Synthetic SpO2 recordings for the benchmarks.
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+def synthetic_spo2(seconds: int, frequency: int = 1, seed: int = 0) -> np.ndarray:
+    """
+    Night-like SpO2 at `frequency` Hz: a slow random walk around 95 %, desaturation dips
+    every few minutes, sensor dropouts to 0 and a few out-of-range spikes.
+    """
+    rng = np.random.default_rng(seed)
+    n = seconds * frequency
+    baseline = 95 + np.cumsum(rng.normal(0, 0.02, n)).clip(-4, 3)
+    t = np.arange(n) / frequency
+    dips = np.zeros(n)
+    for start in rng.uniform(0, seconds, seconds // 240):
+        width = rng.uniform(20, 60)
+        dips -= rng.uniform(3, 10) * np.exp(-0.5 * ((t - start) / width) ** 2)
+    spo2 = np.round(baseline + dips + rng.normal(0, 0.3, n)).clip(60, 100)
+    for start in rng.integers(0, n, 5):
+        spo2[start:start + 30 * frequency] = 0
+    spo2[rng.integers(0, n, 20)] = 120
+    return spo2
+
+def write_edf(path: str, spo2: np.ndarray, frequency: int) -> str:
+    """Single-channel EDF (SaO2, 1 s data records, full int16 digital range over 0..127 %)"""
+    digital_min, digital_max, physical_min, physical_max = -32768, 32767, 0.0, 127.0
+    n_records = len(spo2) // frequency
+    digital = np.round((spo2[:n_records * frequency] - physical_min) * (digital_max - digital_min) / (physical_max - physical_min) + digital_min)
+    def field(value, width):
+        return str(value).ljust(width)[:width].encode("latin-1")
+    header = b"".join([
+        field(0, 8), field("X X X X", 80), field("Startdate 01-JAN-2000 X X X", 80), field("01.01.00", 8), field("00.00.00", 8),
+        field(512, 8), field("", 44), field(n_records, 8), field(1, 8), field(1, 4),
+        field("SaO2", 16), field("", 80), field("%", 8), field(physical_min, 8), field(physical_max, 8),
+        field(digital_min, 8), field(digital_max, 8), field("", 80), field(frequency, 8), field("", 32),
+    ])
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(digital.clip(digital_min, digital_max).astype("<i2").tobytes())
+    return path
+
+def write_cleaned(path: str, spo2: np.ndarray) -> str:
+    """`<name>_cleaned.parquet` as written by Run.clean_signal"""
+    pd.DataFrame({"time": range(len(spo2)), "SaO2": spo2}).set_index("time").to_parquet(path)
+    return path
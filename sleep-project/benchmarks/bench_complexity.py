@@ -0,0 +1,42 @@
+"""
+Complexity features (feature_kernels.complexity_measures) vs pobm's ComplexityMeasures.compute.
+
+Times both on cleaned-like 1 Hz signals of each `--lengths` and reports the largest relative
+difference of any of ApEn, LZ, CTM, SampEn and DFA. pobm is quadratic in the length (about
+400 s for a 7 h night of 25,200 samples), so the default lengths are short.
+
+    python benchmarks/bench_complexity.py --lengths 1000 3000 25200
+"""
+
+import argparse
+import time
+import numpy as np
+from pobm.obm.complex import ComplexityMeasures
+from _synthetic import synthetic_spo2
+from sleepdataspo2.feature_kernels import complexity_measures
+
+FIELDS = ("ApEn", "LZ", "CTM", "SampEn", "DFA")
+PARAMETERS = dict(CTM_Threshold=0.25, DFA_Window=20, M_Sampen=3, R_Sampen=0.2, M_ApEn=2, R_ApEn=0.25)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[1000, 3000], help="signal lengths in samples (seconds)")
+    args = parser.parse_args()
+
+    print(f"{'samples':>8}{'pobm s':>10}{'kernel s':>10}{'speedup':>10}{'max rel diff':>14}")
+    for length in args.lengths:
+        # cleaned signals have no dropouts or out-of-range values
+        signal = synthetic_spo2(length, seed=length).clip(70, 100)
+
+        start = time.perf_counter()
+        expected = ComplexityMeasures(**PARAMETERS).compute(signal)
+        pobm_time = time.perf_counter() - start
+        start = time.perf_counter()
+        result = complexity_measures(signal, **PARAMETERS)
+        kernel_time = time.perf_counter() - start
+
+        differences = [abs(getattr(result, field) - getattr(expected, field)) / max(abs(getattr(expected, field)), 1e-12) for field in FIELDS]
+        print(f"{length:>8}{pobm_time:>10.2f}{kernel_time:>10.3f}{pobm_time / kernel_time:>9.0f}x{max(differences):>14.1e}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Delta filter (CleanFeaturesInterface.dfilter) vs the original per-sample loop.
+
+Times both on synthetic 10 h signals at each `--frequencies` rate and checks that they
+return the same samples.
+
+    python benchmarks/bench_dfilter.py --frequencies 1 16 128 256
+"""
+
+import argparse
+import time
+import numpy as np
+from _synthetic import synthetic_spo2
+from sleepdataspo2.clean_features import CleanSpO2
+
+def dfilter_loop(signal, Diff=4):
+    """The delta filter as the original per-sample loop"""
+    signal_filtered = []
+    for i, data in enumerate(signal):
+        if i == 0:
+            signal_filtered.append(data)
+        else:
+            if (((signal_filtered[-1] - data) / signal_filtered[-1]) * 100) < Diff:
+                signal_filtered.append(data)
+    return np.array(signal_filtered)
+
+def best_of(repeat, func, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=10, help="length of each signal")
+    parser.add_argument("--frequencies", type=int, nargs="+", default=[1, 16, 128, 256], help="sampling frequencies in Hz")
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs")
+    args = parser.parse_args()
+
+    cleaner = CleanSpO2()
+    print(f"{args.hours} h signals, best of {args.repeat}")
+    print(f"{'Hz':>5}{'samples':>12}{'loop s':>10}{'dfilter s':>11}{'speedup':>9}")
+    for frequency in args.frequencies:
+        signal = synthetic_spo2(int(args.hours * 3600), frequency)
+        signal[::997] = np.nan
+        with np.errstate(divide="ignore", invalid="ignore"):
+            loop_time, expected = best_of(args.repeat, dfilter_loop, signal, 4)
+        new_time, result = best_of(args.repeat, cleaner.dfilter, signal, 4)
+        np.testing.assert_array_equal(result, expected)
+        print(f"{frequency:>5}{signal.shape[0]:>12}{loop_time:>10.3f}{new_time:>11.4f}{loop_time / new_time:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Throughput of DownloaderNSRR with one session per file vs one pooled session (pool_size).
+
+Serves `--files` synthetic EDFs from a local keep-alive HTTP server standing in for sleepdata.org
+and downloads them with `--threads` workers, as run_downloader_parallel does. The server counts
+the TCP connections it accepts: one per file without the pool, at most `--threads` with it.
+
+    python benchmarks/bench_download_session.py --files 300 --threads 8
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from sleepdataspo2.download_data import DownloaderNSRR
+
+class MirrorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, payload: bytes):
+        super().__init__(("127.0.0.1", 0), MirrorHandler)
+        self.payload = payload
+        self.connections = 0
+        self._count_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._count_lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+class MirrorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_GET(self):
+        payload = self.server.payload
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+def run(downloader: DownloaderNSRR, server: MirrorServer, files: int, threads: int, download_to: str):
+    os.makedirs(f"{download_to}/bench/edfs", exist_ok=True)
+    server.connections = 0
+    start = time.perf_counter()
+    # tqdm bars and "[✔] Downloaded" lines would dominate the output
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(
+                lambda i: downloader.download(dataset="bench", file_name=f"bench-{i}", token="token", download_from="edfs", download_to=download_to),
+                range(files),
+            ))
+    elapsed = time.perf_counter() - start
+    assert all(result == len(server.payload) for result in results), "a download failed"
+    return elapsed, server.connections
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=300, help="number of files to download")
+    parser.add_argument("--threads", type=int, default=8, help="download workers (max_threads)")
+    parser.add_argument("--size", type=int, default=256 * 2**10, help="bytes per file")
+    args = parser.parse_args()
+
+    server = MirrorServer(os.urandom(args.size))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"{args.files} files of {args.size} bytes, {args.threads} threads")
+    print(f"{'mode':<20}{'seconds':>10}{'files/s':>10}{'MB/s':>10}{'connections':>14}")
+    with tempfile.TemporaryDirectory() as download_to:
+        for mode, downloader in [
+            ("session per file", DownloaderNSRR(base_url=base_url)),
+            ("pooled session", DownloaderNSRR(pool_size=args.threads, base_url=base_url)),
+        ]:
+            elapsed, connections = run(downloader, server, args.files, args.threads, download_to)
+            print(f"{mode:<20}{elapsed:>10.2f}{args.files / elapsed:>10.1f}{args.files * args.size / elapsed / 1e6:>10.1f}{connections:>14}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Latency of EngineerOdi.compute_single for one recording, sequential vs feature families on a pool.
+
+Times one cleaned-like night sequentially and with `--family_workers` threads and processes
+(-fw / -fp), with and without complexity features, and checks that every mode returns the
+same features. Then times each producer of the default feature set on its own (including
+the producers it depends on), which bounds the latency a pool can reach.
+
+    python benchmarks/bench_family_latency.py --family_workers 6
+"""
+
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+import pandas as pd
+from _synthetic import synthetic_spo2
+from sleepdataspo2 import CLEANED_SIGNAL_LENGTH
+from sleepdataspo2.engineer_features import EngineerOdi, ODI_FEATURES, DEFAULT_COMPLEX_FEATURES
+
+def best_of(repeat, func):
+    times = []
+    for _ in range(repeat):
+        # the registry prints a debug line per family
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - start)
+    return min(times), result
+
+def same(a: dict, b: dict) -> bool:
+    return list(a) == list(b) and all(np.array_equal(a[k], b[k], equal_nan=True) for k in a)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--family_workers", type=int, default=6, help="pool size of the concurrent modes")
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs")
+    args = parser.parse_args()
+
+    spo2 = pd.Series(synthetic_spo2(CLEANED_SIGNAL_LENGTH).clip(70, 100))
+    modes = [
+        ("sequential", EngineerOdi()),
+        (f"{args.family_workers} threads", EngineerOdi(family_workers=args.family_workers)),
+        (f"{args.family_workers} processes", EngineerOdi(family_workers=args.family_workers, family_processes=True)),
+    ]
+    print(f"one {len(spo2)}-sample night, best of {args.repeat}")
+    print(f"{'mode':<16}{'without -c':>12}{'with -c':>10}")
+    reference = {}
+    for mode, engineer in modes:
+        row = f"{mode:<16}"
+        for complex_features in (False, True):
+            elapsed, features = best_of(args.repeat, lambda: engineer.compute_single(spo2, complex_features=complex_features))
+            reference.setdefault(complex_features, features)
+            assert same(features, reference[complex_features]), f"{mode} features differ from sequential"
+            row += f"{elapsed:>11.3f}s" if not complex_features else f"{elapsed:>9.3f}s"
+        print(row)
+
+    print(f"\n{'producer':<20}{'seconds':>10}")
+    names = DEFAULT_COMPLEX_FEATURES
+    for producer in ODI_FEATURES.producers_for(names):
+        producer_names = [name for name in ODI_FEATURES.names([producer]) if name in names]
+        if not producer_names:
+            continue
+        elapsed, _ = best_of(args.repeat, lambda: ODI_FEATURES.compute(spo2, producer_names))
+        print(f"{producer:<20}{elapsed:>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Thread vs process scaling of run_cleaner_parallel and run_engineer_parallel (Run(processes=...)).
+
+Writes `--recordings` synthetic 8 h EDFs, then for every worker count cleans them and engineers
+their features with a ThreadPoolExecutor and with the process pool. Speedup is relative to one
+thread; the pobm filters and measures hold the GIL, so threads stay near 1x while processes
+follow the core count.
+
+    python benchmarks/bench_process_scaling.py --recordings 16 --workers 1 2 4 8
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import os
+import shutil
+import tempfile
+import time
+import matplotlib
+matplotlib.use("Agg")
+from _synthetic import synthetic_spo2, write_edf
+from sleepdataspo2.run_pipeline_modified import *
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recordings", type=int, default=16, help="number of synthetic recordings")
+    parser.add_argument("--hours", type=float, default=8, help="length of each recording")
+    parser.add_argument("--frequency", type=int, default=1, help="sampling frequency of the raw SpO2 in Hz")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}), help="worker counts (max_threads)")
+    args = parser.parse_args()
+
+    print(f"{args.recordings} recordings of {args.hours} h at {args.frequency} Hz, {os.cpu_count()} CPUs")
+    print(f"{'stage':<10}{'backend':<10}{'workers':>8}{'seconds':>10}{'rec/s':>8}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as root:
+        edfs = f"{root}/edfs/bench/edfs"
+        os.makedirs(edfs)
+        names = [f"bench-{i}" for i in range(args.recordings)]
+        for i, name in enumerate(names):
+            write_edf(f"{edfs}/{name}.edf", synthetic_spo2(int(args.hours * 3600), args.frequency, seed=i), args.frequency)
+
+        baseline = {}
+        for workers in args.workers:
+            for backend in ("threads", "processes"):
+                run = Run(
+                    reader=DataLoader(PandasDataLoader()),
+                    cleaner=CleanFeatures(CleanSpO2()),
+                    plotter=PlotGraphs(PlotGraphsNSRR()),
+                    engineer=EngineerFeatures(EngineerOdi()),
+                    processes=backend == "processes",
+                )
+                out = f"{root}/out"
+                shutil.rmtree(out, ignore_errors=True)
+                os.makedirs(f"{out}/bench/edfs")
+                for name in names:
+                    os.symlink(f"{edfs}/{name}.edf", f"{out}/bench/edfs/{name}.edf")
+
+                for stage, step in [
+                    ("clean", lambda: run.run_cleaner_parallel("bench", names, "edfs", out, "SaO2", workers)),
+                    ("engineer", lambda: run.run_engineer_parallel("bench", names, "edfs", out, "SaO2", False, workers)),
+                ]:
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                        step()
+                    elapsed = time.perf_counter() - start
+                    # errors are only printed by the runners, so check that every recording went through
+                    if stage == "clean":
+                        assert all(os.path.exists(f"{out}/bench/edfs/{name}_cleaned.parquet") for name in names), "cleaning failed"
+                    else:
+                        assert sum(len(pd.read_csv(csv)) for csv in glob.glob(f"{out}/bench/edfs/extracted_*_features.csv")) == len(names), "engineering failed"
+                    baseline.setdefault(stage, elapsed)
+                    print(f"{stage:<10}{backend:<10}{workers:>8}{elapsed:>10.2f}{args.recordings / elapsed:>8.2f}{baseline[stage] / elapsed:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
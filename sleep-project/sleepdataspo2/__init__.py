@@ -1,3 +1,3 @@
-from sleepdataspo2.constants import BASE_URL, MAX_RETRIES
+from sleepdataspo2.constants import BASE_URL, MAX_RETRIES, CLEANED_SIGNAL_LENGTH, SPO2_CHANNEL_NAMES, MIN_RECORDING_DURATION
 
-__all__ = ["BASE_URL", "MAX_RETRIES"]
+__all__ = ["BASE_URL", "MAX_RETRIES", "CLEANED_SIGNAL_LENGTH", "SPO2_CHANNEL_NAMES", "MIN_RECORDING_DURATION"]
@@ -0,0 +1,107 @@
+"""
+Author: Eshan Jayasundara
+Co-Author 1: 
+Co-Author 2:
+Last Modified: 2025/06/29 by Eshan Jayasundara
+"""
+
+from sleepdataspo2.run_pipeline_modified import *
+from dotenv import load_dotenv, find_dotenv
+import argparse
+import os
+
+def main():
+    load_dotenv(dotenv_path=os.path.join(os.getcwd(), ".env"))
+
+    parser = argparse.ArgumentParser(description="Parse your arguments here to import cleaned signals into the memory-mapped cache")
+
+    # Add arguments
+    parser.add_argument(
+        "-d", "--dataset",             # argument flag
+        type=str,             # type of argument
+        required=True,      # required
+        help="short name of the dataset in sleepdata.org"  # help message
+    )
+
+    parser.add_argument(
+        "-p", "--prefix",             # argument flag
+        type=str,             # type of argument
+        required=True,      # required
+        help="prefix before the id of the edf file"  # help message
+    )
+
+    parser.add_argument(
+        "-df", "--download_from",             # argument flag
+        type=str,             # type of argument
+        required=True,      # required
+        help="file path in the nsrr web site"  # help message
+    )
+
+    parser.add_argument(
+        "-dt", "--download_to",             # argument flag
+        type=str,             # type of argument
+        required=True,      # required
+        help="file path where to download in the local machine"  # help message
+    )
+
+    parser.add_argument(
+        "-s", "--start",     # short and long option
+        type=int,
+        required=False,
+        default=None,
+        help="An integer argument for initial file to bedownloaded. Use when --list is not provided"
+    )
+
+    parser.add_argument(
+        "-e", "--end",     # short and long option
+        type=int,
+        required=False,
+        default=None,
+        help="An integer argument for initial file to be downloaded. Use when --list is not provided"
+    )
+
+    parser.add_argument(
+        "-l", "--list",     # short and long option
+        type=str,
+        required=False,
+        default=None,
+        help="String of list of integers indicating set of files each seperated by an space"
+    )
+
+    # Parse the command line arguments
+    args = parser.parse_args()
+    # Args validation
+    if args.start != None and args.end != None and args.list != None:
+        raise ValueError("one of '--start and --end' or --list should be provided")
+    elif args.start != None and args.end == None and args.list != None:
+        raise ValueError("one of '--start and --end' or --list should be provided")
+    elif args.start != None and args.end == None and args.list == None:
+        raise ValueError("one of '--start and --end' or --list should be provided")
+    elif args.start == None and args.end != None and args.list != None:
+        raise ValueError("one of '--start and --end' or --list should be provided")
+    elif args.start == None and args.end != None and args.list == None:
+        raise ValueError("one of '--start and --end' or --list should be provided")
+    elif args.start == None and args.end == None and args.list == None:
+        raise ValueError("one of '--start and --end' or --list should be provided")
+    
+    signal_cache = SignalCache(MemmapSignalCache())
+
+    if args.list:
+        range_list = args.list.split(" ")
+    else:
+        range_list = range(args.start, args.end+1)
+
+    files_to_cache = []
+    for i in range_list:
+        files_to_cache.append(f"{args.prefix}-{i}")
+
+    print(files_to_cache)
+
+    imported = signal_cache.import_parquet(
+        path=f"{args.download_to}/{args.dataset}/{args.download_from}",
+        names=files_to_cache,
+        )
+    print(f"[✔] Imported {len(imported)}/{len(files_to_cache)} cleaned signals into the memory-mapped cache")
+
+if __name__ == "__main__":
+    main()
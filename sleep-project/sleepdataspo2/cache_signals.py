@@ -0,0 +1,130 @@
+"""
+Author: Eshan Jayasundara
+Co-Author 1: 
+Co-Author 2:
+Last Modified: 2025/06/29 by Eshan Jayasundara
+"""
+
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+import numpy as np
+import json
+import os
+from filelock import FileLock
+from sleepdataspo2 import CLEANED_SIGNAL_LENGTH
+from sleepdataspo2.load_data import *
+
+class SignalCacheInterface(ABC):
+    @abstractmethod
+    def write(self, path: str, name: str, signal: np.ndarray) -> None:
+        pass
+    @abstractmethod
+    def read(self, path: str, name: str) -> np.ndarray:
+        pass
+    @abstractmethod
+    def contains(self, path: str, name: str) -> bool:
+        pass
+    @abstractmethod
+    def read_all(self, path: str) -> Tuple[np.ndarray, List[str]]:
+        pass
+    @abstractmethod
+    def import_parquet(self, path: str, names: List[str]) -> List[str]:
+        pass
+
+class MemmapSignalCache(SignalCacheInterface):
+    """
+    Cleaned signals of one dataset directory stored as rows of a single float32 file.
+
+    `{path}/cleaned_signals.f32` holds an (N x length) row-major float32 array and
+    `{path}/cleaned_signals.json` maps each recording name to its row. Reads are
+    memory-mapped, so opening one recording or the whole matrix copies nothing.
+    """
+    def __init__(self, length: int=CLEANED_SIGNAL_LENGTH, reader: DataLoader=None):
+        self._length = length
+        self._reader = reader if reader is not None else DataLoader(PandasDataLoader())
+
+    def _data_path(self, path: str) -> str:
+        return f"{path}/cleaned_signals.f32"
+
+    def _index_path(self, path: str) -> str:
+        return f"{path}/cleaned_signals.json"
+
+    def _load_index(self, path: str) -> dict:
+        index_path = self._index_path(path)
+        if not os.path.exists(index_path):
+            return {"length": self._length, "dtype": "float32", "rows": {}}
+        with open(index_path) as f:
+            index = json.load(f)
+        if index["length"] != self._length:
+            raise ValueError(f"Cache {index_path} holds signals of length {index['length']}, expected {self._length}")
+        return index
+
+    def _open(self, path: str, n_rows: int) -> np.memmap:
+        return np.memmap(self._data_path(path), dtype=np.float32, mode="r", shape=(n_rows, self._length))
+
+    def write(self, path: str, name: str, signal: np.ndarray) -> None:
+        signal = np.asarray(signal, dtype=np.float32)
+        if signal.shape != (self._length,):
+            raise ValueError(f"Signal {name} has shape {signal.shape}, expected ({self._length},)")
+        os.makedirs(path, exist_ok=True)
+        with FileLock(self._index_path(path) + ".lock", timeout=180):
+            index = self._load_index(path)
+            row = index["rows"].get(name, len(index["rows"]))
+            mode = "r+b" if os.path.exists(self._data_path(path)) else "wb"
+            with open(self._data_path(path), mode) as f:
+                f.seek(row * self._length * signal.itemsize)
+                f.write(signal.tobytes())
+            index["rows"][name] = row
+            # readers never see a half-written index
+            tmp_path = self._index_path(path) + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self._index_path(path))
+        print(f"[✔] Cached: {name} -> {self._data_path(path)}[{row}]")
+
+    def read(self, path: str, name: str) -> np.ndarray:
+        index = self._load_index(path)
+        if name not in index["rows"]:
+            raise KeyError(f"{name} is not cached in {self._data_path(path)}")
+        return self._open(path, len(index["rows"]))[index["rows"][name]]
+
+    def contains(self, path: str, name: str) -> bool:
+        return name in self._load_index(path)["rows"]
+
+    def read_all(self, path: str) -> Tuple[np.ndarray, List[str]]:
+        index = self._load_index(path)
+        names = sorted(index["rows"], key=index["rows"].get)
+        if not names:
+            return np.empty((0, self._length), dtype=np.float32), []
+        return self._open(path, len(names)), names
+
+    def import_parquet(self, path: str, names: List[str]) -> List[str]:
+        imported = []
+        for name in names:
+            file_path = f"{path}/{name}_cleaned.parquet"
+            if not os.path.exists(file_path):
+                print(f"[✘] Path does not exists: {file_path}")
+                continue
+            df = self._reader.read_parquet(file_path=file_path)
+            self.write(path, name, df[df.columns[0]].to_numpy())
+            imported.append(name)
+        return imported
+
+class SignalCache(SignalCacheInterface):
+    def __init__(self, signal_cache: SignalCacheInterface):
+        self._signal_cache = signal_cache
+
+    def write(self, path: str, name: str, signal: np.ndarray) -> None:
+        return self._signal_cache.write(path, name, signal)
+
+    def read(self, path: str, name: str) -> np.ndarray:
+        return self._signal_cache.read(path, name)
+
+    def contains(self, path: str, name: str) -> bool:
+        return self._signal_cache.contains(path, name)
+
+    def read_all(self, path: str) -> Tuple[np.ndarray, List[str]]:
+        return self._signal_cache.read_all(path)
+
+    def import_parquet(self, path: str, names: List[str]) -> List[str]:
+        return self._signal_cache.import_parquet(path, names)
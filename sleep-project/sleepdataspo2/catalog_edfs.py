@@ -0,0 +1,115 @@
+"""
+Author: Eshan Jayasundara
+Co-Author 1: 
+Co-Author 2:
+Last Modified: 2025/06/29 by Eshan Jayasundara
+"""
+
+from abc import ABC, abstractmethod
+from typing import List
+import pandas as pd
+import os
+from filelock import FileLock
+from sleepdataspo2 import SPO2_CHANNEL_NAMES, MIN_RECORDING_DURATION
+from sleepdataspo2.load_data import *
+
+class EdfCatalogInterface(ABC):
+    @abstractmethod
+    def build(self, path: str) -> pd.DataFrame:
+        pass
+    @abstractmethod
+    def load(self, path: str) -> pd.DataFrame:
+        pass
+    @abstractmethod
+    def select(self, path: str, file_names: List[str], min_duration: float) -> List[str]:
+        pass
+
+class ParquetEdfCatalog(EdfCatalogInterface):
+    """
+    Header-only index of the EDF files in one dataset directory, kept in `{path}/edf_catalog.parquet`.
+
+    One row per (file, channel) with the channel's sampling frequency and the file's record
+    layout. Files whose size and modification time are unchanged are not re-read on rebuild.
+    """
+    columns = ["name", "channel", "sampling_frequency", "n_records", "record_duration", "duration", "size", "mtime"]
+
+    def __init__(self, reader: DataLoader=None):
+        self._reader = reader if reader is not None else DataLoader(PandasDataLoader())
+
+    def _catalog_path(self, path: str) -> str:
+        return f"{path}/edf_catalog.parquet"
+
+    def load(self, path: str) -> pd.DataFrame:
+        if not os.path.exists(self._catalog_path(path)):
+            return pd.DataFrame(columns=self.columns)
+        return self._reader.read_parquet(file_path=self._catalog_path(path))
+
+    def build(self, path: str) -> pd.DataFrame:
+        with FileLock(self._catalog_path(path) + ".lock", timeout=180):
+            previous = self.load(path)
+            known = {
+                name: (group["size"].iloc[0], group["mtime"].iloc[0])
+                for name, group in previous.groupby("name")
+            }
+            frames = []
+            seen = set()
+            for file_name in sorted(os.listdir(path)):
+                if not file_name.endswith(".edf"):
+                    continue
+                name = file_name[:-len(".edf")]
+                stat = os.stat(f"{path}/{file_name}")
+                seen.add(name)
+                if known.get(name) == (stat.st_size, stat.st_mtime):
+                    frames.append(previous[previous["name"] == name])
+                    continue
+                try:
+                    header = self._reader.read_edf_header(file_path=f"{path}/{file_name}")
+                except Exception as e:
+                    print(f"[✘] Could not read EDF header: {path}/{file_name}", e)
+                    continue
+                frames.append(pd.DataFrame({
+                    "name": name,
+                    "channel": [signal["label"] for signal in header["signals"]],
+                    "sampling_frequency": [signal["sampling_frequency"] for signal in header["signals"]],
+                    "n_records": header["n_records"],
+                    "record_duration": header["record_duration"],
+                    "duration": header["duration"],
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                }, columns=self.columns))
+            catalog = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=self.columns)
+            catalog.to_parquet(path=self._catalog_path(path))
+        print(f"[✔] Catalogued {len(seen)} EDF files: {self._catalog_path(path)}")
+        return catalog
+
+    def select(self, path: str, file_names: List[str], min_duration: float=MIN_RECORDING_DURATION) -> List[str]:
+        """
+        Keep only the recordings that are long enough and have a known SpO2 channel.
+
+        Files missing from the catalog are kept, so they are still judged by the cleaner.
+        """
+        catalog = self.load(path)
+        catalogued = set(catalog["name"])
+        usable = set(catalog[
+            catalog["channel"].isin(SPO2_CHANNEL_NAMES) & (catalog["duration"] >= min_duration)
+        ]["name"])
+        selected = []
+        for file_name in file_names:
+            if file_name in catalogued and file_name not in usable:
+                print(f"[✘] Skipped by catalog (too short or no SpO2 channel): {file_name}")
+                continue
+            selected.append(file_name)
+        return selected
+
+class EdfCatalog(EdfCatalogInterface):
+    def __init__(self, edf_catalog: EdfCatalogInterface):
+        self._edf_catalog = edf_catalog
+
+    def build(self, path: str) -> pd.DataFrame:
+        return self._edf_catalog.build(path)
+
+    def load(self, path: str) -> pd.DataFrame:
+        return self._edf_catalog.load(path)
+
+    def select(self, path: str, file_names: List[str], min_duration: float=MIN_RECORDING_DURATION) -> List[str]:
+        return self._edf_catalog.select(path, file_names, min_duration)
@@ -85,6 +85,46 @@ def main():
         help="Number of maximum threds to speedup downlods"
     )
 
+    parser.add_argument(
+        "-mc", "--memmap_cache",
+        type=bool,
+        required=False,
+        default=False,
+        help="Whether to keep cleaned signals in one memory-mapped file per dataset instead of per-file parquet"
+    )
+
+    parser.add_argument(
+        "-cat", "--catalog",
+        type=bool,
+        required=False,
+        default=False,
+        help="Whether to skip too short or SpO2-less recordings using an index of the EDF headers"
+    )
+
+    parser.add_argument(
+        "-mp", "--multiprocessing",
+        type=bool,
+        required=False,
+        default=False,
+        help="Whether to clean and engineer in worker processes (--max_threads of them) instead of threads"
+    )
+
+    parser.add_argument(
+        "-cc", "--cleaned_cache",
+        type=str,
+        required=False,
+        default=None,
+        help="Directory of a cache of cleaned signals keyed by the raw signal and cleaning parameters, so re-runs only clean what changed"
+    )
+
+    parser.add_argument(
+        "-ccs", "--cleaned_cache_max_bytes",
+        type=int,
+        required=False,
+        default=10 * 2**30,
+        help="Size limit of --cleaned_cache in bytes, least recently used entries are evicted beyond it"
+    )
+
     # Parse the command line arguments
     args = parser.parse_args()
     # Args validation
@@ -105,6 +145,10 @@ def main():
         reader=DataLoader(PandasDataLoader()),
         cleaner=CleanFeatures(CleanSpO2()),
         plotter=PlotGraphs(PlotGraphsNSRR()),
+        signal_cache=SignalCache(MemmapSignalCache()) if args.memmap_cache else None,
+        processes=args.multiprocessing,
+        catalog=EdfCatalog(ParquetEdfCatalog()) if args.catalog else None,
+        cleaned_cache=CleanedCache(DiskCleanedCache(args.cleaned_cache, max_bytes=args.cleaned_cache_max_bytes)) if args.cleaned_cache else None,
         )
 
     if args.list:
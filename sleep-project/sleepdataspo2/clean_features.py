@@ -2,19 +2,79 @@
 Author: Eshan Jayasundara
 Co-Author 1: 
 Co-Author 2:
-Last Modified: 2025/06/27 by Eshan Jayasundara
+Last Modified: 2025/06/29 by Eshan Jayasundara
 """
 
 from abc import ABC, abstractmethod
 import pandas as pd
 import numpy as np
-import sys
-from pobm.prep import set_range, resamp_spo2, median_spo2, block_data,  dfilter
+import tracemalloc
+from typing import List, Optional, Tuple, Union
+from sleepdataspo2 import CLEANED_SIGNAL_LENGTH
+from sleepdataspo2.prep_kernels import set_range, resamp_spo2, median_spo2, block_data, block_data_inplace
 from colorama import Fore, Style
 
+class SkippedSignal:
+    """
+    Result of cleaning a recording that cannot give a usable 1 Hz signal.
+
+    `reason` is one of "too_short" (under 4 hours once trimmed), "no_signal" (too few
+    samples in the 50-100 % range to reach 4 hours) or "flat" (every valid sample equal).
+    """
+    def __init__(self, reason: str, detail: str):
+        self.reason = reason
+        self.detail = detail
+
+    def __repr__(self) -> str:
+        return f"SkippedSignal({self.reason!r}, {self.detail!r})"
+
 class CleanFeaturesInterface(ABC):
     @abstractmethod
-    def clean_single(self, spo2: pd.Series, original_frequency: int) -> pd.Series:
+    def clean_single(self, spo2: pd.Series, original_frequency: int) -> Union[pd.Series, SkippedSignal]:
+        pass
+
+    def config(self) -> dict:
+        """
+        Parameters of the cleaning chain. Cached cleaned signals are keyed on them, so change
+        them here together with the chain.
+        """
+        return {
+            "trim_seconds": 5*60,
+            "range": [50, 100],
+            "diff": 8,
+            "filter_length": 9,
+            "block_treshold": 50,
+            "min_length": 4*60*60,
+            "target_length": CLEANED_SIGNAL_LENGTH,
+        }
+
+    def precheck(self, spo2, original_frequency: int) -> Optional[SkippedSignal]:
+        """
+        Reject a raw recording from its length and cheap statistics, before any filtering.
+
+        Only rejects recordings `clean_single` would discard anyway (the delta filter keeps at
+        most the in-range samples plus the first one), except flat channels, whose cleaned
+        signal would be a constant.
+
+        :return: a `SkippedSignal`, or None when the recording should be cleaned
+        """
+        spo2 = np.asarray(spo2)
+        trim = 5*60*original_frequency
+        window = spo2[trim:max(spo2.shape[0] - trim, trim)]
+        seconds = round(window.shape[0] / original_frequency)
+        if seconds < 4*60*60:
+            return SkippedSignal("too_short", f"{seconds} s of signal after trimming, less than 4 hours")
+        valid = window[(window >= 50) & (window <= 100)]
+        if round((valid.shape[0] + 1) / original_frequency) < 4*60*60:
+            return SkippedSignal("no_signal", f"only {valid.shape[0] / original_frequency:.0f} s of values within 50-100 %")
+        if valid.min() == valid.max():
+            return SkippedSignal("flat", f"constant at {valid[0]}")
+        return None
+
+    def clean_array(self, spo2: np.ndarray, original_frequency: int, out: np.ndarray = None, report_memory: bool = False, early_resample: bool = False) -> Union[np.ndarray, SkippedSignal]:
+        pass
+
+    def clean_many(self, signals: List[np.ndarray], original_frequencies: List[int], out: np.ndarray = None, batch_samples: int = 1 << 22) -> Tuple[np.ndarray, List[Optional[SkippedSignal]]]:
         pass
     
     def dfilter(self, signal, Diff=4):
@@ -27,14 +87,46 @@ class CleanFeaturesInterface(ABC):
 
         :return: preprocessed signal, 1-d numpy array.
         """
-        signal_filtered = []
-        for i, data in enumerate(signal):
-            if i == 0:
-                signal_filtered.append(data)
-            else:
-                if (((signal_filtered[-1] - data) / signal_filtered[-1]) * 100) < Diff:
-                    signal_filtered.append(data)
-        return np.array(signal_filtered)
+        signal = np.asarray(signal)
+        return signal[self._dfilter_keep(signal, Diff)]
+
+    def _dfilter_keep(self, signal: np.ndarray, Diff) -> np.ndarray:
+        """
+        Mask of the samples kept by the delta filter.
+
+        A sample is kept when its drop relative to the last *kept* sample is below `Diff` %.
+        The mask is first computed against the previous sample, which is right whenever that
+        sample was kept; only the runs that follow a rejected sample are re-checked against
+        the last kept value, so the Python-level work scales with the number of artifacts.
+        """
+        n = signal.shape[0]
+        keep = np.zeros(n, dtype=bool)
+        if n == 0:
+            return keep
+        keep[0] = True
+        with np.errstate(divide="ignore", invalid="ignore"):
+            keep[1:] = (((signal[:-1] - signal[1:]) / signal[:-1]) * 100) < Diff
+            rejected = np.flatnonzero(~keep)
+            r = 0
+            while r < rejected.shape[0]:
+                i = rejected[r]
+                # i - 1 is kept, so it is the reference until some later sample passes
+                reference = signal[i - 1]
+                k = i + 1
+                block = 64
+                while k < n:
+                    hits = np.flatnonzero((((reference - signal[k:k + block]) / reference) * 100) < Diff)
+                    if hits.shape[0] > 0:
+                        keep[i + 1:k + hits[0]] = False
+                        k += hits[0]
+                        keep[k] = True
+                        break
+                    k += block
+                    block *= 2
+                else:
+                    keep[i + 1:] = False
+                r = np.searchsorted(rejected, k, side="right")
+        return keep
     
     def nan_interp(self, signal):
         nans = np.isnan(signal)
@@ -53,9 +145,13 @@ class CleanSpO2(CleanFeaturesInterface):
     def __init__(self):
         pass
 
-    def clean_single(self, spo2: pd.Series, original_frequency: int) -> pd.Series:
+    def clean_single(self, spo2: pd.Series, original_frequency: int) -> Union[pd.Series, SkippedSignal]:
         # spo2 is a 1D numpy array sampled at {original_frequency} Hz
         print("[✔] original frequency:", original_frequency)
+        skipped = self.precheck(spo2, original_frequency)
+        if skipped is not None:
+            print(f"{Fore.LIGHTRED_EX}[SKIPED]{Style.RESET_ALL} Skipped before cleaning ({skipped.reason}): {skipped.detail}")
+            return skipped
         # Trim the first and last 5 minutes
         raw_spo2 = spo2.truncate(before=5*60*original_frequency, after=spo2.shape[0]-5*60*original_frequency-1)
         # print(f"{spo2.shape[0]} - {2*5*60*original_frequency} = {raw_spo2.shape[0]}")
@@ -90,7 +186,7 @@ class CleanSpO2(CleanFeaturesInterface):
         # if length is lowr than 4h skip the process
         if spo2_series.shape[0] < 4*60*60:
             print(f"{light_red}[SKIPED]{reset} Skipped due to small length (less than 4 hours) in the spo2 signal")
-            sys.exit(0)
+            return SkippedSignal("too_short", f"{spo2_series.shape[0]} s left after cleaning, less than 4 hours")
 
         # if length is more than 7h then choose first 7h else pad to 7h
         seven_hours_in_sec = 7*60*60
@@ -108,13 +204,240 @@ class CleanSpO2(CleanFeaturesInterface):
         print(f"[✔] Final signal length (1Hz, {seven_hours_in_sec}): {spo2_series.shape[0]}")
 
         return spo2_series
-    
+
+    def clean_array(self, spo2: np.ndarray, original_frequency: int, out: np.ndarray = None, report_memory: bool = False, early_resample: bool = False) -> Union[np.ndarray, SkippedSignal]:
+        """
+        Same chain as `clean_single` on plain arrays, keeping one float32 working buffer.
+
+        The trim is a view, range/delta filtering and interpolation work in place, the
+        1 Hz result is written straight into `out` and padding fills `out` instead of
+        concatenating. The filters run in float32, so values can differ from
+        `clean_single` in the last bits.
+
+        :param spo2: 1-d raw SpO2 array sampled at `original_frequency` Hz
+        :param original_frequency: integer sampling frequency
+        :param out: optional preallocated float32 buffer of length CLEANED_SIGNAL_LENGTH to fill
+        :param report_memory: print (and keep in `last_peak_bytes`) the peak traced allocation of this call.
+                              tracemalloc is process-wide, so other threads' allocations are included.
+        :param early_resample: downsample to 1 Hz right after the delta filter, so the median and block
+                               filters run on 1 Hz data (about `original_frequency` times less work).
+                               Not equivalent to `clean_single`: the 9-sample median then spans 9 seconds.
+
+        :return: `out`, the cleaned 1 Hz signal of length CLEANED_SIGNAL_LENGTH, or a `SkippedSignal`
+                 (leaving `out` untouched) for a recording `clean_single` would skip
+        """
+        started = report_memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        elif report_memory:
+            tracemalloc.reset_peak()
+        try:
+            out = self._clean_array(np.asarray(spo2), original_frequency, out, early_resample)
+            if isinstance(out, SkippedSignal):
+                print(f"{Fore.LIGHTRED_EX}[SKIPED]{Style.RESET_ALL} Skipped ({out.reason}): {out.detail}")
+            elif report_memory:
+                self.last_peak_bytes = tracemalloc.get_traced_memory()[1]
+                print(f"[✔] clean_array peak allocation: {self.last_peak_bytes / 2**20:.2f} MiB for {spo2.shape[0]} samples")
+        finally:
+            if started:
+                tracemalloc.stop()
+        return out
+
+    def _clean_array(self, spo2: np.ndarray, original_frequency: int, out: np.ndarray, early_resample: bool = False) -> Union[np.ndarray, SkippedSignal]:
+        if out is None:
+            out = np.empty(CLEANED_SIGNAL_LENGTH, dtype=np.float32)
+        elif out.shape != (CLEANED_SIGNAL_LENGTH,):
+            raise ValueError(f"out should have shape ({CLEANED_SIGNAL_LENGTH},), got {out.shape}")
+
+        skipped = self.precheck(spo2, original_frequency)
+        if skipped is not None:
+            return skipped
+
+        work = self._delta_compact(spo2, original_frequency)
+        n = work.shape[0]
+        n_out = int(round(n / original_frequency))
+        if n_out < 4*60*60:
+            return SkippedSignal("too_short", f"{n_out} s left after cleaning, less than 4 hours")
+        if early_resample:
+            # 5. Downsample to 1 Hz first, then 3. smooth and 4. remove block artifacts at 1 Hz
+            work = resamp_spo2(work, OriginalFreq=original_frequency, out=work)
+            work[:] = median_spo2(work, FilterLength=9)
+            block_data_inplace(work, treshold=50)
+            length = min(n_out, out.shape[0])
+            out[:length] = work[:length]
+            after = self._first_valid(work[length:], length) if np.isnan(out[length - 1]) else None
+        else:
+            # 3. Smooth with median filter and 4. remove block artifacts
+            work[:] = median_spo2(work, FilterLength=9)
+            block_data_inplace(work, treshold=50)
+            length, after = self._resample_into(work, original_frequency, out)
+        self._interp_and_pad(out, length, after)
+        return out
+
+    def _delta_compact(self, spo2: np.ndarray, original_frequency: int) -> np.ndarray:
+        # Trim the first and last 5 minutes (a view, no copy)
+        trim = 5*60*original_frequency
+        raw_spo2 = spo2[trim:max(spo2.shape[0] - trim, trim)]
+
+        # the only full-length copy
+        work = raw_spo2.astype(np.float32)
+        # 1. Remove non-physiological values (<50% or >100%)
+        work[(work < 50) | (work > 100)] = np.nan
+        # 2. Apply Delta Filter, compacting the kept samples to the front of the buffer.
+        #    They are rounded here from the raw values, as the median filter would, so that
+        #    float32 can not move a value across a .5 boundary; the chain is integer valued after this.
+        keep = self._dfilter_keep(work, Diff=8)
+        n = 0
+        for start in range(0, keep.shape[0], 1 << 20):
+            kept = np.round(raw_spo2[start:start + (1 << 20)][keep[start:start + (1 << 20)]])
+            kept[(kept < 50) | (kept > 100)] = np.nan
+            work[n:n + kept.shape[0]] = kept
+            n += kept.shape[0]
+        return work[:n]
+
+    def _resample_into(self, work: np.ndarray, original_frequency: int, out: np.ndarray) -> Tuple[int, Optional[Tuple[int, float]]]:
+        # 5. Downsample to 1 Hz with the median of each second, like resamp_spo2, keeping at most len(out) seconds.
+        #    Also returns the first valid second past the end of `out` when the end of `out` needs it to interpolate.
+        n = work.shape[0]
+        n_out = int(round(n / original_frequency))
+        length = min(n_out, out.shape[0])
+        full = min(n // original_frequency, length)
+        if full > 0:
+            np.median(work[:full*original_frequency].reshape(full, original_frequency), axis=1, out=out[:full])
+        if length > full:
+            out[full] = np.median(work[full*original_frequency:(full + 1)*original_frequency])
+        after = None
+        if length < n_out and np.isnan(out[length - 1]):
+            after = self._first_valid(resamp_spo2(work[length*original_frequency:], OriginalFreq=original_frequency), length)
+        return length, after
+
+    def _first_valid(self, signal: np.ndarray, offset: int) -> Optional[Tuple[int, float]]:
+        valid = np.flatnonzero(~np.isnan(signal))
+        return (offset + int(valid[0]), float(signal[valid[0]])) if valid.shape[0] > 0 else None
+
+    def _interp_and_pad(self, out: np.ndarray, length: int, after: Optional[Tuple[int, float]] = None) -> None:
+        # 6. Interpolate to replace NAN (edges take the nearest valid value). `after` is a valid sample
+        #    past `length` that the full-length signal would interpolate the trailing NaNs towards.
+        resampled = out[:length]
+        nans = np.isnan(resampled)
+        if nans.any() and not nans.all():
+            xp, fp = np.flatnonzero(~nans), resampled[~nans]
+            if after is not None:
+                xp, fp = np.append(xp, after[0]), np.append(fp, after[1])
+            resampled[nans] = np.interp(np.flatnonzero(nans), xp, fp)
+        elif nans.all() and after is not None:
+            resampled[:] = after[1]
+        # if length is less than 7h pad with the mean, otherwise the first 7h are already in `out`
+        if length < out.shape[0]:
+            out[length:] = np.nanmean(resampled) if not nans.all() else 98
+
+    def clean_many(self, signals: List[np.ndarray], original_frequencies: List[int], out: np.ndarray = None, batch_samples: int = 1 << 22) -> Tuple[np.ndarray, List[Optional[SkippedSignal]]]:
+        """
+        Clean many raw recordings at once, with the `clean_array` chain and no per-recording output.
+
+        Recordings are grouped by sampling frequency. Within a group the median filter runs once
+        per batch of about `batch_samples` delta-filtered samples laid end to end, separated by zero
+        gaps of half the filter length, which gives the same values as filtering each one with zero
+        padding. Longer recordings are filtered on their own. The other steps are already vectorized
+        per recording, so the gain is in the per-call overhead of many short recordings.
+
+        :param signals: 1-d raw SpO2 arrays
+        :param original_frequencies: integer sampling frequency of each signal
+        :param out: optional float32 buffer of shape (len(signals), CLEANED_SIGNAL_LENGTH) to fill
+        :param batch_samples: size of the joined median filter input
+
+        :return: (`out`, skipped) where skipped[i] is the `SkippedSignal` of recording i, or None
+                 when its row holds the cleaned signal. Rows of skipped recordings are NaN.
+        """
+        if len(signals) != len(original_frequencies):
+            raise ValueError(f"Got {len(signals)} signals but {len(original_frequencies)} frequencies")
+        if out is None:
+            out = np.empty((len(signals), CLEANED_SIGNAL_LENGTH), dtype=np.float32)
+        elif out.shape != (len(signals), CLEANED_SIGNAL_LENGTH):
+            raise ValueError(f"out should have shape ({len(signals)}, {CLEANED_SIGNAL_LENGTH}), got {out.shape}")
+        skipped = [None] * len(signals)
+
+        groups = {}
+        for index, frequency in enumerate(original_frequencies):
+            if frequency != int(frequency):
+                raise ValueError(f"original_frequency = {frequency} is impossible. It should be an integer.")
+            groups.setdefault(int(frequency), []).append(index)
+
+        for frequency, indices in groups.items():
+            batch = []
+            for index in indices:
+                spo2 = np.asarray(signals[index])
+                skipped[index] = self.precheck(spo2, frequency)
+                if skipped[index] is None:
+                    work = self._delta_compact(spo2, frequency)
+                    n_out = int(round(work.shape[0] / frequency))
+                    if n_out < 4*60*60:
+                        skipped[index] = SkippedSignal("too_short", f"{n_out} s left after cleaning, less than 4 hours")
+                    else:
+                        batch.append((index, work))
+                if skipped[index] is not None:
+                    out[index] = np.nan
+                if batch and sum(work.shape[0] for _, work in batch) >= batch_samples:
+                    self._finish_batch(batch, frequency, out)
+                    batch = []
+            if batch:
+                self._finish_batch(batch, frequency, out)
+
+        print(f"[✔] Cleaned {skipped.count(None)} of {len(signals)} recordings ({len(groups)} sampling frequencies)")
+        return out, skipped
+
+    def _finish_batch(self, batch: List[Tuple[int, np.ndarray]], original_frequency: int, out: np.ndarray) -> None:
+        # 3. one median filter call for the batch, the zero gaps stand in for each signal's padding
+        gap = 9 // 2
+        if len(batch) == 1:
+            joined = batch[0][1]
+            starts = [0, joined.shape[0] + gap]
+        else:
+            starts = np.cumsum([0] + [work.shape[0] + gap for _, work in batch])
+            joined = np.zeros(starts[-1], dtype=np.float32)
+            for start, (_, work) in zip(starts, batch):
+                joined[start:start + work.shape[0]] = work
+        joined[:] = median_spo2(joined, FilterLength=9)
+
+        for start, stop, (index, _) in zip(starts[:-1], starts[1:], batch):
+            work = joined[start:stop - gap]
+            # 4. remove block artifacts, 5. resample and 6. interpolate and pad
+            block_data_inplace(work, treshold=50)
+            length, after = self._resample_into(work, original_frequency, out[index])
+            self._interp_and_pad(out[index], length, after)
+
 class CleanFeatures(CleanFeaturesInterface):
     def __init__(self, feature_cleaner: CleanFeaturesInterface):
         self._feature_cleaner = feature_cleaner
 
-    def clean_single(self, spo2: pd.Series, original_frequency: int) -> pd.Series:
+    def clean_single(self, spo2: pd.Series, original_frequency: int) -> Union[pd.Series, SkippedSignal]:
         return self._feature_cleaner.clean_single(
                     spo2=spo2,
                     original_frequency=original_frequency
-                )
\ No newline at end of file
+                )
+
+    def config(self) -> dict:
+        return self._feature_cleaner.config()
+
+    def precheck(self, spo2, original_frequency: int) -> Optional[SkippedSignal]:
+        return self._feature_cleaner.precheck(
+                    spo2=spo2,
+                    original_frequency=original_frequency
+                )
+
+    def clean_array(self, spo2: np.ndarray, original_frequency: int, out: np.ndarray = None, report_memory: bool = False, early_resample: bool = False) -> Union[np.ndarray, SkippedSignal]:
+        return self._feature_cleaner.clean_array(
+                    spo2=spo2,
+                    original_frequency=original_frequency,
+                    out=out,
+                    report_memory=report_memory,
+                    early_resample=early_resample,
+                )
+
+    def clean_many(self, signals: List[np.ndarray], original_frequencies: List[int], out: np.ndarray = None, batch_samples: int = 1 << 22) -> Tuple[np.ndarray, List[Optional[SkippedSignal]]]:
+        return self._feature_cleaner.clean_many(
+                    signals=signals,
+                    original_frequencies=original_frequencies,
+                    out=out,
+                    batch_samples=batch_samples,
+                )
@@ -0,0 +1,186 @@
+"""
+Author: Eshan Jayasundara
+Co-Author 1:
+Co-Author 2:
+Last Modified: 2025/06/29 by Eshan Jayasundara
+"""
+
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, Union
+import numpy as np
+import hashlib
+import json
+import multiprocessing.util
+import os
+import threading
+from filelock import FileLock
+from sleepdataspo2.clean_features import *
+
+# hits and misses of this process not yet merged into {root}/stats.json, per cache root
+_pending_counts: Dict[str, Counter] = {}
+_pending_pid = None
+_pending_lock = threading.Lock()
+
+def _cache_lock(root: str) -> FileLock:
+    return FileLock(f"{root}/cache.lock", timeout=180)
+
+def _load_counts(root: str) -> dict:
+    stats_path = f"{root}/stats.json"
+    if not os.path.exists(stats_path):
+        return {}
+    with open(stats_path) as f:
+        return json.load(f)
+
+def _save_counts(root: str, counts: dict) -> None:
+    tmp_path = f"{root}/stats.json.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(counts, f)
+    os.replace(tmp_path, f"{root}/stats.json")
+
+def _count_pending(root: str, event: str) -> None:
+    global _pending_pid
+    with _pending_lock:
+        if _pending_pid != os.getpid():
+            # first count of this process; a forked worker starts with a copy of its parent's counts
+            _pending_counts.clear()
+            _pending_pid = os.getpid()
+            # runs when a pool worker exits (and at interpreter exit), so its counts are merged once
+            multiprocessing.util.Finalize(None, _merge_pending, exitpriority=10)
+        _pending_counts.setdefault(root, Counter())[event] += 1
+
+def _merge_pending(root: str = None) -> None:
+    with _pending_lock:
+        if _pending_pid != os.getpid():
+            return
+        roots = [root] if root is not None else list(_pending_counts)
+        pending = {root: _pending_counts.pop(root) for root in roots if root in _pending_counts}
+    for root, events in pending.items():
+        with _cache_lock(root):
+            counts = _load_counts(root)
+            for event, n in events.items():
+                counts[event] = counts.get(event, 0) + n
+            _save_counts(root, counts)
+
+class CleanedCacheInterface(ABC):
+    @abstractmethod
+    def key(self, spo2: np.ndarray, original_frequency: int, config: dict) -> str:
+        pass
+    @abstractmethod
+    def get(self, key: str) -> Union[np.ndarray, SkippedSignal, None]:
+        pass
+    @abstractmethod
+    def put(self, key: str, result: Union[np.ndarray, SkippedSignal]) -> None:
+        pass
+    @abstractmethod
+    def stats(self) -> dict:
+        pass
+
+class DiskCleanedCache(CleanedCacheInterface):
+    """
+    Cleaned signals stored under the hash of their raw input and cleaning configuration.
+
+    A changed recording or a changed cleaning parameter gives a new key, so stale results
+    are never reused and unchanged recordings are never recomputed. Entries live in
+    `{root}/{key[:2]}/{key}.npy` (or `.skip.json` for rejected recordings). Once the
+    entries exceed `max_bytes`, the least recently used ones are deleted. Hits and misses are
+    counted in memory and merged into `{root}/stats.json` by `stats` or when a worker process
+    exits, so lookups never wait on the cache lock and the counts add up across processes.
+    """
+    def __init__(self, root: str, max_bytes: int=10 * 2**30):
+        self._root = root
+        self._max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _entry_path(self, key: str, suffix: str) -> str:
+        return f"{self._root}/{key[:2]}/{key}{suffix}"
+
+    def _entries(self):
+        for directory in os.scandir(self._root):
+            if directory.is_dir():
+                for entry in os.scandir(directory.path):
+                    if entry.name.endswith(".npy") or entry.name.endswith(".skip.json"):
+                        yield entry
+
+    def key(self, spo2: np.ndarray, original_frequency: int, config: dict) -> str:
+        spo2 = np.ascontiguousarray(spo2)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(json.dumps({"dtype": spo2.dtype.str, "shape": spo2.shape, "original_frequency": original_frequency, "config": config}, sort_keys=True).encode())
+        digest.update(spo2.data)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Union[np.ndarray, SkippedSignal, None]:
+        for suffix in (".npy", ".skip.json"):
+            entry_path = self._entry_path(key, suffix)
+            try:
+                if suffix == ".npy":
+                    result = np.load(entry_path)
+                else:
+                    with open(entry_path) as f:
+                        result = SkippedSignal(**json.load(f))
+                # the modification time doubles as the last use for eviction
+                os.utime(entry_path)
+            except FileNotFoundError:
+                continue
+            _count_pending(self._root, "hits")
+            return result
+        _count_pending(self._root, "misses")
+        return None
+
+    def put(self, key: str, result: Union[np.ndarray, SkippedSignal]) -> None:
+        os.makedirs(f"{self._root}/{key[:2]}", exist_ok=True)
+        if isinstance(result, SkippedSignal):
+            entry_path = self._entry_path(key, ".skip.json")
+            tmp_path = entry_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"reason": result.reason, "detail": result.detail}, f)
+        else:
+            entry_path = self._entry_path(key, ".npy")
+            tmp_path = entry_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, np.asarray(result))
+        os.replace(tmp_path, entry_path)
+
+        with _cache_lock(self._root):
+            entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+            total = sum(entry.stat().st_size for entry in entries)
+            evicted = 0
+            for entry in entries:
+                if total <= self._max_bytes or entry.path == entry_path:
+                    break
+                total -= entry.stat().st_size
+                os.remove(entry.path)
+                evicted += 1
+            if evicted:
+                counts = _load_counts(self._root)
+                counts["evictions"] = counts.get("evictions", 0) + evicted
+                _save_counts(self._root, counts)
+
+    def stats(self) -> dict:
+        _merge_pending(self._root)
+        with _cache_lock(self._root):
+            counts = _load_counts(self._root)
+            sizes = [entry.stat().st_size for entry in self._entries()]
+        return {
+            "hits": counts.get("hits", 0),
+            "misses": counts.get("misses", 0),
+            "evictions": counts.get("evictions", 0),
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+        }
+
+class CleanedCache(CleanedCacheInterface):
+    def __init__(self, cleaned_cache: CleanedCacheInterface):
+        self._cleaned_cache = cleaned_cache
+
+    def key(self, spo2: np.ndarray, original_frequency: int, config: dict) -> str:
+        return self._cleaned_cache.key(spo2, original_frequency, config)
+
+    def get(self, key: str) -> Union[np.ndarray, SkippedSignal, None]:
+        return self._cleaned_cache.get(key)
+
+    def put(self, key: str, result: Union[np.ndarray, SkippedSignal]) -> None:
+        return self._cleaned_cache.put(key, result)
+
+    def stats(self) -> dict:
+        return self._cleaned_cache.stats()
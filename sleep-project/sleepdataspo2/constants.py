@@ -1,2 +1,5 @@
 BASE_URL = "https://sleepdata.org"
 MAX_RETRIES = 5
+CLEANED_SIGNAL_LENGTH = 7*60*60  # 7 hours at 1Hz
+SPO2_CHANNEL_NAMES = ["SaO2", "SpO2", "SPO2", "Sao2", "PulseOx", "OXI_SAT"]
+MIN_RECORDING_DURATION = 4*60*60 + 2*5*60  # 4 hours left after trimming 5 minutes at both ends
@@ -77,6 +77,22 @@ def main():
         help="Number of maximum threds to speedup downlods"
     )
 
+    parser.add_argument(
+        "-a", "--async_download",
+        type=bool,
+        required=False,
+        default=False,
+        help="Whether to download on one asyncio event loop with --max_threads transfers in flight instead of a thread pool"
+    )
+
+    parser.add_argument(
+        "-bw", "--max_bytes_per_second",
+        type=int,
+        required=False,
+        default=None,
+        help="Global download bandwidth cap in bytes per second (only with --async_download)"
+    )
+
     # Parse the command line arguments
     args = parser.parse_args()
     # Args validation
@@ -93,8 +109,13 @@ def main():
     elif args.start == None and args.end == None and args.list == None:
         raise ValueError("one of '--start and --end' or --list should be provided")
     
+    if args.async_download:
+        downloader = AsyncDownloaderNSRR(max_concurrency=args.max_threads, max_bytes_per_second=args.max_bytes_per_second)
+    else:
+        downloader = DownloaderNSRR(pool_size=args.max_threads)
+
     runner = Run(
-        downloader=DownloaderNSRR()
+        downloader=downloader
         )
 
     if args.list:
@@ -108,14 +129,23 @@ def main():
 
     print(files_to_download)
     
-    runner.run_downloader_parallel(
-        dataset=args.dataset, 
-        file_names=files_to_download, 
-        token=os.environ["NSRR_TOKEN"], 
-        download_from=args.download_from,
-        download_to=args.download_to,
-        max_threads=args.max_threads,
-        )
+    if args.async_download:
+        runner.run_downloader_async(
+            dataset=args.dataset, 
+            file_names=files_to_download, 
+            token=os.environ["NSRR_TOKEN"], 
+            download_from=args.download_from,
+            download_to=args.download_to,
+            )
+    else:
+        runner.run_downloader_parallel(
+            dataset=args.dataset, 
+            file_names=files_to_download, 
+            token=os.environ["NSRR_TOKEN"], 
+            download_from=args.download_from,
+            download_to=args.download_to,
+            max_threads=args.max_threads,
+            )
 
 if __name__ == "__main__":
     main()
@@ -10,8 +10,13 @@ import certifi
 import traceback
 import requests
 import os
+import threading
+import time
+import asyncio
+import ssl
+import aiohttp
 from sleepdataspo2.load_data import *
-from typing import List
+from typing import Dict, List, Tuple, Union
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from requests.exceptions import ChunkedEncodingError, ConnectionError, Timeout
@@ -19,23 +24,102 @@ from sleepdataspo2 import BASE_URL, MAX_RETRIES
 from tqdm import tqdm
 from colorama import Fore, Style
 
+def _content_range_total(content_range: str) -> int:
+    # "bytes 100-199/200" or "bytes */200"
+    total = content_range.rsplit("/", 1)[-1].strip()
+    return int(total) if total.isdigit() else 0
+
+def _backoff(attempt: int) -> float:
+    # wait 1s, 2s, 4s, etc. before retrying a dropped connection
+    return min(2 ** attempt, 30)
+
+class _PartialDownload:
+    """
+    Resume state of one file, shared by the threaded and the asyncio downloader.
+
+    Bytes land in "<name>.edf.part" and are renamed only once complete, so an interrupted
+    transfer is resumed with a Range request instead of restarted.
+    """
+    def __init__(self, base_url: str, dataset: str, file_name: str, token: str, download_from: str, download_to: str):
+        file_path = f"{download_from}/{file_name}.edf"
+        self.url = f"{base_url}/datasets/{dataset}/files/a/{token}/m/nsrr-gem-v1-0-0/{file_path}"
+        self.download_loc = f"{download_to}/{dataset}/{file_path}"
+        self.part_loc = f"{self.download_loc}.part"
+        self.params = {"auth_token": token}
+        self.offset = 0
+        self.total_size = 0
+
+    def request_headers(self) -> dict:
+        """Start a new attempt from whatever is already in the part file"""
+        self.offset = os.path.getsize(self.part_loc) if os.path.exists(self.part_loc) else 0
+        self.total_size = 0
+        return {"Range": f"bytes={self.offset}-"} if self.offset > 0 else {}
+
+    def on_response(self, status: int, reason: str, headers) -> Tuple[str, str]:
+        """
+        Decide what to do with a response to `request_headers()`.
+
+        :return: ("write", file mode) to store the body, ("complete", None) when nothing is left to fetch,
+                 ("retry", error) / ("backoff", error) to try again now / after a pause, or ("fail", error)
+        """
+        if status == 416 and self.offset > 0:
+            # the range starts at or beyond the end: either complete already or a stale part
+            self.total_size = _content_range_total(headers.get('Content-Range', ''))
+            if self.total_size != self.offset:
+                os.remove(self.part_loc)
+                return "retry", f"(Retryable Error: stale partial file) {self.part_loc}"
+            return "complete", None
+        if status == 206:
+            self.total_size = _content_range_total(headers.get('Content-Range', ''))
+            return "write", "ab"
+        if status == 200:
+            # server ignored the range, start from byte zero
+            self.total_size = int(headers.get('Content-Length', 0))
+            self.offset = 0
+            return "write", "wb"
+        if status == 302:
+            return "fail", "Token Not Authorized to Access Specified File"
+        if status in (500, 502, 503, 504):
+            return "backoff", f"(Retryable Error: {status}) {reason}"
+        return "fail", f"{status} {reason}"
+
+    def finish(self) -> Union[str, None]:
+        """Publish the part file if it holds every byte, otherwise return why it cannot be"""
+        received = os.path.getsize(self.part_loc)
+        if self.total_size and received != self.total_size:
+            return f"(Retryable Error: incomplete) received {received} of {self.total_size} bytes"
+        os.replace(self.part_loc, self.download_loc)
+        return None
+
 class DownloaderInterface(ABC):
     @abstractmethod
     def download(self, dataset: str, file_name: str, token: str, download_from: str, download_to: str) -> None:
         pass
 
 class DownloaderNSRR(DownloaderInterface):
-    def __init__(self):
-        pass
+    def __init__(self, pool_size: int=None, base_url: str=BASE_URL):
+        """
+        :param pool_size: when given, all downloads share one session whose connection pool keeps up to
+                          `pool_size` connections alive (use `max_threads`). Otherwise every file opens its own session.
+        :param base_url: root of the NSRR site, overridable for local mirrors
+        """
+        self._pool_size = pool_size
+        self._base_url = base_url
+        self._shared_session = None
+        self._session_lock = threading.Lock()
 
-    def download(self, dataset: str, file_name: str, token: str, download_from:str, download_to: str) -> None:
-        file_path = f"{download_from}/{file_name}.edf"
-        download_url = f"{BASE_URL}/datasets/{dataset}/files/a/{token}/m/nsrr-gem-v1-0-0/{file_path}"
-        download_loc = f"{download_to}/{dataset}/{file_path}"
-        error = None
-        partial = True
-        params = {"auth_token": token}
+    def __getstate__(self) -> dict:
+        # sessions and locks stay in the process that created them (Run is pickled for process pools)
+        state = self.__dict__.copy()
+        state["_shared_session"] = None
+        del state["_session_lock"]
+        return state
 
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._session_lock = threading.Lock()
+
+    def _new_session(self, pool_size: int=None) -> requests.Session:
         # Setup retry-capable session
         session = requests.Session()
         retries = Retry(
@@ -44,51 +128,213 @@ class DownloaderNSRR(DownloaderInterface):
             status_forcelist=[500, 502, 503, 504],
             allowed_methods=["GET"]
         )
-        adapter = HTTPAdapter(max_retries=retries)
+        if pool_size is None:
+            adapter = HTTPAdapter(max_retries=retries)
+        else:
+            # block instead of opening throwaway connections when all pooled ones are busy
+            adapter = HTTPAdapter(max_retries=retries, pool_connections=1, pool_maxsize=pool_size, pool_block=True)
         session.mount("http://", adapter)
         session.mount("https://", adapter)
+        return session
+
+    def _session(self) -> requests.Session:
+        if self._pool_size is None:
+            return self._new_session()
+        with self._session_lock:
+            if self._shared_session is None:
+                self._shared_session = self._new_session(self._pool_size)
+            return self._shared_session
+
+    def download(self, dataset: str, file_name: str, token: str, download_from:str, download_to: str) -> None:
+        transfer = _PartialDownload(self._base_url, dataset, file_name, token, download_from, download_to)
+        error = None
+
+        session = self._session()
+
+        for attempt in range(MAX_RETRIES + 1):
+            error = None
+            headers = transfer.request_headers()
+            try:
+                # with session.get(download_url, stream=True, params=params, verify="cert.pem", timeout=60) as response:
+                with session.get(transfer.url, stream=True, params=transfer.params, headers=headers, verify=certifi.where(), timeout=60) as response:
+                    action, detail = transfer.on_response(response.status_code, response.reason, response.headers)
+                    if action == "write":
+                        blue = Fore.BLUE  # ANSI for sky blue
+                        reset = Style.RESET_ALL
+                        with open(transfer.part_loc, detail) as f, tqdm(
+                            total=transfer.total_size,
+                            initial=transfer.offset,
+                            unit='B',
+                            unit_scale=True,
+                            desc=f"{blue}Downloading {file_name}.edf{reset}",
+                            bar_format="{desc} |{bar}| {percentage:3.0f}% {elapsed}",
+                            ascii=False,  # minimal-style bar false
+                            ncols=60,     # small width
+                            colour="blue",
+                        ) as pbar:
+                            for chunk in response.iter_content(chunk_size=8192):
+                                if chunk:
+                                    f.write(chunk)
+                                    pbar.update(len(chunk))
+                    elif action == "retry":
+                        error = detail
+                        continue
+                    elif action == "backoff":
+                        error = detail
+                        time.sleep(_backoff(attempt))
+                        continue
+                    elif action == "fail":
+                        error = detail
+                        break
 
+                error = transfer.finish()
+                if error:
+                    continue
+                print(f"[✔] Downloaded: {transfer.download_loc} ({os.path.getsize(transfer.download_loc)} bytes)")
+                break
+
+            except (ChunkedEncodingError, ConnectionError, Timeout) as e:
+                error = f"(Retryable Error: {type(e).__name__}) {e}"
+                time.sleep(_backoff(attempt))
+            except Exception as e:
+                print(f"{self.__class__}/download", e)
+                error = f"({type(e).__name__}) {e}"
+                break
+
+        if error:
+            # the ".part" file is kept so the next run resumes from where this one stopped
+            print(f"[✘] Download failed: {error}")
+            return "fail"
+
+        return os.path.getsize(transfer.download_loc)
+
+
+class _ByteRateLimiter:
+    """Token bucket shared by every transfer of one bulk download (at most one second of burst)."""
+    def __init__(self, bytes_per_second: int):
+        self._rate = bytes_per_second
+        self._available = bytes_per_second
+        self._last = None
+        self._lock = asyncio.Lock()
+
+    async def consume(self, n: int) -> None:
+        loop = asyncio.get_event_loop()
+        async with self._lock:
+            now = loop.time()
+            if self._last is not None:
+                self._available = min(self._rate, self._available + (now - self._last) * self._rate)
+            self._last = now
+            self._available -= n
+            wait = -self._available / self._rate if self._available < 0 else 0
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+class AsyncDownloaderNSRR(DownloaderInterface):
+    def __init__(self, max_concurrency: int=100, max_bytes_per_second: int=None, base_url: str=BASE_URL):
+        """
+        Bulk downloader running every transfer on one asyncio event loop instead of one OS thread per file.
+
+        :param max_concurrency: maximum number of transfers in flight at once
+        :param max_bytes_per_second: global bandwidth cap shared by all transfers, unlimited when None
+        :param base_url: root of the NSRR site, overridable for local mirrors
+        """
+        self._max_concurrency = max_concurrency
+        self._max_bytes_per_second = max_bytes_per_second
+        self._base_url = base_url
+
+    def download(self, dataset: str, file_name: str, token: str, download_from:str, download_to: str) -> None:
+        return self.download_many(dataset, [file_name], token, download_from, download_to)[file_name]
+
+    def download_many(self, dataset: str, file_names: List[str], token: str, download_from: str, download_to: str) -> Dict[str, object]:
+        """
+        Download all files concurrently, resuming any `<name>.edf.part` left by an earlier run.
+
+        :return: dict of file name to downloaded size in bytes, or "fail"
+        """
+        loop = asyncio.new_event_loop()
         try:
-            # with session.get(download_url, stream=True, params=params, verify="cert.pem", timeout=60) as response:
-            with session.get(download_url, stream=True, params=params, verify=certifi.where(), timeout=60) as response:
-                if response.status_code == 200:
-                    total_size = int(response.headers.get('Content-Length', 0))
-                    blue = Fore.BLUE  # ANSI for sky blue
-                    reset = Style.RESET_ALL
-                    with open(download_loc, 'wb') as f, tqdm(
-                        total=total_size,
-                        unit='B',
-                        unit_scale=True,
-                        desc=f"{blue}Downloading {file_name}.edf{reset}",
-                        bar_format="{desc} |{bar}| {percentage:3.0f}% {elapsed}",
-                        ascii=False,  # minimal-style bar false
-                        ncols=60,     # small width
-                        colour="blue",
-                    ) as pbar:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            if chunk:
-                                f.write(chunk)
-                                pbar.update(len(chunk))
-                    partial = False
-                    print(f"[✔] Downloaded: {download_loc} ({os.path.getsize(download_loc)} bytes)")
-                elif response.status_code == 302:
-                    error = "Token Not Authorized to Access Specified File"
-                else:
-                    error = f"{response.status_code} {response.reason}"
-
-        except (ChunkedEncodingError, ConnectionError, Timeout) as e:
-            error = f"(Retryable Error: {type(e).__name__}) {e}"
-        except Exception as e:
-            print(f"{self.__class__}/download", e)
-            error = f"({type(e).__name__}) {e}"
-
-        # partial downloads not aloowed
+            return loop.run_until_complete(self._download_all(dataset, file_names, token, download_from, download_to))
         finally:
-            if partial and os.path.exists(download_loc):
-                os.remove(download_loc)
-                print(f"[✘] Partial file removed: {download_loc}")
-            if error:
-                print(f"[✘] Download failed: {error}")
-                return "fail"
-
-        return os.path.getsize(download_loc)
+            loop.close()
+
+    async def _download_all(self, dataset: str, file_names: List[str], token: str, download_from: str, download_to: str) -> Dict[str, object]:
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        limiter = _ByteRateLimiter(self._max_bytes_per_second) if self._max_bytes_per_second else None
+        connector = aiohttp.TCPConnector(limit=self._max_concurrency, ssl=ssl.create_default_context(cafile=certifi.where()))
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=60, sock_read=60)
+        blue = Fore.BLUE  # ANSI for sky blue
+        reset = Style.RESET_ALL
+        # one aggregate bar; its total grows as each response reports its size
+        with tqdm(
+            total=0,
+            unit='B',
+            unit_scale=True,
+            desc=f"{blue}Downloading {len(file_names)} files{reset}",
+            bar_format="{desc} |{bar}| {percentage:3.0f}% {n_fmt}/{total_fmt} {rate_fmt} {elapsed}{postfix}",
+            ncols=100,
+            colour="blue",
+        ) as pbar:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                results = await asyncio.gather(*[
+                    self._download_one(session, semaphore, limiter, pbar, dataset, file_name, token, download_from, download_to)
+                    for file_name in file_names
+                ])
+        failed = [file_name for file_name, result in zip(file_names, results) if result == "fail"]
+        print(f"[✔] Downloaded {len(file_names) - len(failed)}/{len(file_names)} files")
+        if failed:
+            print(f"[✘] Download failed: {failed}")
+        return dict(zip(file_names, results))
+
+    async def _download_one(self, session, semaphore, limiter, pbar, dataset: str, file_name: str, token: str, download_from: str, download_to: str) -> object:
+        transfer = _PartialDownload(self._base_url, dataset, file_name, token, download_from, download_to)
+        error = None
+        counted = False
+
+        async with semaphore:
+            for attempt in range(MAX_RETRIES + 1):
+                error = None
+                headers = transfer.request_headers()
+                try:
+                    async with session.get(transfer.url, params=transfer.params, headers=headers, allow_redirects=False) as response:
+                        action, detail = transfer.on_response(response.status, response.reason, response.headers)
+                        if action == "write":
+                            if not counted:
+                                # count each file once, retries only fill in its missing bytes
+                                pbar.total += max(transfer.total_size - transfer.offset, 0)
+                                pbar.refresh()
+                                counted = True
+                            with open(transfer.part_loc, detail) as f:
+                                async for chunk in response.content.iter_chunked(65536):
+                                    if limiter is not None:
+                                        await limiter.consume(len(chunk))
+                                    f.write(chunk)
+                                    pbar.update(len(chunk))
+                        elif action == "retry":
+                            error = detail
+                            continue
+                        elif action == "backoff":
+                            error = detail
+                            await asyncio.sleep(_backoff(attempt))
+                            continue
+                        elif action == "fail":
+                            error = detail
+                            break
+
+                    error = transfer.finish()
+                    if error:
+                        continue
+                    break
+
+                except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    error = f"(Retryable Error: {type(e).__name__}) {e}"
+                    await asyncio.sleep(_backoff(attempt))
+                except Exception as e:
+                    print(f"{self.__class__}/download", e)
+                    error = f"({type(e).__name__}) {e}"
+                    break
+
+        pbar.set_postfix_str(f"{file_name} {'failed' if error else 'done'}")
+        if error:
+            print(f"[✘] Download failed: {file_name}: {error}")
+            return "fail"
+        return os.path.getsize(transfer.download_loc)
@@ -90,7 +90,79 @@ def main():
         type=bool,
         required=False,
         default=False,
-        help="Whether to calculate time eating complex features"
+        help="Whether to calculate complexity features (ApEn, LZ, CTM, SampEn, DFA)"
+    )
+
+    parser.add_argument(
+        "-mc", "--memmap_cache",
+        type=bool,
+        required=False,
+        default=False,
+        help="Whether to keep cleaned signals in one memory-mapped file per dataset instead of per-file parquet"
+    )
+
+    parser.add_argument(
+        "-mp", "--multiprocessing",
+        type=bool,
+        required=False,
+        default=False,
+        help="Whether to clean and engineer in worker processes (--max_threads of them) instead of threads"
+    )
+
+    parser.add_argument(
+        "-f", "--features",
+        type=str,
+        required=False,
+        default=None,
+        help="Space separated list of feature names to compute (e.g. \"ODI_thr3 CA_thr90 AV\"); only the computations they need are run"
+    )
+
+    parser.add_argument(
+        "-b", "--batch_size",
+        type=int,
+        required=False,
+        default=None,
+        help="Engineer this many cleaned recordings at a time as one matrix instead of one call per recording"
+    )
+
+    parser.add_argument(
+        "-fw", "--family_workers",
+        type=int,
+        required=False,
+        default=None,
+        help="Run the independent feature families of each recording concurrently on this many workers"
+    )
+
+    parser.add_argument(
+        "-fp", "--family_processes",
+        type=bool,
+        required=False,
+        default=False,
+        help="Whether --family_workers are processes instead of threads"
+    )
+
+    parser.add_argument(
+        "-ew", "--epoch_window",
+        type=int,
+        required=False,
+        default=None,
+        help="Write per-epoch features (ODI, CT90, AV, Min, DI) over windows of this many seconds next to each cleaned signal instead of whole-night features"
+    )
+
+    parser.add_argument(
+        "-eh", "--epoch_hop",
+        type=int,
+        required=False,
+        default=None,
+        help="Seconds between consecutive epoch starts (defaults to --epoch_window)"
+    )
+
+    parser.add_argument(
+        "-fs", "--feature_shards",
+        type=bool,
+        required=False,
+        default=False,
+        help="Whether features are written to one new shard file per recording without locking, merged into extracted_N_features.parquet and .csv at the end, instead of rewriting the CSV under a lock"
     )
 
     # Parse the command line arguments
@@ -111,7 +183,15 @@ def main():
     
     runner = Run(
         reader=DataLoader(PandasDataLoader()),
-        engineer=EngineerFeatures(EngineerOdi())
+        engineer=EngineerFeatures(EngineerOdi(
+            feature_names=args.features.split(" ") if args.features else None,
+            family_workers=args.family_workers,
+            family_processes=args.family_processes,
+            )),
+        signal_cache=SignalCache(MemmapSignalCache()) if args.memmap_cache else None,
+        processes=args.multiprocessing,
+        epochs=EpochFeatures(SlidingEpochFeatures()),
+        feature_sink=FeatureSink(ShardedFeatureSink()) if args.feature_shards else None,
         )
 
     if args.list:
@@ -124,6 +204,29 @@ def main():
         files_to_engineer.append(f"{args.prefix}-{i}")
 
     print(files_to_engineer)
+
+    if args.epoch_window:
+        runner.run_epochs_parallel(
+            dataset=args.dataset,
+            file_names=files_to_engineer,
+            download_from=args.download_from,
+            download_to=args.download_to,
+            window=args.epoch_window,
+            hop=args.epoch_hop,
+            max_threads=args.max_threads,
+            )
+        return
+
+    if args.batch_size:
+        runner.run_engineer_batch(
+            dataset=args.dataset,
+            file_names=files_to_engineer,
+            download_from=args.download_from,
+            download_to=args.download_to,
+            complex_features=args.complex_features,
+            batch_size=args.batch_size,
+            )
+        return
     
     runner.run_engineer_parallel(
         dataset=args.dataset, 
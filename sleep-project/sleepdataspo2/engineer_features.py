@@ -6,256 +6,164 @@ Last Modified: 2025/06/27 by Eshan Jayasundara
 """
 
 from abc import ABC, abstractmethod
+from typing import List
+from functools import partial, lru_cache
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import pandas as pd
 import numpy as np
-from pobm.obm.desat import DesaturationsMeasures
-from pobm.obm.burden import HypoxicBurdenMeasures
-from pobm.obm.complex import ComplexityMeasures
-from pobm.obm.general import OverallGeneralMeasures
-from pobm.obm.periodicity import  PRSAMeasures, PSDMeasures
-from pobm._ResultsClasses import DesatMethodEnum
 from colorama import Fore, Style
+from pobm.obm.general import OverallGeneralMeasures
+from pobm.obm.periodicity import PSDMeasures
+from sleepdataspo2.feature_kernels import desaturations_multi, complexity_measures, prsa_anchors, prsa_window, general_measures_batch, psd_measures_batch, prsa_anchors_batch, prsa_window_batch
+from sleepdataspo2.feature_registry import FeatureRegistry
 
 class EngineerFeaturesInterface(ABC):
     @abstractmethod
     def compute_single(self, spo2: pd.Series, complex_features: bool) -> float:
         pass
-
-class EngineerOdi(EngineerFeaturesInterface):
-    def __init__(self):
+    @abstractmethod
+    def compute_batch(self, spo2: np.ndarray, nsrr_ids: List[str], complex_features: bool) -> pd.DataFrame:
         pass
 
-    def compute_single(self, spo2: pd.Series, complex_features: bool=False) -> float:
+def _desat_field(key: tuple, index: int, field: str):
+    # getter for one DesaturationsMeasuresResults (index 0) / HypoxicBurdenMeasuresResults (index 1) field of one threshold
+    return lambda results: getattr(results[key][index], field)
+
+def _debug(message: str) -> None:
+    print(f"{Fore.LIGHTGREEN_EX}[DEBUG]{Style.RESET_ALL} {message}")
+
+def _field(field: str):
+    return lambda results: getattr(results, field)
+
+# PRSA window sizes computable by name (e.g. "PRSAc_win40"); only DEFAULT_PRSA_WINDOWS are in the default feature set
+PRSA_WINDOWS = (5, 10, 20, 40, 60)
+DEFAULT_PRSA_WINDOWS = (10, 20)
+
+@lru_cache(maxsize=None)
+def _odi_registry(largest_prsa_window: int) -> FeatureRegistry:
+    """
+    :param largest_prsa_window: the PRSA window the shared anchor points are gathered for; the
+        features of larger windows are registered but cannot be computed
+    """
+    registry = FeatureRegistry()
+
+    # Producers are partials and bound methods rather than lambdas so that they can be sent to worker processes
+    # Every threshold shares one pass over the signal; results are pobm's DesaturationsMeasures / HypoxicBurdenMeasures ones
+    registry.add_producer("desaturations", partial(desaturations_multi, relative_thresholds=(3, 5), hard_thresholds=(83, 85, 90), CT_Threshold=90, CA_Baseline=90),
+                          label="desaturation and burden")
+    # Same results as pobm's ComplexityMeasures without its quadratic template matching
+    registry.add_producer("complexity", partial(complexity_measures, CTM_Threshold=0.25, DFA_Window=20, M_Sampen=3, R_Sampen=0.2, M_ApEn=2, R_ApEn=0.25),
+                          label="complexity")
+    # These have batch versions over a matrix of recordings, used by compute_batch
+    registry.add_producer("statistics", OverallGeneralMeasures(ZC_Baseline=90, percentile=1, M_Threshold=2, DI_Window=12).compute,
+                          label="statistical",
+                          compute_batch=partial(general_measures_batch, ZC_Baseline=90, percentile=1, M_Threshold=2, DI_Window=12))
+    # Every window shares one anchor point detection, and only the requested windows are computed; results are pobm's PRSAMeasures ones
+    registry.add_producer("prsa_anchors", partial(prsa_anchors, largest_window=largest_prsa_window), label="prsa anchor point",
+                          compute_batch=prsa_anchors_batch)
+    for window in PRSA_WINDOWS:
+        registry.add_producer(f"prsa_{window}", partial(prsa_window, PRSA_Window=window, K_AC=2), depends_on=["prsa_anchors"],
+                              label=f"prsa periodicity (window {window})",
+                              compute_batch=partial(prsa_window_batch, PRSA_Window=window, K_AC=2))
+    registry.add_producer("psd", PSDMeasures().compute, label="psd periodicity",
+                          compute_batch=psd_measures_batch)
+
+    desat_fields = ["DL_u", "DL_sd", "DA100_u", "DA100_sd", "DAmax_u", "DAmax_sd", "DD100_u", "DD100_sd",
+                    "DDmax_u", "DDmax_sd", "DS_u", "DS_sd", "TD_u", "TD_sd"]
+    hypoxic_fields = ["CA", "CT", "POD", "AODmax", "AOD100"]
+    # ---- Relative thresholds (3%, 5%) then hard thresholds (83%, 85%, 90%); ODI only for relative ones ----
+    for key in [("relative", 3), ("relative", 5), ("hard", 83), ("hard", 85), ("hard", 90)]:
+        fields = (["ODI"] if key[0] == "relative" else []) + desat_fields
+        for field in fields:
+            registry.add_feature(f"{field}_thr{key[1]}", "desaturations", _desat_field(key, 0, field))
+        for field in hypoxic_fields:
+            registry.add_feature(f"{field}_thr{key[1]}", "desaturations", _desat_field(key, 1, field))
+
+    # Statistical features of the SpO2 signal: mean, median, minimum, standard deviation, range (max - min),
+    # percentile value, % of time below median SpO2 - x%, number of zero-crossing points, delta index
+    for field in ["AV", "MED", "Min", "SD", "RG", "P", "M", "ZC", "DI"]:
+        registry.add_feature(field, "statistics", _field(field))
+
+    # PRSA features (Phase Rectified Signal Averaging): capacity, amplitude difference, overall slope,
+    # slope before and after the anchor point; and the autocorrelation of the signal
+    for window in PRSA_WINDOWS:
+        for field in ["PRSAc", "PRSAad", "PRSAos", "PRSAsb", "PRSAsa", "AC"]:
+            registry.add_feature(f"{field}_win{window}", f"prsa_{window}", _field(field))
+
+    # Power spectral density features: total amplitude, amplitude in a frequency band, their ratio, peak in the band
+    for field in ["PSD_total", "PSD_band", "PSD_ratio", "PSD_peak"]:
+        registry.add_feature(field, "psd", _field(field))
+
+    # Approximate entropy, Lempel-Ziv complexity, central tendency measure, sample entropy, detrended fluctuation analysis
+    for field in ["ApEn", "LZ", "CTM", "SampEn", "DFA"]:
+        registry.add_feature(field, "complexity", _field(field))
+
+    return registry
+
+# every feature; EngineerOdi computes with a registry whose anchor points fit the PRSA windows it selects
+ODI_FEATURES = _odi_registry(max(PRSA_WINDOWS))
+# the columns compute_single returns without feature_names, without and with complex_features
+DEFAULT_FEATURES = ODI_FEATURES.names(["desaturations", "statistics", "psd"] + [f"prsa_{window}" for window in DEFAULT_PRSA_WINDOWS])
+DEFAULT_COMPLEX_FEATURES = DEFAULT_FEATURES + ODI_FEATURES.names(["complexity"])
+
+class EngineerOdi(EngineerFeaturesInterface):
+    def __init__(self, feature_names: List[str] = None, family_workers: int = None, family_processes: bool = False):
+        # when set, only these columns (and the computations they need) are produced, whatever complex_features says
+        if feature_names is not None:
+            ODI_FEATURES.producers_for(feature_names)
+        self._feature_names = feature_names
+        # when set, compute_single runs the independent feature families (desaturation and burden, complexity,
+        # statistics, PRSA per window, PSD) concurrently on this many threads, or processes if family_processes
+        self._family_workers = family_workers
+        self._family_processes = family_processes
+
+    def compute_single(self, spo2: pd.Series, complex_features: bool=False) -> dict:
         """
-        Computes ODI3% from cleaned SpO2 signal.
+        Computes ODI and the other SpO2 features from a cleaned SpO2 signal.
         Args:
             spo2: Cleaned (filtered + interpolated) SpO2 signal
-            sampling_rate: Samples per second
-            drop_threshold: Desaturation threshold (default 3%)
-            min_duration: Minimum duration of desaturation (in seconds)
+            complex_features: Whether the default feature set includes the complexity features
         Returns:
-            ODI value = number of desats per hour
+            {feature name: value}, for the selected features or for every non-complexity
+            feature (plus the complexity ones if complex_features)
         """
-        light_green = Fore.LIGHTGREEN_EX
-        reset = Style.RESET_ALL
-        
-        desat_class_3_relative = DesaturationsMeasures(ODI_Threshold=3, threshold_method=DesatMethodEnum.Relative)
-        desat_class_5_relative = DesaturationsMeasures(ODI_Threshold=5, threshold_method=DesatMethodEnum.Relative)
-        desat_class_83_hard = DesaturationsMeasures(hard_threshold=83, threshold_method=DesatMethodEnum.Hard)
-        desat_class_85_hard = DesaturationsMeasures(hard_threshold=85, threshold_method=DesatMethodEnum.Hard)
-        desat_class_90_hard = DesaturationsMeasures(hard_threshold=90, threshold_method=DesatMethodEnum.Hard)
-        # Compute the biomarkers with known desaturation locations
-        print(f"{light_green}[DEBUG]{reset} Computing desaturation features")
-        results_desat_3_relative = desat_class_3_relative.compute(spo2)
-        results_desat_5_relative = desat_class_5_relative.compute(spo2)
-        results_desat_83_hard = desat_class_83_hard.compute(spo2)
-        results_desat_85_hard = desat_class_85_hard.compute(spo2)
-        results_desat_90_hard = desat_class_90_hard.compute(spo2)
-        print(f"{light_green}[DEBUG]{reset} Completed computing desaturation features")
-
-        hypoxic_class_3_relative = HypoxicBurdenMeasures(results_desat_3_relative.begin, results_desat_3_relative.end, CT_Threshold=90, CA_Baseline=90)
-        hypoxic_class_5_relative = HypoxicBurdenMeasures(results_desat_5_relative.begin, results_desat_5_relative.end, CT_Threshold=90, CA_Baseline=90)
-        hypoxic_class_83_hard = HypoxicBurdenMeasures(results_desat_83_hard.begin, results_desat_83_hard.end, CT_Threshold=90, CA_Baseline=90)
-        hypoxic_class_85_hard = HypoxicBurdenMeasures(results_desat_85_hard.begin, results_desat_85_hard.end, CT_Threshold=90, CA_Baseline=90)
-        hypoxic_class_90_hard = HypoxicBurdenMeasures(results_desat_90_hard.begin, results_desat_90_hard.end, CT_Threshold=90, CA_Baseline=90)
-        # Compute the biomarkers
-        print(f"{light_green}[DEBUG]{reset} Computing burden features")
-        results_hypoxic_3_relative = hypoxic_class_3_relative.compute(spo2)
-        results_hypoxic_2_relative = hypoxic_class_5_relative.compute(spo2)
-        results_hypoxic_83_hard = hypoxic_class_83_hard.compute(spo2)
-        results_hypoxic_85_hard = hypoxic_class_85_hard.compute(spo2)
-        results_hypoxic_90_hard = hypoxic_class_90_hard.compute(spo2)
-        print(f"{light_green}[DEBUG]{reset} Completed computing burden features")
-
-        if complex_features:
-            complexity_class = ComplexityMeasures(CTM_Threshold=0.25, DFA_Window=20, M_Sampen=3, R_Sampen=0.2, M_ApEn=2, R_ApEn=0.25)
-            # Compute the biomarkers
-            print(f"{light_green}[DEBUG]{reset} Computing complexity features")
-            results_complexity = complexity_class.compute(spo2)
-            print(f"{light_green}[DEBUG]{reset} Completed computing complexity features")
-
-        statistics_class = OverallGeneralMeasures(ZC_Baseline=90, percentile=1, M_Threshold=2, DI_Window=12)
-        # Compute the biomarkers
-        print(f"{light_green}[DEBUG]{reset} Computing statistical features")
-        results_statistics = statistics_class.compute(spo2)
-        print(f"{light_green}[DEBUG]{reset} Completed computing statistical features")
-
-        prsa_class_10 = PRSAMeasures(PRSA_Window=10, K_AC=2)
-        prsa_class_20 = PRSAMeasures(PRSA_Window=20, K_AC=2)
-        # Compute the biomarkers
-        print(f"{light_green}[DEBUG]{reset} Computing prsa periodicity features")
-        results_PRSA_10 = prsa_class_10.compute(spo2)
-        results_PRSA_20 = prsa_class_20.compute(spo2)
-        print(f"{light_green}[DEBUG]{reset} Completed computing prsa periodicity features")
-
-        psd_class = PSDMeasures()
-        # Compute the biomarkers
-        print(f"{light_green}[DEBUG]{reset} Computing psd periodicity features")
-        results_PSD = psd_class.compute(spo2)
-        print(f"{light_green}[DEBUG]{reset} Completed computing psd periodicity features")
-
-        features = {
-            # ---- Relative thresholds ----
-            # 3%
-            "ODI_thr3": results_desat_3_relative.ODI,
-            "DL_u_thr3": results_desat_3_relative.DL_u,
-            "DL_sd_thr3": results_desat_3_relative.DL_sd,
-            "DA100_u_thr3": results_desat_3_relative.DA100_u,
-            "DA100_sd_thr3": results_desat_3_relative.DA100_sd,
-            "DAmax_u_thr3": results_desat_3_relative.DAmax_u,
-            "DAmax_sd_thr3": results_desat_3_relative.DAmax_sd,
-            "DD100_u_thr3": results_desat_3_relative.DD100_u,
-            "DD100_sd_thr3": results_desat_3_relative.DD100_sd,
-            "DDmax_u_thr3": results_desat_3_relative.DDmax_u,
-            "DDmax_sd_thr3": results_desat_3_relative.DDmax_sd,
-            "DS_u_thr3": results_desat_3_relative.DS_u,
-            "DS_sd_thr3": results_desat_3_relative.DS_sd,
-            "TD_u_thr3": results_desat_3_relative.TD_u,
-            "TD_sd_thr3": results_desat_3_relative.TD_sd,
-
-            "CA_thr3": results_hypoxic_3_relative.CA,
-            "CT_thr3": results_hypoxic_3_relative.CT,
-            "POD_thr3": results_hypoxic_3_relative.POD,
-            "AODmax_thr3": results_hypoxic_3_relative.AODmax,
-            "AOD100_thr3": results_hypoxic_3_relative.AOD100,
-
-            # 5%
-            "ODI_thr5": results_desat_5_relative.ODI,
-            "DL_u_thr5": results_desat_5_relative.DL_u,
-            "DL_sd_thr5": results_desat_5_relative.DL_sd,
-            "DA100_u_thr5": results_desat_5_relative.DA100_u,
-            "DA100_sd_thr5": results_desat_5_relative.DA100_sd,
-            "DAmax_u_thr5": results_desat_5_relative.DAmax_u,
-            "DAmax_sd_thr5": results_desat_5_relative.DAmax_sd,
-            "DD100_u_thr5": results_desat_5_relative.DD100_u,
-            "DD100_sd_thr5": results_desat_5_relative.DD100_sd,
-            "DDmax_u_thr5": results_desat_5_relative.DDmax_u,
-            "DDmax_sd_thr5": results_desat_5_relative.DDmax_sd,
-            "DS_u_thr5": results_desat_5_relative.DS_u,
-            "DS_sd_thr5": results_desat_5_relative.DS_sd,
-            "TD_u_thr5": results_desat_5_relative.TD_u,
-            "TD_sd_thr5": results_desat_5_relative.TD_sd,
-
-            "CA_thr5": results_hypoxic_2_relative.CA,
-            "CT_thr5": results_hypoxic_2_relative.CT,
-            "POD_thr5": results_hypoxic_2_relative.POD,
-            "AODmax_thr5": results_hypoxic_2_relative.AODmax,
-            "AOD100_thr5": results_hypoxic_2_relative.AOD100,
-
-            # ---- Hard thresholds ----
-            # 83%
-            "DL_u_thr83": results_desat_83_hard.DL_u,
-            "DL_sd_thr83": results_desat_83_hard.DL_sd,
-            "DA100_u_thr83": results_desat_83_hard.DA100_u,
-            "DA100_sd_thr83": results_desat_83_hard.DA100_sd,
-            "DAmax_u_thr83": results_desat_83_hard.DAmax_u,
-            "DAmax_sd_thr83": results_desat_83_hard.DAmax_sd,
-            "DD100_u_thr83": results_desat_83_hard.DD100_u,
-            "DD100_sd_thr83": results_desat_83_hard.DD100_sd,
-            "DDmax_u_thr83": results_desat_83_hard.DDmax_u,
-            "DDmax_sd_thr83": results_desat_83_hard.DDmax_sd,
-            "DS_u_thr83": results_desat_83_hard.DS_u,
-            "DS_sd_thr83": results_desat_83_hard.DS_sd,
-            "TD_u_thr83": results_desat_83_hard.TD_u,
-            "TD_sd_thr83": results_desat_83_hard.TD_sd,
-
-            "CA_thr83": results_hypoxic_83_hard.CA,
-            "CT_thr83": results_hypoxic_83_hard.CT,
-            "POD_thr83": results_hypoxic_83_hard.POD,
-            "AODmax_thr83": results_hypoxic_83_hard.AODmax,
-            "AOD100_thr83": results_hypoxic_83_hard.AOD100,
-
-            # 85%
-            "DL_u_thr85": results_desat_85_hard.DL_u,
-            "DL_sd_thr85": results_desat_85_hard.DL_sd,
-            "DA100_u_thr85": results_desat_85_hard.DA100_u,
-            "DA100_sd_thr85": results_desat_85_hard.DA100_sd,
-            "DAmax_u_thr85": results_desat_85_hard.DAmax_u,
-            "DAmax_sd_thr85": results_desat_85_hard.DAmax_sd,
-            "DD100_u_thr85": results_desat_85_hard.DD100_u,
-            "DD100_sd_thr85": results_desat_85_hard.DD100_sd,
-            "DDmax_u_thr85": results_desat_85_hard.DDmax_u,
-            "DDmax_sd_thr85": results_desat_85_hard.DDmax_sd,
-            "DS_u_thr85": results_desat_85_hard.DS_u,
-            "DS_sd_thr85": results_desat_85_hard.DS_sd,
-            "TD_u_thr85": results_desat_85_hard.TD_u,
-            "TD_sd_thr85": results_desat_85_hard.TD_sd,
-
-            "CA_thr85": results_hypoxic_85_hard.CA,
-            "CT_thr85": results_hypoxic_85_hard.CT,
-            "POD_thr85": results_hypoxic_85_hard.POD,
-            "AODmax_thr85": results_hypoxic_85_hard.AODmax,
-            "AOD100_thr85": results_hypoxic_85_hard.AOD100,
-
-            # 90%
-            "DL_u_thr90": results_desat_90_hard.DL_u,
-            "DL_sd_thr90": results_desat_90_hard.DL_sd,
-            "DA100_u_thr90": results_desat_90_hard.DA100_u,
-            "DA100_sd_thr90": results_desat_90_hard.DA100_sd,
-            "DAmax_u_thr90": results_desat_90_hard.DAmax_u,
-            "DAmax_sd_thr90": results_desat_90_hard.DAmax_sd,
-            "DD100_u_thr90": results_desat_90_hard.DD100_u,
-            "DD100_sd_thr90": results_desat_90_hard.DD100_sd,
-            "DDmax_u_thr90": results_desat_90_hard.DDmax_u,
-            "DDmax_sd_thr90": results_desat_90_hard.DDmax_sd,
-            "DS_u_thr90": results_desat_90_hard.DS_u,
-            "DS_sd_thr90": results_desat_90_hard.DS_sd,
-            "TD_u_thr90": results_desat_90_hard.TD_u,
-            "TD_sd_thr90": results_desat_90_hard.TD_sd,
-
-            "CA_thr90": results_hypoxic_90_hard.CA,
-            "CT_thr90": results_hypoxic_90_hard.CT,
-            "POD_thr90": results_hypoxic_90_hard.POD,
-            "AODmax_thr90": results_hypoxic_90_hard.AODmax,
-            "AOD100_thr90": results_hypoxic_90_hard.AOD100,
-
-            # Statistical features of the SpO2 signal
-            "AV": results_statistics.AV,                   # Mean (average) SpO2
-            "MED": results_statistics.MED,                 # Median SpO2
-            "Min": results_statistics.Min,                 # Minimum SpO2 value
-            "SD": results_statistics.SD,                   # Standard deviation of SpO2
-            "RG": results_statistics.RG,                   # SpO2 range (max - min)
-            "P": results_statistics.P,                     # Percentile value (e.g., 5th or 95th)
-            "M": results_statistics.M,                     # % of time below median SpO2 - x%
-            "ZC": results_statistics.ZC,                   # Number of zero-crossing points
-            "DI": results_statistics.DI,                   # Delta Index
-
-            # PRSA features (Phase Rectified Signal Averaging)
-            "PRSAc_win10": results_PRSA_10.PRSAc,             # PRSA capacity
-            "PRSAad_win10": results_PRSA_10.PRSAad,           # PRSA amplitude difference
-            "PRSAos_win10": results_PRSA_10.PRSAos,           # PRSA overall slope
-            "PRSAsb_win10": results_PRSA_10.PRSAsb,           # PRSA slope before anchor point
-            "PRSAsa_win10": results_PRSA_10.PRSAsa,           # PRSA slope after anchor point
-
-            # Autocorrelation
-            "AC_win10": results_PRSA_10.AC,                   # Autocorrelation of the signal
-
-            # PRSA features (Phase Rectified Signal Averaging)
-            "PRSAc_win20": results_PRSA_20.PRSAc,             # PRSA capacity
-            "PRSAad_win20": results_PRSA_20.PRSAad,           # PRSA amplitude difference
-            "PRSAos_win20": results_PRSA_20.PRSAos,           # PRSA overall slope
-            "PRSAsb_win20": results_PRSA_20.PRSAsb,           # PRSA slope before anchor point
-            "PRSAsa_win20": results_PRSA_20.PRSAsa,           # PRSA slope after anchor point
-
-            # Autocorrelation
-            "AC_win20": results_PRSA_20.AC,                   # Autocorrelation of the signal
-
-            # Power spectral density features
-            "PSD_total": results_PSD.PSD_total,     # Total amplitude of the power spectrum
-            "PSD_band": results_PSD.PSD_band,       # Amplitude in a specific frequency band
-            "PSD_ratio": results_PSD.PSD_ratio,     # Ratio PSD_band / PSD_total
-            "PSD_peak": results_PSD.PSD_peak,       # Peak value in desired frequency band
-        }
-
-        if complex_features:
-            features["ApEn"] = results_complexity.ApEn      # Approximate entropy
-            features["LZ"] = results_complexity.LZ          # Lempel-Ziv complexity
-            features["CTM"] = results_complexity.CTM        # Central tendency measure
-            features["SampEn"] = results_complexity.SampEn  # Sample entropy
-            features["DFA"] = results_complexity.DFA        # Detrended fluctuation analysis   
+        names = self._selected(complex_features)
+        if not self._family_workers:
+            return self._registry(names).compute(spo2, names, log=_debug)
+        executor = ProcessPoolExecutor if self._family_processes else ThreadPoolExecutor
+        with executor(max_workers=self._family_workers) as executor:
+            return self._registry(names).compute(spo2, names, executor=executor, log=_debug)
+
+    def compute_batch(self, spo2: np.ndarray, nsrr_ids: List[str], complex_features: bool=False) -> pd.DataFrame:
+        """
+        Computes the same features as compute_single for many equal-length recordings at once.
+        The statistical, PRSA and PSD features are computed with array operations over the whole
+        matrix; desaturation, burden and complexity features are still computed per recording.
+        Args:
+            spo2: (N, L) cleaned SpO2 signals, one recording per row (e.g. N x CLEANED_SIGNAL_LENGTH)
+            nsrr_ids: the N recording ids
+            complex_features: Whether the default feature set includes the complexity features
+        Returns:
+            DataFrame indexed by nsrrid, with the columns compute_single returns
+        """
+        spo2 = np.asarray(spo2, dtype=np.float64)
+        if spo2.ndim != 2 or spo2.shape[0] != len(nsrr_ids):
+            raise ValueError(f"Expected one row per nsrrid ({len(nsrr_ids)}), got an array of shape {spo2.shape}")
+        names = self._selected(complex_features)
+        return self._registry(names).compute_batch(spo2, nsrr_ids, names, log=_debug)
+
+    def _selected(self, complex_features: bool) -> List[str]:
+        if self._feature_names is not None:
+            return self._feature_names
+        return DEFAULT_COMPLEX_FEATURES if complex_features else DEFAULT_FEATURES
+
+    @staticmethod
+    def _registry(names: List[str]) -> FeatureRegistry:
+        # anchor points gathered for the largest PRSA window the features need, not for every computable one
+        producers = ODI_FEATURES.producers_for(names)
+        windows = [window for window in PRSA_WINDOWS if f"prsa_{window}" in producers]
+        return _odi_registry(max(windows, default=min(PRSA_WINDOWS)))
 
-        return features   
-        
 class EngineerFeatures(EngineerFeaturesInterface):
     def __init__(self, feature_engineer: EngineerFeaturesInterface):
         self._feature_engineer = feature_engineer
@@ -265,3 +173,10 @@ class EngineerFeatures(EngineerFeaturesInterface):
                     spo2=spo2,
                     complex_features=complex_features,
                 )
+
+    def compute_batch(self, spo2: np.ndarray, nsrr_ids: List[str], complex_features: bool) -> pd.DataFrame:
+        return self._feature_engineer.compute_batch(
+                    spo2=spo2,
+                    nsrr_ids=nsrr_ids,
+                    complex_features=complex_features,
+                )
@@ -0,0 +1,118 @@
+"""
+Author: Eshan Jayasundara
+Co-Author 1:
+Co-Author 2:
+Last Modified: 2025/06/29 by Eshan Jayasundara
+"""
+
+from abc import ABC, abstractmethod
+import warnings
+import numpy as np
+import pandas as pd
+from scipy.ndimage import minimum_filter1d
+from sleepdataspo2.feature_kernels import desaturations_multi
+
+class EpochFeaturesInterface(ABC):
+    @abstractmethod
+    def compute_epochs(self, spo2: pd.Series, window: int, hop: int) -> pd.DataFrame:
+        pass
+
+class SlidingEpochFeatures(EpochFeaturesInterface):
+    """
+    Per-epoch features of a cleaned 1 Hz SpO2 signal over a sliding window.
+
+    Every statistic is a running quantity updated as the window advances rather than a
+    recomputation of each window: sums and counts are differences of prefix sums (what
+    enters minus what leaves), the minimum is scipy's O(N) sliding minimum, and the
+    desaturation events and delta index blocks are found once for the whole night and
+    counted per window. A night of N samples costs O(N) whatever the window and hop.
+
+    Desaturations are detected on the whole night, so an event is not cut by epoch edges,
+    and DI blocks lie on the night's DI_Window grid; for windows and hops that are multiples
+    of DI_Window this is pobm's delta index of the epoch.
+    """
+    def __init__(self, relative_threshold: int = 3, CT_Threshold: float = 90, DI_Window: int = 12):
+        self._relative_threshold = relative_threshold
+        self._ct_threshold = CT_Threshold
+        self._di_window = DI_Window
+
+    def compute_epochs(self, spo2: pd.Series, window: int = 30, hop: int = None) -> pd.DataFrame:
+        """
+        Args:
+            spo2: Cleaned (filtered + interpolated) 1 Hz SpO2 signal
+            window: Epoch length in samples (seconds), e.g. 30 or 300
+            hop: Samples between consecutive epoch starts (defaults to window, i.e. no overlap)
+        Returns:
+            One row per full epoch: start (s, int32) and float32 ODI (events/h of desaturations starting in
+            the epoch), CT90 (% of samples <= CT_Threshold), AV, Min and DI (mean absolute change
+            between consecutive DI_Window block means inside the epoch)
+        """
+        hop = window if hop is None else hop
+        if window <= 0 or hop <= 0:
+            raise ValueError(f"window ({window}) and hop ({hop}) should be strictly positive")
+        signal = np.asarray(spo2, dtype=np.float64)
+        n = signal.shape[0]
+        starts = np.arange(0, n - window + 1, hop)
+        ends = starts + window
+
+        valid = ~np.isnan(signal)
+        values = np.where(valid, signal, 0)
+        with np.errstate(invalid="ignore"):
+            below = signal <= self._ct_threshold
+
+        def running(x):
+            # sum of x over every epoch: prefix[end] - prefix[start]
+            prefix = np.concatenate([[0], np.cumsum(x, dtype=np.float64)])
+            return prefix[ends] - prefix[starts]
+
+        count = running(valid)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            av = running(values) / count
+        ct90 = 100 * running(below) / window
+
+        # sliding minimum (NaN skipped); minimum_filter1d centres the window on sample start + window // 2
+        minimum = minimum_filter1d(np.where(valid, signal, np.inf), size=window, mode="constant", cval=np.inf)[starts + window // 2]
+        minimum = np.where(np.isinf(minimum), np.nan, minimum)
+
+        # desaturations of the whole night, counted by the epoch their start falls in
+        desat, _ = desaturations_multi(signal, relative_thresholds=(self._relative_threshold,), hard_thresholds=())[("relative", self._relative_threshold)]
+        begins = np.zeros(n)
+        if len(desat.begin):
+            np.add.at(begins, np.clip(np.asarray(desat.begin, dtype=np.int64), 0, n - 1), 1)
+        odi = running(begins) * 3600 / window
+
+        # delta index on the night's DI_Window grid: the changes between neighbouring blocks that both lie inside the epoch
+        blocks = n // self._di_window
+        with warnings.catch_warnings():
+            # all-NaN blocks are expected
+            warnings.simplefilter("ignore", RuntimeWarning)
+            block_means = np.nanmean(signal[:blocks * self._di_window].reshape(blocks, self._di_window), axis=1)
+        changes = np.abs(np.diff(block_means))
+        changes_valid = ~np.isnan(changes)
+        change_prefix = np.concatenate([[0], np.cumsum(np.where(changes_valid, changes, 0))])
+        change_count = np.concatenate([[0], np.cumsum(changes_valid)])
+        # change k is between blocks k and k + 1, i.e. samples k * DI_Window .. (k + 2) * DI_Window
+        first = np.minimum(-(-starts // self._di_window), len(changes))
+        last = np.clip(ends // self._di_window - 1, first, len(changes))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            di = (change_prefix[last] - change_prefix[first]) / (change_count[last] - change_count[first])
+
+        return pd.DataFrame({
+            "start": starts.astype(np.int32),
+            "ODI": odi.astype(np.float32),
+            "CT90": ct90.astype(np.float32),
+            "AV": av.astype(np.float32),
+            "Min": minimum.astype(np.float32),
+            "DI": di.astype(np.float32),
+        }, index=pd.RangeIndex(starts.shape[0], name="epoch"))
+
+class EpochFeatures(EpochFeaturesInterface):
+    def __init__(self, epoch_features: EpochFeaturesInterface):
+        self._epoch_features = epoch_features
+
+    def compute_epochs(self, spo2: pd.Series, window: int, hop: int) -> pd.DataFrame:
+        return self._epoch_features.compute_epochs(
+                    spo2=spo2,
+                    window=window,
+                    hop=hop,
+                )
@@ -0,0 +1,615 @@
+"""
+Author: Eshan Jayasundara
+Co-Author 1:
+Co-Author 2:
+Last Modified: 2025/06/29 by Eshan Jayasundara
+"""
+
+from typing import Dict, List, Tuple
+from bisect import bisect_left
+import warnings
+from types import SimpleNamespace
+import numpy as np
+from scipy.signal import welch
+from pobm._ResultsClasses import DesaturationsMeasuresResults, HypoxicBurdenMeasuresResults, ComplexityMeasuresResults, PRSAResults
+from pobm._ErrorHandler import _check_len_ApEn_, _check_window_delta_, _check_fragment_PRSA_
+
+# Faster versions of the `pobm.obm` measures used by `EngineerOdi`, returning pobm's result classes
+# with the same values (up to floating point rounding).
+
+def _descent_scan(signal: np.ndarray) -> Tuple[List[int], List[float], List[int]]:
+    """
+    Threshold-independent part of pobm's relative desaturation detector, found once for every ODI threshold.
+
+    :return: (starts, drops, next_fall_end): the samples above 25 % that are at least 1 below the previous
+             one (candidate A points, the detector skips every other sample), the size of that drop, and for
+             each sample the first one from there that does not keep falling (NaN breaks a descent, as in pobm)
+    """
+    n = signal.shape[0]
+    with np.errstate(invalid="ignore"):
+        step = signal[1:] - signal[:-1]
+        falling = (signal[1:] > 25) & (step <= -1)
+        breaks = np.flatnonzero(~(signal[1:] <= signal[:-1])) + 1
+    starts = np.flatnonzero(falling) + 1
+    # index of the first break at or after each sample, n when the signal falls until its end
+    breaks = np.append(breaks, n)
+    next_fall_end = breaks[np.searchsorted(breaks, np.arange(n + 1))]
+    return starts.tolist(), (-step[starts - 1]).tolist(), next_fall_end.tolist()
+
+
+def _relative_events(data: list, scan: Tuple[List[int], List[float], List[int]], thres: int, desat_max_length: int) -> Tuple[List[int], List[int], List[int]]:
+    # pobm's DesaturationsMeasures.__sc_desaturations on a Python list, returning (aa, bb, cc). The A points
+    # and the falls after them come from the shared `_descent_scan`, so only the candidates of this threshold
+    # and the recovery after each desaturation are walked sample by sample
+    starts, drops, next_fall_end = scan
+    candidates = [aa for aa, drop in zip(starts, drops) if drop <= thres]
+    lg_dat = len(data)
+    table_desat_aa, table_desat_bb, table_desat_cc = [], [], []
+    aa = 1
+    i = 0
+    while True:
+        # pobm steps aa one sample at a time; samples that are not candidates only move it on
+        i = bisect_left(candidates, aa, i)
+        if i == len(candidates):
+            break
+        aa = candidates[i]
+        if aa + 10 > lg_dat:
+            break
+        # B: the first sample of the fall after A that is `thres` below it, before the fall ends
+        fall_end = next_fall_end[aa + 1]
+        bb = aa + 1
+        while bb < fall_end and data[aa] - data[bb] < thres:
+            bb += 1
+        if bb >= lg_dat - 1:
+            # the fall reaches the end of the recording
+            break
+        if bb == fall_end:
+            aa = aa + 1
+            continue
+        # C: recovery to within 1 of A, or by `thres` from the lowest point, at least 10 samples after A
+        cc = bb + 1
+        if cc >= lg_dat:
+            break
+        while True:
+            if ((data[aa] - data[cc]) <= 1 or (data[cc] - data[bb]) >= thres) and cc - aa >= 10:
+                if cc - aa <= desat_max_length:
+                    table_desat_aa.append(aa)
+                    table_desat_bb.append(bb)
+                    table_desat_cc.append(cc)
+                aa = cc + 1
+                break
+            cc = cc + 1
+            if cc > lg_dat - 1:
+                return table_desat_aa, table_desat_bb, table_desat_cc
+            if data[bb] >= data[cc - 1]:
+                bb = cc - 1
+    return table_desat_aa, table_desat_bb, table_desat_cc
+
+
+def _d_points(data: list, table_desat_aa: List[int], table_desat_cc: List[int], desat_max_length: int) -> List[int]:
+    # pobm's DesaturationsMeasures.__find_d_points
+    table_desat_dd = []
+    for aa, cc in zip(table_desat_aa, table_desat_cc):
+        if data[cc] >= data[aa] - 1:
+            table_desat_dd.append(cc)
+            continue
+        for j in range(cc - aa, desat_max_length):
+            if aa + j < len(data) and data[aa + j] >= data[aa] - 1:
+                table_desat_dd.append(aa + j)
+                break
+        else:
+            table_desat_dd.append(min(aa + desat_max_length, len(data) - 1))
+    return table_desat_dd
+
+
+def _hard_events(signal: np.ndarray, hard_threshold: float) -> Tuple[List[int], List[int]]:
+    # pobm's DesaturationsMeasures.__hard_threshold_detector: crossings found with array
+    # comparisons (NaN compares False, like the skipped samples), then the begin/end alternation
+    down = np.flatnonzero((signal[:-1] >= hard_threshold) & (signal[1:] < hard_threshold)) + 1
+    up = np.flatnonzero((signal[:-1] < hard_threshold) & (signal[1:] >= hard_threshold)) + 1
+    begin, end = [], []
+    turn_begin = True
+    d = u = 0
+    while d < down.shape[0] or u < up.shape[0]:
+        if u >= up.shape[0] or (d < down.shape[0] and down[d] < up[u]):
+            if turn_begin:
+                begin.append(int(down[d]))
+                turn_begin = False
+            d += 1
+        else:
+            if not turn_begin:
+                end.append(int(up[u]))
+                turn_begin = True
+            u += 1
+    if not turn_begin:
+        begin = begin[:-1]
+    return begin, end
+
+
+def _group_meta_desat(signal: np.ndarray, begin: List[int], end: List[int], min_dist_meta_event: int=0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # pobm's DesaturationsMeasures.__group_meta_desat followed by __remove_small_desats (desat_min_length=0),
+    # kept step by step: pobm numbers the meta events in an int8 array, so past 127 of them the numbers wrap
+    # around and only as many events as distinct numbers survive; the features depend on that
+    end_before = - min_dist_meta_event - 5
+    new_idx_desat = []
+    count_meta_desat = -1
+    for begin_index, end_index in zip(begin, end):
+        if begin_index - end_before > min_dist_meta_event:
+            count_meta_desat += 1
+        new_idx_desat.append((count_meta_desat + 128) % 256 - 128)
+        end_before = end_index
+
+    new_begin, new_end, new_min = [0] * len(begin), [0] * len(begin), [0] * len(begin)
+    curr_meta_desat = 0
+    begin_inserted = False
+    for idx_desat, idx_meta_desat in enumerate(new_idx_desat):
+        if idx_meta_desat != curr_meta_desat:
+            curr_meta_desat += 1
+            begin_inserted = False
+        if not begin_inserted:
+            new_begin[idx_meta_desat] = begin[idx_desat]
+            begin_inserted = True
+        new_end[idx_meta_desat] = max(end[idx_desat], new_end[idx_meta_desat])
+        new_min[idx_meta_desat] = new_begin[idx_meta_desat] + int(np.argmin(signal[new_begin[idx_meta_desat]:new_end[idx_meta_desat]]))
+
+    groups = [(b, e, m) for b, e, m, _ in zip([b for b in new_begin if b != 0], [e for e in new_end if e != 0],
+                                              [m for m in new_min if m != 0], set(new_idx_desat)) if e - b > 0]
+    return (np.array([g[0] for g in groups], dtype=int), np.array([g[1] for g in groups], dtype=int),
+            np.array([g[2] for g in groups], dtype=int))
+
+
+def _slope(time: np.ndarray, values: np.ndarray) -> float:
+    # slope of np.polyfit(time, values, 1) in closed form
+    if time.shape[0] < 2:
+        try:
+            return np.polyfit(np.int64(time), values, 1)[0]
+        except Exception:
+            return np.nan
+    time = time - time.mean()
+    return float(np.sum(time * (values - values.mean())) / np.sum(time * time))
+
+
+def _event_measures(signal: np.ndarray, data: list, begin: np.ndarray, end: np.ndarray, min_desat: np.ndarray, ca: float, ct: float) -> Tuple[DesaturationsMeasuresResults, HypoxicBurdenMeasuresResults]:
+    # pobm's DesaturationsMeasures.__get_desaturation_features and HypoxicBurdenMeasures.__comp_hypoxic
+    # on the same events; each event only touches its own samples, from `data` (the signal as a list)
+    # when there is no NaN to skip
+    n = signal.shape[0]
+    if begin.shape[0] == 0:
+        return (DesaturationsMeasuresResults(0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, [], []),
+                HypoxicBurdenMeasuresResults(ca, ct, 0.0, 0.0, 0.0))
+
+    m = begin.shape[0]
+    length, int_100, int_max = np.empty(m), np.empty(m), np.empty(m)
+    depth_100, depth_max, slope = np.empty(m), np.empty(m), np.full(m, np.nan)
+    starts, valid = [], np.zeros(m, dtype=bool)
+    with warnings.catch_warnings():
+        # all-NaN slices and empty means are expected, as in pobm
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for i, (b, e) in enumerate(zip(begin, end)):
+            segment = signal[max(b, 0):min(e, n - 1) + 1]
+            if segment.shape[0] == 0:
+                continue
+            valid[i] = True
+            starts.append(b)
+            length[i] = e - b
+            if data is not None:
+                segment = data[max(b, 0):min(e, n - 1) + 1]
+                seg_min, seg_max, seg_sum = min(segment), max(segment), sum(segment)
+                int_100[i] = 100 * len(segment) - seg_sum
+                int_max[i] = seg_max * len(segment) - seg_sum
+                idx_max = segment.index(seg_max)
+                idx_min = len(segment) - 1 - segment[::-1].index(seg_min)
+            else:
+                seg_min, seg_max = np.nanmin(segment), np.nanmax(segment)
+                int_100[i] = np.nansum(100 - segment)
+                int_max[i] = np.nansum(seg_max - segment)
+                idx_max = np.flatnonzero(segment == seg_max)[0]
+                idx_min = np.flatnonzero(segment == seg_min)[-1]
+            depth_100[i] = 100 - seg_min
+            depth_max[i] = seg_max - seg_min
+            # only from the first maximum to the last minimum; a maximum after the minimum leaves no slope
+            if idx_min >= idx_max:
+                slope[i] = _slope(np.arange(idx_max, idx_min + 1) + max(b, 0), np.asarray(segment[idx_max:idx_min + 1], dtype=np.float64))
+
+        burden = HypoxicBurdenMeasuresResults(ca, ct, 0.0, 0.0, 0.0)
+        if not valid.any():
+            desat = DesaturationsMeasuresResults(m / n * 3600, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, begin, end)
+            return desat, burden
+        diff_desats = np.abs(np.diff(np.array(starts)))
+        min_to_begin, end_to_min = (min_desat - begin)[valid], (end - min_desat)[valid]
+        desat = DesaturationsMeasuresResults(
+            m / n * 3600,
+            float(np.nanmean(length[valid])), float(np.nanstd(length[valid])),
+            float(np.nanmean(int_100[valid])), float(np.nanstd(int_100[valid])),
+            float(np.nanmean(int_max[valid])), float(np.nanstd(int_max[valid])),
+            float(np.nanmean(depth_100[valid])), float(np.nanstd(depth_100[valid])),
+            float(np.nanmean(depth_max[valid])), float(np.nanstd(depth_max[valid])),
+            float(np.nanmean(slope[valid])), float(np.nanstd(slope[valid])),
+            float(np.nanmean(diff_desats)), float(np.nanstd(diff_desats)),
+            float(np.nanmean(min_to_begin)), float(np.nanstd(min_to_begin)),
+            float(np.nanmean(end_to_min)), float(np.nanstd(end_to_min)),
+            begin, end,
+        )
+        burden.POD = np.nansum(length[valid]) / n
+        burden.AODmax = np.nansum(int_max[valid]) / n
+        burden.AOD100 = np.nansum(int_100[valid]) / n
+    return desat, burden
+
+
+def desaturations_multi(spo2, relative_thresholds=(3, 5), hard_thresholds=(83, 85, 90), CT_Threshold: float=90,
+                        CA_Baseline: float=90, desat_max_length: int=90) -> Dict[Tuple[str, float], Tuple[DesaturationsMeasuresResults, HypoxicBurdenMeasuresResults]]:
+    """
+    `DesaturationsMeasures` and `HypoxicBurdenMeasures` for several thresholds in one call.
+
+    The signal is converted once. The candidate A points of the relative detector and the end of
+    the fall after every sample are found once with array operations and shared by all relative
+    thresholds, which then only walk their own candidates and recoveries on a Python list. The
+    hard detector finds every threshold crossing with array comparisons, and per-event statistics
+    only slice the event instead of masking the whole signal. CA and CT do not depend on the
+    events, so they are computed once for all thresholds.
+
+    :param spo2: cleaned 1 Hz SpO2 signal
+    :return: {("relative", 3): (desaturation results, burden results), ("hard", 90): (...), ...}
+    """
+    signal = np.asarray(spo2, dtype=np.float64)
+    n = signal.shape[0]
+    with np.errstate(invalid="ignore"):
+        below = signal[signal < CA_Baseline]
+        ca = float(np.sum(CA_Baseline - below)) / n
+        ct = 100 * np.count_nonzero(signal <= CT_Threshold) / n
+
+    results = {}
+    data = signal.tolist()
+    events_data = None if np.isnan(signal).any() else data
+    scan = _descent_scan(signal)
+    for threshold in relative_thresholds:
+        aa, bb, cc = _relative_events(data, scan, threshold, desat_max_length)
+        dd = _d_points(data, aa, cc, desat_max_length)
+        begin, end, min_desat = _group_meta_desat(signal, aa, dd)
+        results[("relative", threshold)] = _event_measures(signal, events_data, begin, end, min_desat, ca, ct)
+    for threshold in hard_thresholds:
+        begin, end = _hard_events(signal, threshold)
+        begin, end, min_desat = _group_meta_desat(signal, begin, end)
+        results[("hard", threshold)] = _event_measures(signal, events_data, begin, end, min_desat, ca, ct)
+    return results
+
+
+def _templates(signal: np.ndarray, m: int, count: int) -> np.ndarray:
+    # the first `count` templates signal[i:i + m], as rows
+    return np.lib.stride_tricks.sliding_window_view(signal, m)[:count]
+
+
+def _neighbour_counts(templates: np.ndarray, r: float, strict: bool) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Number of templates within Chebyshev distance `r` (`< r` if `strict`, else `<= r`) of each template.
+
+    Templates containing NaN match nothing and are counted as 0. Identical templates are
+    grouped first (a cleaned SpO2 night has few distinct ones), then each group only compares
+    with the groups whose first value is within `r`, found by binary search on the sorted values.
+
+    :return: (counts per template, True where the template has no NaN)
+    """
+    valid = ~np.isnan(templates).any(axis=1)
+    counts = np.zeros(templates.shape[0], dtype=np.int64)
+    if not valid.any():
+        return counts, valid
+    unique, inverse, weights = np.unique(templates[valid], axis=0, return_inverse=True, return_counts=True)
+    # np.unique sorts rows, so the first column is sorted; the search window is widened slightly
+    # and the exact distance test below decides, as in pobm
+    first = unique[:, 0]
+    slack = r * (1 + 1e-9) + 1e-12
+    lows = np.searchsorted(first, first - slack, side="left")
+    highs = np.searchsorted(first, first + slack, side="right")
+    unique_counts = np.empty(unique.shape[0], dtype=np.int64)
+    for u in range(unique.shape[0]):
+        distances = np.abs(unique[lows[u]:highs[u]] - unique[u]).max(axis=1)
+        close = distances < r if strict else distances <= r
+        unique_counts[u] = weights[lows[u]:highs[u]][close].sum()
+    counts[valid] = unique_counts[inverse.reshape(-1)]
+    return counts, valid
+
+
+def _sampen(signal: np.ndarray, m: int, r: float) -> float:
+    # pobm's ComplexityMeasures.comp_sampen: the first n - m templates of length m against all n - m + 1
+    # of them, the n - m templates of length m + 1 against each other, self-matches excluded
+    n = signal.shape[0]
+    counts_m, _ = _neighbour_counts(_templates(signal, m, n - m + 1), r, strict=False)
+    counts_m1, _ = _neighbour_counts(_templates(signal, m + 1, n - m), r, strict=False)
+    B = counts_m[:n - m].sum() - (n - m)
+    A = counts_m1.sum() - (n - m)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return -np.log(A / B)
+
+
+def _apen(signal: np.ndarray, m: int, r: float) -> float:
+    # pobm's ComplexityMeasures.comp_apen on the NaN-free signal
+    signal = signal[~np.isnan(signal)]
+
+    def phi(m):
+        n = signal.shape[0]
+        _check_len_ApEn_(n, m)
+        counts, _ = _neighbour_counts(_templates(signal, m, n - m + 1), r, strict=True)
+        return np.nansum(np.log(counts / (n - m + 1))) / (n - m + 1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return phi(m) - phi(m + 1)
+
+
+def _lz(signal: np.ndarray) -> int:
+    # pobm's ComplexityMeasures.comp_lz with dual quantization
+    sequence = "".join(np.where(signal > np.nanmedian(signal), "1", "0"))
+    sub_strings = set()
+    ind, inc = 0, 1
+    while ind + inc <= len(sequence):
+        sub_str = sequence[ind:ind + inc]
+        if sub_str in sub_strings:
+            inc += 1
+        else:
+            sub_strings.add(sub_str)
+            ind += inc
+            inc = 1
+    return len(sub_strings)
+
+
+def _ctm(signal: np.ndarray, threshold: float) -> float:
+    # pobm's ComplexityMeasures.comp_ctm
+    d = np.diff(signal)
+    with np.errstate(invalid="ignore"):
+        return np.count_nonzero(np.sqrt(d[1:] ** 2 + d[:-1] ** 2) < threshold) / (signal.shape[0] - 2)
+
+
+def _dfa(signal: np.ndarray, window: int) -> float:
+    # pobm's ComplexityMeasures.comp_dfa: a least squares line per window of the integrated signal,
+    # fitted for all full windows at once; a last window of one sample is its own fit
+    centred = signal - np.nanmean(signal)
+    y = np.cumsum((centred[:-1] + centred[1:]) / 2)
+    full = y.shape[0] // window
+    windows = [y[:full * window].reshape(full, window)]
+    rest = y.shape[0] - full * window
+    if rest > 1:
+        windows.append(y[full * window:].reshape(1, rest))
+    residual = 0.0
+    for rows in windows:
+        x = np.arange(rows.shape[1]) - (rows.shape[1] - 1) / 2
+        slope = (rows - rows.mean(axis=1, keepdims=True)) @ x / (x @ x)
+        fitted = rows.mean(axis=1, keepdims=True) + slope[:, None] * x
+        residual += np.nansum((rows - fitted) ** 2)
+    return np.sqrt(residual / y.shape[0])
+
+
+def complexity_measures(spo2, CTM_Threshold: float=0.25, DFA_Window: int=20, M_Sampen: int=3, R_Sampen: float=0.2,
+                        M_ApEn: int=2, R_ApEn: float=0.25) -> ComplexityMeasuresResults:
+    """
+    `ComplexityMeasures(...).compute(spo2)` without the quadratic template matching.
+
+    SampEn and ApEn count neighbours per distinct template inside a sorted window instead
+    of comparing every template with every other one, DFA fits all windows at once and CTM
+    is a single array expression. The integer counts (SampEn, ApEn, LZ, CTM) are exact;
+    DFA agrees with `scipy.stats.linregress` fits up to floating point rounding.
+
+    :param spo2: cleaned 1 Hz SpO2 signal
+    :return: ComplexityMeasuresResults(ApEn, LZ, CTM, SampEn, DFA)
+    """
+    signal = np.asarray(spo2, dtype=np.float64)
+    return ComplexityMeasuresResults(_apen(signal, M_ApEn, R_ApEn), _lz(signal), _ctm(signal, CTM_Threshold),
+                                     _sampen(signal, M_Sampen, R_Sampen), _dfa(signal, DFA_Window))
+
+
+def prsa_anchors(spo2, largest_window: int=20) -> SimpleNamespace:
+    """
+    The anchor point detection `PRSAMeasures` repeats for every window size, done once.
+
+    Anchor points are samples lower than their predecessor. Every offset of the largest window
+    is gathered around all anchors and summed cumulatively along the anchors, so that
+    `prsa_window` can average the anchors a window keeps (those at least d samples from both
+    ends) with two prefix sums per offset.
+
+    :param spo2: cleaned SpO2 signal
+    :param largest_window: the largest PRSA_Window the result will be used for
+    :return: signal, anchors (sample indices), largest_window and prefix (2 * largest_window, anchors + 1)
+    """
+    signal = np.asarray(spo2, dtype=np.float64)
+    _check_fragment_PRSA_(largest_window)
+    with np.errstate(invalid="ignore"):
+        anchors = np.flatnonzero(signal[:-1] > signal[1:]) + 1
+    # pobm's nansum over the anchors, divided by the number of anchors
+    values = np.where(np.isnan(signal), 0, signal)
+    offsets = np.arange(-largest_window, largest_window)
+    # offsets that fall outside the signal only belong to anchors no window keeps
+    gathered = values[np.clip(anchors[None, :] + offsets[:, None], 0, signal.shape[0] - 1)]
+    prefix = np.concatenate([np.zeros((offsets.shape[0], 1)), np.cumsum(gathered, axis=1)], axis=1)
+    return SimpleNamespace(signal=signal, anchors=anchors, largest_window=largest_window, prefix=prefix)
+
+
+def prsa_window(spo2, shared: SimpleNamespace, PRSA_Window: int=10, K_AC: int=2) -> PRSAResults:
+    """
+    `PRSAMeasures(PRSA_Window, K_AC).compute(spo2)` from `prsa_anchors(spo2, largest_window)`, in O(PRSA_Window).
+
+    :param spo2: cleaned SpO2 signal (unused, the signal is taken from `shared`)
+    :param shared: result of `prsa_anchors` with largest_window >= PRSA_Window
+    """
+    d = PRSA_Window
+    _check_fragment_PRSA_(d)
+    if d > shared.largest_window:
+        raise ValueError(f"PRSA_Window={d} is larger than the largest_window={shared.largest_window} the anchors were gathered for")
+    # anchors i = d .. L - d
+    low = np.searchsorted(shared.anchors, d, side="left")
+    high = np.searchsorted(shared.anchors, shared.signal.shape[0] - d, side="right")
+    if high <= low:
+        # without anchors pobm reports zeros and the autocorrelation of the signal itself
+        return PRSAResults(0, 0, 0, 0, 0, _autocorrelation(shared.signal[None, :], K_AC)[0])
+    rows = slice(shared.largest_window - d, shared.largest_window + d)
+    window = ((shared.prefix[rows, high] - shared.prefix[rows, low]) / (high - low))[None, :]
+    return PRSAResults((window[0, d] + window[0, d + 1] - window[0, d - 1] - window[0, d - 2]) / 4,
+                       np.nanmax(window) - np.nanmin(window),
+                       float(_slopes(window)[0]), float(_slopes(window[:, :d])[0]), float(_slopes(window[:, d:])[0]),
+                       _autocorrelation(window, K_AC)[0])
+
+
+def prsa_multi(spo2, windows=(10, 20), K_AC: int=2) -> Dict[int, PRSAResults]:
+    """
+    `PRSAMeasures(PRSA_Window=d, K_AC=K_AC).compute(spo2)` for every window size d, sharing one anchor detection.
+
+    :return: {window size: PRSAResults(PRSAc, PRSAad, PRSAos, PRSAsb, PRSAsa, AC)}
+    """
+    shared = prsa_anchors(spo2, largest_window=max(windows))
+    return {d: prsa_window(spo2, shared, PRSA_Window=d, K_AC=K_AC) for d in windows}
+
+
+# Batch versions over a matrix of equal-length recordings, one per row. Each returns a namespace of
+# per-recording arrays named like the fields of pobm's result classes.
+
+def general_measures_batch(signals: np.ndarray, ZC_Baseline: float=90, percentile: int=1, M_Threshold: int=2,
+                           DI_Window: int=12) -> SimpleNamespace:
+    """
+    `OverallGeneralMeasures(...).compute(row)` for every row, without K, SK and MAD.
+
+    :param signals: (N, L) cleaned SpO2 signals
+    :return: AV, MED, Min, SD, RG, P, M, ZC, DI, each of shape (N,)
+    """
+    signals = np.asarray(signals, dtype=np.float64)
+    length = signals.shape[1]
+    _check_window_delta_(length, DI_Window)
+    with warnings.catch_warnings(), np.errstate(invalid="ignore"):
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        median = np.nanmedian(signals, axis=1)
+        minimum = np.nanmin(signals, axis=1)
+
+        # pobm counts crossings of the baseline at samples 2 .. L - 2, and touches of it as crossings
+        # when the neighbours are on opposite sides (or equal to it)
+        b = ZC_Baseline
+        prev, cur, nxt = signals[:, 1:length - 2], signals[:, 2:length - 1], signals[:, 3:length]
+        touch = cur == b
+        zc = ((touch & (prev <= b) & (nxt >= b)).sum(axis=1) + (touch & (prev >= b) & (nxt <= b)).sum(axis=1)
+              + ((prev < b) & (cur > b)).sum(axis=1) + ((prev > b) & (cur < b)).sum(axis=1))
+
+        # means of the full DI_Window windows, then the mean absolute change between neighbours
+        windows = length // DI_Window
+        means = np.nanmean(signals[:, :windows * DI_Window].reshape(signals.shape[0], windows, DI_Window), axis=2)
+        di = np.nanmean(np.abs(np.diff(means, axis=1)), axis=1)
+
+        return SimpleNamespace(
+            AV=np.nanmean(signals, axis=1), MED=median, Min=minimum, SD=np.nanstd(signals, axis=1),
+            RG=np.nanmax(signals, axis=1) - minimum,
+            P=np.nanpercentile(signals, percentile, axis=1),
+            M=100 * (signals < (median - M_Threshold)[:, None]).sum(axis=1) / length,
+            ZC=zc, DI=di,
+        )
+
+
+def _psd_rows(signals: np.ndarray, frequency_low: float, frequency_high: float) -> Tuple[np.ndarray, ...]:
+    freq, psd = welch(signals, window="hamming", axis=-1)
+    amplitude = np.abs(psd / signals.shape[1])
+    # positive half, as pobm takes it
+    half = int(len(freq) / 2)
+    freq, amplitude = freq[:half], amplitude[:, :half]
+    band = amplitude[:, (frequency_low < freq) & (freq < frequency_high)]
+    total = np.nansum(amplitude, axis=1)
+    if band.shape[1] == 0:
+        zeros = np.zeros(signals.shape[0])
+        return total, zeros, zeros, zeros
+    band_total = np.nansum(band, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return total, band_total, band_total / total, np.nanmax(band, axis=1)
+
+
+def psd_measures_batch(signals: np.ndarray, frequency_low_threshold: float=0.014,
+                       frequency_high_threshold: float=0.033) -> SimpleNamespace:
+    """
+    `PSDMeasures(...).compute(row)` for every row: one Welch estimate over the whole matrix.
+
+    Rows containing NaN are estimated on their own after dropping the NaNs, as pobm does.
+
+    :param signals: (N, L) cleaned SpO2 signals
+    :return: PSD_total, PSD_band, PSD_ratio, PSD_peak, each of shape (N,)
+    """
+    signals = np.asarray(signals, dtype=np.float64)
+    columns = np.zeros((4, signals.shape[0]))
+    has_nan = np.isnan(signals).any(axis=1)
+    if (~has_nan).any():
+        columns[:, ~has_nan] = _psd_rows(signals[~has_nan], frequency_low_threshold, frequency_high_threshold)
+    for row in np.flatnonzero(has_nan):
+        signal = signals[row][~np.isnan(signals[row])]
+        columns[:, row] = [value[0] for value in _psd_rows(signal[None, :], frequency_low_threshold, frequency_high_threshold)]
+    return SimpleNamespace(PSD_total=columns[0], PSD_band=columns[1], PSD_ratio=columns[2], PSD_peak=columns[3])
+
+
+def _slopes(values: np.ndarray) -> np.ndarray:
+    # least squares slope of each row against 0, 1, 2, ... (np.polyfit(range(n), row, 1)[0])
+    x = np.arange(values.shape[1]) - (values.shape[1] - 1) / 2
+    return (values - values.mean(axis=1, keepdims=True)) @ x / (x @ x)
+
+
+def _autocorrelation(values: np.ndarray, k: int) -> np.ndarray:
+    # np.correlate(row, row, "same")[k] of each row: the autocorrelation at lag |L // 2 - k|
+    lag = abs(values.shape[1] // 2 - k)
+    return (values[:, lag:] * values[:, :values.shape[1] - lag]).sum(axis=1)
+
+
+def prsa_anchors_batch(signals: np.ndarray) -> SimpleNamespace:
+    """
+    :param signals: (N, L) cleaned SpO2 signals
+    :return: signals and drops, where drops[:, i - 1] marks sample i as lower than sample i - 1 (an anchor point)
+    """
+    signals = np.asarray(signals, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        return SimpleNamespace(signals=signals, drops=signals[:, :-1] > signals[:, 1:])
+
+
+def prsa_window_batch(signals: np.ndarray, shared: SimpleNamespace, PRSA_Window: int=10, K_AC: int=2) -> SimpleNamespace:
+    """
+    `prsa_measures_batch` from `prsa_anchors_batch(signals)`.
+    """
+    return prsa_measures_batch(shared.signals, PRSA_Window=PRSA_Window, K_AC=K_AC, drops=shared.drops)
+
+
+def prsa_measures_batch(signals: np.ndarray, PRSA_Window: int=10, K_AC: int=2, drops: np.ndarray=None) -> SimpleNamespace:
+    """
+    `PRSAMeasures(...).compute(row)` for every row.
+
+    Anchor points (samples lower than their predecessor, at least `PRSA_Window` from both ends)
+    are a boolean mask over the matrix; each of the 2 * PRSA_Window averaged offsets is one
+    masked sum over all rows.
+
+    :param signals: (N, L) cleaned SpO2 signals
+    :param drops: `prsa_anchors_batch(signals).drops`, computed here if None
+    :return: PRSAc, PRSAad, PRSAos, PRSAsb, PRSAsa, AC, each of shape (N,)
+    """
+    signals = np.asarray(signals, dtype=np.float64)
+    d = PRSA_Window
+    _check_fragment_PRSA_(d)
+    length = signals.shape[1]
+    if drops is None:
+        drops = prsa_anchors_batch(signals).drops
+    # anchors i = d .. L - d
+    anchors = drops[:, d - 1:length - d]
+    count = anchors.sum(axis=1)
+    windows = np.empty((signals.shape[0], 2 * d))
+    for offset in range(2 * d):
+        values = signals[:, offset:offset + anchors.shape[1]]
+        windows[:, offset] = np.where(anchors & ~np.isnan(values), values, 0).sum(axis=1)
+    found = count > 0
+    windows[found] /= count[found, None]
+
+    results = SimpleNamespace(
+        PRSAc=(windows[:, d] + windows[:, d + 1] - windows[:, d - 1] - windows[:, d - 2]) / 4,
+        PRSAad=windows.max(axis=1) - windows.min(axis=1),
+        PRSAos=_slopes(windows),
+        PRSAsb=_slopes(windows[:, :d]),
+        PRSAsa=_slopes(windows[:, d:]),
+        AC=_autocorrelation(windows, K_AC),
+    )
+    # without anchors pobm reports zeros and the autocorrelation of the signal itself
+    for row in np.flatnonzero(~found):
+        for field in ["PRSAc", "PRSAad", "PRSAos", "PRSAsb", "PRSAsa"]:
+            getattr(results, field)[row] = 0
+        results.AC[row] = np.correlate(signals[row], signals[row], "same")[K_AC]
+    return results
+
+
+def prsa_multi_batch(signals: np.ndarray, windows=(10, 20), K_AC: int=2) -> Dict[int, SimpleNamespace]:
+    """
+    :return: {window size: `prsa_measures_batch(signals, PRSA_Window=window size, K_AC=K_AC)`}, sharing one anchor detection
+    """
+    shared = prsa_anchors_batch(signals)
+    return {d: prsa_window_batch(signals, shared, PRSA_Window=d, K_AC=K_AC) for d in windows}
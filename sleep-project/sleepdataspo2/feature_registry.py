@@ -0,0 +1,152 @@
+"""
+Author: Eshan Jayasundara
+Co-Author 1:
+Co-Author 2:
+Last Modified: 2025/06/29 by Eshan Jayasundara
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+import numpy as np
+import pandas as pd
+
+def _silent(message: str) -> None:
+    pass
+
+class FeatureRegistry:
+    """
+    Output columns and the computations that produce them.
+
+    A producer is a named computation over the SpO2 signal and the results of the producers it
+    depends on (e.g. one `desaturations_multi` call for every threshold). A feature is an output
+    column read from one producer's result. `compute` runs only the producers the requested
+    columns need, each once per call, in dependency order.
+
+    `compute_batch` does the same over a matrix of recordings. Producers registered with a
+    `compute_batch` function run once on the whole matrix and return an object whose fields are
+    per-recording arrays; the others run once per row.
+    """
+    def __init__(self):
+        # producer name -> (dependencies, compute(spo2, *dependency_results), label for the progress log)
+        self._producers: Dict[str, Tuple[Tuple[str, ...], Callable, str]] = {}
+        # producer name -> compute_batch(signals, *dependency_batch_results), for producers with a batch version
+        self._batch: Dict[str, Callable] = {}
+        # feature name -> (producer name, getter(producer_result)), in registration order
+        self._features: Dict[str, Tuple[str, Callable[[Any], Any]]] = {}
+
+    def add_producer(self, name: str, compute: Callable, depends_on: Iterable[str] = (), label: str = None,
+                     compute_batch: Callable = None) -> None:
+        depends_on = tuple(depends_on)
+        for dependency in depends_on:
+            if dependency not in self._producers:
+                raise KeyError(f"Producer '{name}' depends on unknown producer '{dependency}'")
+            # a batch producer needs batch results of its dependencies, a per-row one per-row results
+            if (dependency in self._batch) != (compute_batch is not None):
+                raise ValueError(f"Producer '{name}' and its dependency '{dependency}' must both have a batch version or neither")
+        self._producers[name] = (depends_on, compute, label or name)
+        if compute_batch is not None:
+            self._batch[name] = compute_batch
+
+    def add_feature(self, name: str, producer: str, getter: Callable[[Any], Any]) -> None:
+        if producer not in self._producers:
+            raise KeyError(f"Feature '{name}' uses unknown producer '{producer}'")
+        self._features[name] = (producer, getter)
+
+    def names(self, producers: Iterable[str] = None) -> List[str]:
+        """
+        :param producers: only the features of these producers (all features if None)
+        :return: feature names in registration order
+        """
+        if producers is None:
+            return list(self._features)
+        producers = set(producers)
+        return [name for name, (producer, _) in self._features.items() if producer in producers]
+
+    def producers_for(self, names: Iterable[str]) -> List[str]:
+        """
+        :return: every producer the features need, dependencies before dependants
+        """
+        unknown = [name for name in names if name not in self._features]
+        if unknown:
+            raise KeyError(f"Unknown feature(s): {unknown}")
+        ordered = []
+        def visit(producer):
+            if producer in ordered:
+                return
+            for dependency in self._producers[producer][0]:
+                visit(dependency)
+            ordered.append(producer)
+        for name in names:
+            visit(self._features[name][0])
+        return ordered
+
+    def compute(self, spo2, names: Iterable[str], executor: Executor = None,
+                log: Callable[[str], None] = None) -> Dict[str, Any]:
+        """
+        :param spo2: cleaned SpO2 signal
+        :param names: feature names, in the order of the returned dict
+        :param executor: when set, producers run on it as soon as their dependencies are done,
+            so independent ones run concurrently (a process pool needs picklable producers)
+        :param log: called with a progress message before and after each producer (silent if None)
+        :return: {feature name: value}
+        """
+        log = log or _silent
+        names = list(names)
+        results = {}
+        if executor is None:
+            for producer in self.producers_for(names):
+                depends_on, compute, label = self._producers[producer]
+                log(f"Computing {label} features")
+                results[producer] = compute(spo2, *(results[dependency] for dependency in depends_on))
+                log(f"Completed computing {label} features")
+        else:
+            pending = self.producers_for(names)
+            running = {}
+            while pending or running:
+                for producer in [producer for producer in pending if all(d in results for d in self._producers[producer][0])]:
+                    depends_on, compute, label = self._producers[producer]
+                    log(f"Computing {label} features")
+                    running[executor.submit(compute, spo2, *(results[dependency] for dependency in depends_on))] = producer
+                    pending.remove(producer)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    producer = running.pop(future)
+                    results[producer] = future.result()
+                    log(f"Completed computing {self._producers[producer][2]} features")
+
+        features = {}
+        for name in names:
+            producer, getter = self._features[name]
+            features[name] = getter(results[producer])
+        return features
+
+    def compute_batch(self, signals: np.ndarray, index: Iterable[str], names: Iterable[str],
+                      log: Callable[[str], None] = None) -> pd.DataFrame:
+        """
+        :param signals: (N, L) cleaned SpO2 signals, one recording per row
+        :param index: the N row labels (e.g. nsrrid)
+        :param names: feature names, in the order of the returned columns
+        :param log: called with a progress message before and after each producer (silent if None)
+        :return: one row of features per recording
+        """
+        log = log or _silent
+        names = list(names)
+        results = {}
+        for producer in self.producers_for(names):
+            depends_on, compute, label = self._producers[producer]
+            log(f"Computing {label} features for {signals.shape[0]} recordings")
+            if producer in self._batch:
+                results[producer] = self._batch[producer](signals, *(results[dependency] for dependency in depends_on))
+            else:
+                results[producer] = [compute(signal, *(results[dependency][row] for dependency in depends_on))
+                                     for row, signal in enumerate(signals)]
+            log(f"Completed computing {label} features for {signals.shape[0]} recordings")
+
+        columns = {}
+        for name in names:
+            producer, getter = self._features[name]
+            if producer in self._batch:
+                columns[name] = getter(results[producer])
+            else:
+                columns[name] = [getter(result) for result in results[producer]]
+        return pd.DataFrame(columns, index=pd.Index(list(index), name="nsrrid"))
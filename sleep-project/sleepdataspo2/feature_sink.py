@@ -0,0 +1,182 @@
+"""
+Author: Eshan Jayasundara
+Co-Author 1:
+Co-Author 2:
+Last Modified: 2025/06/29 by Eshan Jayasundara
+"""
+
+from abc import ABC, abstractmethod
+from typing import List
+import glob
+import json
+import os
+import time
+import uuid
+import pandas as pd
+from filelock import FileLock, Timeout
+
+class FeatureSinkInterface(ABC):
+    @abstractmethod
+    def write(self, path: str, features: pd.DataFrame) -> None:
+        pass
+    @abstractmethod
+    def compact(self, path: str) -> List[str]:
+        pass
+
+def _features_csv(path: str, n_features: int) -> str:
+    return os.path.join(path, f"extracted_{n_features}_features.csv")
+
+def _check_columns(target: str, columns, new_columns) -> None:
+    # rows are only merged into a table with exactly the same columns (in any order)
+    missing = [column for column in columns if column not in set(new_columns)]
+    unexpected = [column for column in new_columns if column not in set(columns)]
+    if missing or unexpected:
+        raise ValueError(f"Cannot merge rows into {target}: missing columns {missing}, unexpected columns {unexpected}")
+
+def _upsert_csv(csv_path: str, features: pd.DataFrame) -> None:
+    # features: one row per recording, indexed by nsrrid; later rows replace earlier ones with the same nsrrid
+    features.index = features.index.astype(str).str.strip()  # enforce string + trim whitespace
+    if os.path.exists(csv_path):
+        df = pd.read_csv(csv_path, index_col="nsrrid")
+        df.index = df.index.astype(str).str.strip()  # enforce string + trim whitespace
+        _check_columns(csv_path, df.columns, features.columns)
+        df = pd.concat([df, features])
+    else:
+        df = features
+    df.index.name = "nsrrid"
+    df = df[~df.index.duplicated(keep='last')] # ensure no duplicates
+    df.to_csv(csv_path)
+
+class CsvFeatureSink(FeatureSinkInterface):
+    """
+    `{path}/extracted_{N}_features.csv` rewritten under a file lock on every write.
+
+    Every write reads and rewrites the whole table, so use it for a few recordings or
+    use ShardedFeatureSink for whole cohorts.
+    """
+    def write(self, path: str, features: pd.DataFrame) -> None:
+        csv_path = _features_csv(path, len(features.columns))
+        lock_path = csv_path + ".lock"
+
+        # Use a file lock to avoid concurrent write issues
+        lock = FileLock(lock_path, timeout=180)  # waits up to 180 seconds
+
+        try:
+            # 1. Lock is acquired at the start of the with block
+            # 2. If an exception occurs inside the block:
+            #       The with statement guarantees that __exit__() is called.
+            #       This automatically releases the lock, even if the block was exited due to an error.
+            with lock:
+                _upsert_csv(csv_path, features)
+                print(f"[✔] Updated: {csv_path}")
+
+        except Timeout:
+            print(f"[✘] Timeout while waiting for the lock: {lock_path}")
+        except Exception as e:
+            print(f"[✘] Error while writing features to {csv_path}: {e}")
+
+    def compact(self, path: str) -> List[str]:
+        # the CSV is always up to date
+        return []
+
+class ShardedFeatureSink(FeatureSinkInterface):
+    """
+    Append-only JSONL shards, one per write, merged by `compact`.
+
+    `write` puts its rows (one recording, or one batch) in a hidden temporary file and publishes
+    it with `os.replace` as `{path}/feature_shards/extracted_{N}_features.{pid}-{unique}.jsonl`.
+    No lock is taken and nothing is re-read, and a published shard is complete and never
+    written again. `compact` merges the shards it finds into `{path}/extracted_{N}_features.parquet`,
+    keeping the latest row per nsrrid, exports the same table as the usual
+    `extracted_{N}_features.csv` if `export_csv`, and deletes exactly the shards it merged, so
+    writes published meanwhile wait for the next compaction.
+    """
+    def __init__(self, export_csv: bool = True):
+        self._export_csv = export_csv
+
+    def _shard_dir(self, path: str) -> str:
+        return os.path.join(path, "feature_shards")
+
+    def write(self, path: str, features: pd.DataFrame) -> None:
+        shard_dir = self._shard_dir(path)
+        os.makedirs(shard_dir, exist_ok=True)
+        shard_name = f"extracted_{len(features.columns)}_features.{os.getpid()}-{uuid.uuid4().hex}.jsonl"
+        shard_path = os.path.join(shard_dir, shard_name)
+
+        rows = features.copy()
+        rows.index = rows.index.astype(str).str.strip()  # enforce string + trim whitespace
+        rows.index.name = "nsrrid"
+        # compaction keeps the latest row of an nsrrid written by any shard
+        rows["written_ns"] = time.time_ns()
+        # json keeps every float digit (DataFrame.to_json rounds to 10 decimals) and writes NaN as NaN
+        lines = "".join(json.dumps(record, default=lambda value: value.item()) + "\n" for record in rows.reset_index().to_dict(orient="records"))
+        # published only once complete, so compact never reads a shard that is still being written
+        tmp_path = os.path.join(shard_dir, f".{shard_name}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(lines)
+        os.replace(tmp_path, shard_path)
+        print(f"[✔] Wrote {len(rows)} row(s) to {shard_path}")
+
+    def compact(self, path: str) -> List[str]:
+        """
+        :return: paths of the compacted tables
+        """
+        shard_dir = self._shard_dir(path)
+        # "extracted_{N}_features" of every published shard (temporary files start with a dot and are not matched)
+        tables = {os.path.basename(shard).split(".")[0] for shard in glob.glob(os.path.join(shard_dir, "extracted_*_features.*.jsonl"))}
+        compacted = []
+        for table_name in sorted(tables):
+            n_features = int(table_name.split("_")[1])
+            table_path = os.path.join(path, f"{table_name}.parquet")
+            with FileLock(table_path + ".lock", timeout=180):
+                # published shards are complete and never written again; later ones are left for the next compaction
+                shards = glob.glob(os.path.join(shard_dir, f"{table_name}.*.jsonl"))
+
+                records = []
+                for shard in shards:
+                    with open(shard) as f:
+                        records.extend(json.loads(line) for line in f if line.strip())
+                # shards of one table (same number of features) may still disagree on the feature names
+                for record in records:
+                    _check_columns(table_path, list(records[0]), list(record))
+                rows = pd.DataFrame.from_records(records) if records else None
+                if rows is not None:
+                    rows = rows.sort_values("written_ns", kind="stable").drop(columns="written_ns").set_index("nsrrid")
+                    rows.index = rows.index.astype(str).str.strip()
+
+                csv_path = _features_csv(path, n_features)
+                if os.path.exists(table_path):
+                    table = pd.read_parquet(table_path)
+                elif os.path.exists(csv_path):
+                    # carry over recordings written by CsvFeatureSink
+                    table = pd.read_csv(csv_path, index_col="nsrrid")
+                    table.index = table.index.astype(str).str.strip()
+                else:
+                    table = None
+
+                if rows is not None:
+                    if table is not None:
+                        _check_columns(table_path, table.columns, rows.columns)
+                    table = rows if table is None else pd.concat([table, rows])
+                    table.index.name = "nsrrid"
+                    table = table[~table.index.duplicated(keep='last')] # ensure no duplicates
+                    table.to_parquet(table_path)
+                    print(f"[✔] Compacted {len(shards)} shard(s) into {table_path} ({len(table)} recordings)")
+                    if self._export_csv:
+                        with FileLock(csv_path + ".lock", timeout=180):
+                            table.to_csv(csv_path)
+                        print(f"[✔] Exported: {csv_path}")
+                    compacted.append(table_path)
+                for shard in shards:
+                    os.remove(shard)
+        return compacted
+
+class FeatureSink(FeatureSinkInterface):
+    def __init__(self, feature_sink: FeatureSinkInterface):
+        self._feature_sink = feature_sink
+
+    def write(self, path: str, features: pd.DataFrame) -> None:
+        return self._feature_sink.write(path, features)
+
+    def compact(self, path: str) -> List[str]:
+        return self._feature_sink.compact(path)
@@ -6,16 +6,37 @@ Last Modified: 2025/06/27 by Eshan Jayasundara
 """
 
 from abc import ABC, abstractmethod
+from typing import Iterator, List, Tuple
+import numpy as np
 import pandas as pd
 import traceback
 import mne
 
+# Fixed-width fields of the EDF header, see https://www.edfplus.info/specs/edf.html
+EDF_FIXED_HEADER_BYTES = 256
+EDF_SIGNAL_HEADER_BYTES = 256
+EDF_SAMPLE_DTYPE = np.dtype("<i2")
+
+def _edf_field(raw: bytes) -> str:
+    return raw.decode("latin-1").strip()
+
+def _to_physical(digital: np.ndarray, signal: dict) -> np.ndarray:
+    # in float64: digital - digital_min overflows int16 for channels using the full -32768..32767 range
+    scale = (signal["physical_max"] - signal["physical_min"]) / (signal["digital_max"] - signal["digital_min"])
+    return (digital.astype(np.float64) - signal["digital_min"]) * scale + signal["physical_min"]
+
 class DataLoaderInterface(ABC):
     @abstractmethod
     def read_csv(self, file_path: str) -> pd.DataFrame:
         pass
     def read_edf(self, file_path: str) -> pd.DataFrame:
         pass
+    def read_edf_header(self, file_path: str) -> dict:
+        pass
+    def read_edf_channels(self, file_path: str, channel_names: List[str]) -> Tuple[pd.DataFrame, float]:
+        pass
+    def iter_edf_channel(self, file_path: str, channel_name: str, block_size: int) -> Iterator[Tuple[int, np.ndarray]]:
+        pass
     def read_parquet(self, file_path: str) -> pd.DataFrame:
         pass
 
@@ -50,6 +71,164 @@ class PandasDataLoader(DataLoaderInterface):
             print("Error reading EDF file:")
             print(f"{self.__class__}/read_edf", e)
         return df
+
+    def read_edf_header(self, file_path: str) -> dict:
+        """
+        Read only the header bytes of an EDF file.
+
+        :param file_path: path to the `.edf` file
+
+        :return: dict with the record layout and one entry per signal in `signals`
+                 (label, unit, physical/digital range, samples per record, sampling frequency).
+        """
+        if not file_path.endswith(".edf"):
+            raise ValueError("Invalid extension! `.edf` is required.")
+        with open(file_path, "rb") as f:
+            fixed = f.read(EDF_FIXED_HEADER_BYTES)
+            if len(fixed) < EDF_FIXED_HEADER_BYTES:
+                raise ValueError(f"Truncated EDF header: {file_path}")
+            header_bytes = int(_edf_field(fixed[184:192]))
+            n_records = int(_edf_field(fixed[236:244]))
+            record_duration = float(_edf_field(fixed[244:252]))
+            ns = int(_edf_field(fixed[252:256]))
+            raw = f.read(ns * EDF_SIGNAL_HEADER_BYTES)
+            if len(raw) < ns * EDF_SIGNAL_HEADER_BYTES:
+                raise ValueError(f"Truncated EDF signal header: {file_path}")
+            f.seek(0, 2)
+            file_size = f.tell()
+
+        # each signal field is stored for all ns signals before the next field begins
+        def fields(offset, width):
+            start = offset * ns
+            return [_edf_field(raw[start + i*width:start + (i+1)*width]) for i in range(ns)]
+
+        labels = fields(0, 16)
+        units = fields(16 + 80, 8)
+        physical_min = [float(x) for x in fields(16 + 80 + 8, 8)]
+        physical_max = [float(x) for x in fields(16 + 80 + 16, 8)]
+        digital_min = [int(float(x)) for x in fields(16 + 80 + 24, 8)]
+        digital_max = [int(float(x)) for x in fields(16 + 80 + 32, 8)]
+        n_samples = [int(x) for x in fields(16 + 80 + 40 + 80, 8)]
+
+        record_samples = int(np.sum(n_samples))
+        record_bytes = record_samples * EDF_SAMPLE_DTYPE.itemsize
+        # n_records is -1 while a recording is still being written
+        records_on_disk = (file_size - header_bytes) // record_bytes if record_bytes else 0
+        if n_records < 0 or n_records > records_on_disk:
+            n_records = int(records_on_disk)
+
+        signals = []
+        offset = 0
+        for i in range(ns):
+            signals.append({
+                "label": labels[i],
+                "unit": units[i],
+                "physical_min": physical_min[i],
+                "physical_max": physical_max[i],
+                "digital_min": digital_min[i],
+                "digital_max": digital_max[i],
+                "n_samples": n_samples[i],
+                "sampling_frequency": n_samples[i] / record_duration if record_duration > 0 else float("nan"),
+                "record_offset": offset,
+            })
+            offset += n_samples[i]
+
+        return {
+            "header_bytes": header_bytes,
+            "n_records": n_records,
+            "record_duration": record_duration,
+            "record_samples": record_samples,
+            "duration": n_records * record_duration,
+            "signals": signals,
+        }
+
+    def read_edf_channels(self, file_path: str, channel_names: List[str]) -> Tuple[pd.DataFrame, float]:
+        """
+        Decode only the requested channels of an EDF file in one pass over the header.
+
+        Unlike `read_edf`, the other channels are never converted to float and the
+        sampling frequency comes from the header instead of the `time` column.
+
+        :param file_path: path to the `.edf` file
+        :param channel_names: labels of the channels to decode, all sharing one sampling frequency
+
+        :return: (DataFrame with `time` and one column per channel in physical units, sampling frequency)
+        """
+        header = self.read_edf_header(file_path)
+        by_label = {signal["label"]: signal for signal in header["signals"]}
+        missing = [name for name in channel_names if name not in by_label]
+        if missing:
+            raise KeyError(f"Channels {missing} not found in: {list(by_label.keys())}")
+        picked = [by_label[name] for name in channel_names]
+        frequencies = {signal["sampling_frequency"] for signal in picked}
+        if len(frequencies) != 1:
+            raise ValueError(f"Channels {channel_names} have different sampling frequencies: {frequencies}")
+        sampling_frequency = frequencies.pop()
+
+        records = np.memmap(
+            file_path,
+            dtype=EDF_SAMPLE_DTYPE,
+            mode="r",
+            offset=header["header_bytes"],
+            shape=(header["n_records"], header["record_samples"]),
+        )
+        columns = {}
+        for name, signal in zip(channel_names, picked):
+            start = signal["record_offset"]
+            digital = records[:, start:start + signal["n_samples"]].reshape(-1)
+            columns[name] = _to_physical(digital, signal)
+        del records
+
+        n = header["n_records"] * picked[0]["n_samples"]
+        df = pd.DataFrame(columns)
+        df['time'] = np.arange(n) / sampling_frequency
+        return df, sampling_frequency
+    
+    def iter_edf_channel(self, file_path: str, channel_name: str, block_size: int=3600) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Stream one channel of an EDF file in fixed-size blocks.
+
+        Only the data records needed for the next block are read from disk, so memory
+        stays bounded by `block_size` regardless of recording length or channel count.
+
+        :param file_path: path to the `.edf` file
+        :param channel_name: label of the channel to stream
+        :param block_size: number of samples per yielded block (the last block may be shorter)
+
+        :return: generator of (offset of the first sample in the block, block in physical units)
+        """
+        if block_size <= 0:
+            raise ValueError("block_size should be strictly positive")
+        header = self.read_edf_header(file_path)
+        by_label = {signal["label"]: signal for signal in header["signals"]}
+        if channel_name not in by_label:
+            raise KeyError(f"Channel '{channel_name}' not found in: {list(by_label.keys())}")
+        signal = by_label[channel_name]
+        start = signal["record_offset"]
+        stop = start + signal["n_samples"]
+        record_bytes = header["record_samples"] * EDF_SAMPLE_DTYPE.itemsize
+        records_per_read = max(1, -(-block_size // max(signal["n_samples"], 1)))
+
+        pending = np.empty(0)
+        offset = 0
+        with open(file_path, "rb") as f:
+            f.seek(header["header_bytes"])
+            remaining = header["n_records"]
+            while remaining > 0:
+                n = min(records_per_read, remaining)
+                raw = np.frombuffer(f.read(n * record_bytes), dtype=EDF_SAMPLE_DTYPE)
+                n = raw.shape[0] // header["record_samples"]
+                if n == 0:
+                    break
+                remaining -= n
+                digital = raw[:n * header["record_samples"]].reshape(n, header["record_samples"])[:, start:stop].reshape(-1)
+                pending = np.concatenate([pending, _to_physical(digital, signal)])
+                while pending.shape[0] >= block_size:
+                    yield offset, pending[:block_size]
+                    pending = pending[block_size:]
+                    offset += block_size
+        if pending.shape[0] > 0:
+            yield offset, pending
     
     def read_parquet(self, file_path:str) -> pd.DataFrame:
         if not file_path.endswith(".parquet"):
@@ -70,6 +249,15 @@ class DataLoader(DataLoaderInterface):
     
     def read_edf(self, file_path):
         return self._data_loader.read_edf(file_path)
+
+    def read_edf_header(self, file_path):
+        return self._data_loader.read_edf_header(file_path)
+
+    def read_edf_channels(self, file_path, channel_names):
+        return self._data_loader.read_edf_channels(file_path, channel_names)
+
+    def iter_edf_channel(self, file_path, channel_name, block_size=3600):
+        return self._data_loader.iter_edf_channel(file_path, channel_name, block_size)
     
     def read_parquet(self, file_path):
         return self._data_loader.read_parquet(file_path)
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+Author: Eshan Jayasundara
+Co-Author 1:
+Co-Author 2:
+Last Modified: 2025/06/29 by Eshan Jayasundara
+"""
+
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator
+import numpy as np
+from sleepdataspo2.clean_features import *
+from sleepdataspo2.prep_kernels import median_spo2
+
+class OnlineCleanerInterface(ABC):
+    @abstractmethod
+    def push(self, samples: np.ndarray) -> np.ndarray:
+        pass
+    @abstractmethod
+    def flush(self) -> np.ndarray:
+        pass
+    @abstractmethod
+    def reset(self) -> None:
+        pass
+
+    def clean_blocks(self, blocks: Iterable[np.ndarray]) -> Iterator[np.ndarray]:
+        """
+        Clean a stream of raw blocks, e.g. `(block for _, block in reader.iter_edf_channel(path, "SaO2"))`.
+
+        :return: generator of the cleaned 1 Hz samples released after each block, then by `flush`
+        """
+        for block in blocks:
+            cleaned = self.push(block)
+            if cleaned.shape[0] > 0:
+                yield cleaned
+        cleaned = self.flush()
+        if cleaned.shape[0] > 0:
+            yield cleaned
+
+class OnlineSpO2Cleaner(OnlineCleanerInterface):
+    """
+    Incremental version of the `CleanSpO2.clean_single` chain for live oximeter feeds.
+
+    Samples go through range -> delta -> median -> block -> resample -> interpolate as they
+    arrive, and every stage only keeps the state it needs: the last kept value (delta filter),
+    the last 8 samples (median filter), the current 100-sample block plus 10 look-ahead
+    samples (block filter), the current second (resampler) and a NaN gap of at most
+    `max_gap` seconds (interpolation). A sample is released about 114 + `original_frequency`
+    input samples after it arrives, or after its NaN gap closes.
+
+    Differences with the offline chain, which needs the whole night:
+    - only the first `skip_start` seconds are dropped; there is no end trim and no 7 h pad
+    - blocks are compared with the mean of the signal up to their end instead of the overall mean
+    - NaN gaps longer than `max_gap` seconds are held at the last valid value (98 before any)
+    """
+    def __init__(self, original_frequency: int, skip_start: int=5*60, max_gap: int=10*60, cleaner: CleanFeaturesInterface=None):
+        if original_frequency != int(original_frequency) or original_frequency <= 0:
+            raise ValueError(f"original_frequency = {original_frequency} is impossible. It should be a positive integer.")
+        self._frequency = int(original_frequency)
+        self._skip_start = skip_start
+        self._max_gap = max_gap
+        self._cleaner = cleaner if cleaner is not None else CleanFeatures(CleanSpO2())
+        self.reset()
+
+    def reset(self) -> None:
+        self._to_skip = self._skip_start * self._frequency
+        # delta filter: last kept sample
+        self._reference = None
+        # median filter: 4 samples before the pending ones (zeros at the start, like the offline zero padding)
+        self._median_buffer = np.zeros(4)
+        # block filter: samples not yet released, forward mask carried over, running sum for the mean
+        self._block_buffer = np.empty(0)
+        self._mask_ahead = 0
+        self._block_sum = 0.0
+        self._block_count = 0
+        # resampler: samples of the current second and number of samples seen
+        self._second_buffer = np.empty(0)
+        self._resample_count = 0
+        self._resample_emitted = 0
+        # interpolation: last valid 1 Hz value and the NaN gap waiting for the next one
+        self._last_valid = None
+        self._gap = 0
+
+    def push(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Feed raw samples at `original_frequency` Hz.
+
+        :return: cleaned 1 Hz samples released by this call (possibly none)
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if self._to_skip > 0:
+            skipped = min(self._to_skip, samples.shape[0])
+            samples = samples[skipped:]
+            self._to_skip -= skipped
+        # 1. Remove non-physiological values (<50% or >100%)
+        samples = np.where((samples < 50) | (samples > 100), np.nan, samples)
+        # 2. Delta filter against the last kept sample
+        kept = self._delta(samples)
+        # 3. Median filter, 4 samples behind
+        smoothed = self._median(kept, final=False)
+        # 4. Block artifacts, released 100 samples at a time
+        released = self._block(smoothed, final=False)
+        # 5. Resample to 1 Hz and 6. interpolate NaNs
+        return self._interpolate(self._resample(released, final=False), final=False)
+
+    def flush(self) -> np.ndarray:
+        """
+        End of stream: release everything still held back, then start over like after `reset`.
+
+        :return: the remaining cleaned 1 Hz samples
+        """
+        smoothed = self._median(np.empty(0), final=True)
+        released = self._block(smoothed, final=True)
+        cleaned = self._interpolate(self._resample(released, final=True), final=True)
+        self.reset()
+        return cleaned
+
+    def _delta(self, samples: np.ndarray) -> np.ndarray:
+        if samples.shape[0] == 0:
+            return samples
+        if self._reference is None:
+            kept = self._cleaner.dfilter(samples, Diff=8)
+        else:
+            # the reference is always kept, so it only serves as the comparison point
+            kept = self._cleaner.dfilter(np.concatenate(([self._reference], samples)), Diff=8)[1:]
+        if kept.shape[0] > 0:
+            self._reference = kept[-1]
+        return kept
+
+    def _median(self, kept: np.ndarray, final: bool) -> np.ndarray:
+        buffer = np.concatenate((self._median_buffer, kept))
+        if final:
+            buffer = np.concatenate((buffer, np.zeros(4)))
+        # every sample with 4 neighbours on both sides can be filtered
+        if buffer.shape[0] < 9:
+            self._median_buffer = buffer
+            return np.empty(0)
+        smoothed = median_spo2(buffer, FilterLength=9)[4:-4]
+        self._median_buffer = buffer[-8:] if not final else np.zeros(4)
+        return smoothed
+
+    def _block(self, smoothed: np.ndarray, final: bool, treshold=50) -> np.ndarray:
+        start = self._block_buffer.shape[0]
+        buffer = np.concatenate((self._block_buffer, smoothed))
+        # samples within 10 of a low value, including the ones carried over from the last call
+        buffer[start:start + self._mask_ahead] = np.nan
+        self._mask_ahead = max(self._mask_ahead - smoothed.shape[0], 0)
+        for low in np.flatnonzero(buffer[start:] < treshold) + start:
+            buffer[max(low - 10, 0):low + 10] = np.nan
+            self._mask_ahead = max(self._mask_ahead, low + 10 - buffer.shape[0])
+        # a block is final once 10 more samples are known; the last full block of the stream is never masked
+        releasable = buffer.shape[0] if final else max(buffer.shape[0] - 10, 0)
+        n_blocks = releasable // 100
+        if final and n_blocks * 100 == buffer.shape[0]:
+            n_blocks -= 1
+        cut = releasable if final else (releasable // 100) * 100
+        # each block is compared with the mean of the signal up to its end, so how the stream is
+        # chunked does not matter (the released sums are taken before any block is masked)
+        sums = self._block_sum + np.cumsum(buffer[:cut])
+        for b in range(max(n_blocks, 0)):
+            block = buffer[b*100:(b + 1)*100]
+            mean_signal = sums[(b + 1)*100 - 1] / (self._block_count + (b + 1)*100)
+            if np.mean(block) < mean_signal * 0.94:
+                block[:] = np.nan
+        if cut > 0:
+            self._block_sum = sums[-1]
+            self._block_count += cut
+        self._block_buffer = buffer[cut:]
+        return buffer[:cut]
+
+    def _resample(self, released: np.ndarray, final: bool) -> np.ndarray:
+        f = self._frequency
+        buffer = np.concatenate((self._second_buffer, released))
+        self._resample_count += released.shape[0]
+        full = buffer.shape[0] // f
+        resampled = np.median(buffer[:full*f].reshape(full, f), axis=1) if full > 0 else np.empty(0)
+        self._second_buffer = buffer[full*f:]
+        self._resample_emitted += full
+        if final and round(self._resample_count / f) > self._resample_emitted and self._second_buffer.shape[0] > 0:
+            resampled = np.append(resampled, np.median(self._second_buffer))
+        return resampled
+
+    def _interpolate(self, resampled: np.ndarray, final: bool) -> np.ndarray:
+        signal = np.concatenate((np.full(self._gap, np.nan), resampled))
+        nans = np.isnan(signal)
+        valid = np.flatnonzero(~nans)
+        if valid.shape[0] > 0:
+            xp, fp = valid, signal[valid]
+            if self._last_valid is not None:
+                # the last released valid value sits just before this buffer
+                xp, fp = np.concatenate(([-1], xp)), np.concatenate(([self._last_valid], fp))
+            upto = valid[-1] + 1
+            signal[:upto][nans[:upto]] = np.interp(np.flatnonzero(nans[:upto]), xp, fp)
+            self._last_valid = signal[valid[-1]]
+        else:
+            upto = 0
+        gap = signal.shape[0] - upto
+        if final or gap > self._max_gap:
+            # nothing left to interpolate towards: hold the last valid value
+            signal[upto:] = self._last_valid if self._last_valid is not None else 98
+            upto = signal.shape[0]
+        self._gap = signal.shape[0] - upto
+        return signal[:upto]
+
+class OnlineCleaner(OnlineCleanerInterface):
+    def __init__(self, online_cleaner: OnlineCleanerInterface):
+        self._online_cleaner = online_cleaner
+
+    def push(self, samples: np.ndarray) -> np.ndarray:
+        return self._online_cleaner.push(
+                    samples=samples
+                )
+
+    def flush(self) -> np.ndarray:
+        return self._online_cleaner.flush()
+
+    def reset(self) -> None:
+        return self._online_cleaner.reset()
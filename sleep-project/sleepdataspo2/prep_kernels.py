@@ -0,0 +1,92 @@
+"""
+Author: Eshan Jayasundara
+Co-Author 1: 
+Co-Author 2:
+Last Modified: 2025/06/29 by Eshan Jayasundara
+"""
+
+import numpy as np
+from scipy import ndimage
+
+# Drop-in, vectorized versions of the `pobm.prep` functions used by the cleaner.
+# Each returns the same values as its pobm counterpart (same edge handling and dtype).
+
+def set_range(signal, Range_min=50, Range_max=100):
+    """
+    Replace values lower than Range_min or greater than Range_max by NaN, like `pobm.prep.set_range`.
+
+    :return: preprocessed signal, 1-d numpy array (float64, or int64 when nothing was removed from an integer signal).
+    """
+    signal = np.asarray(signal)
+    out_of_range = (signal < Range_min) | (signal > Range_max)
+    if not np.issubdtype(signal.dtype, np.floating) and not out_of_range.any():
+        return signal.astype(np.int64)
+    signal = signal.astype(np.float64)
+    signal[out_of_range] = np.nan
+    return signal
+
+
+def median_spo2(signal, FilterLength=9):
+    """
+    Median filter over `FilterLength` samples of the rounded signal with zero padding, like `pobm.prep.median_spo2`.
+
+    Identical to scipy's `medfilt` for NaN-free input; the delta filter that runs before it drops NaNs.
+    """
+    return ndimage.median_filter(np.round(signal), size=FilterLength, mode="constant", cval=0.0)
+
+
+def block_data_inplace(signal: np.ndarray, treshold=50) -> np.ndarray:
+    """
+    In-place `block_data` on a float array.
+
+    Samples within 10 of a value below `treshold` are set to NaN (pobm's negative slice
+    start means samples 0..9 only mask anything on signals shorter than 20), then every
+    full 100-sample block except the last whose mean is below 94% of the signal mean.
+    """
+    n = signal.shape[0]
+    low = np.flatnonzero(signal < treshold)
+    starts = np.where(low < 10, np.maximum(n + low - 10, 0), low - 10)
+    stops = np.minimum(low + 10, n)
+    valid = starts < stops
+    cover = np.zeros(n + 1, dtype=np.int32)
+    np.add.at(cover, starts[valid], 1)
+    np.add.at(cover, stops[valid], -1)
+    signal[np.cumsum(cover[:n], dtype=np.int32) > 0] = np.nan
+
+    mean_signal = np.mean(signal)
+    n_blocks = len(range(0, n - 100, 100))
+    if n_blocks > 0:
+        blocks = signal[:n_blocks*100].reshape(n_blocks, 100)
+        blocks[np.mean(blocks, axis=1) < mean_signal * 0.94] = np.nan
+    return signal
+
+
+def block_data(signal, treshold=50):
+    """
+    Remove block artifacts like `pobm.prep.block_data`, on a copy of the signal.
+    """
+    return block_data_inplace(np.array(signal), treshold=treshold)
+
+
+def resamp_spo2(signal, OriginalFreq, out: np.ndarray = None):
+    """
+    Resample to 1 Hz with the median of each second, like `pobm.prep.resamp_spo2`.
+
+    Whole seconds are reduced in one reshaped median; a trailing partial second is kept
+    when the output length rounds up.
+
+    :param out: optional buffer of at least the output length to write into
+    :return: resampled signal, 1-d numpy array (float64 unless `out` is given)
+    """
+    signal = np.asarray(signal)
+    len_in = signal.shape[0]
+    len_out = round(len_in / OriginalFreq)
+    if out is None:
+        out = np.empty(len_out, dtype=np.float64)
+    out = out[:len_out]
+    full = min(len_in // OriginalFreq, len_out)
+    if full > 0:
+        out[:full] = np.median(signal[:full*OriginalFreq].reshape(full, OriginalFreq), axis=1)
+    if len_out > full:
+        out[full] = np.median(signal[full*OriginalFreq:(full + 1)*OriginalFreq])
+    return out
@@ -90,7 +90,63 @@ def main():
         type=bool,
         required=False,
         default=False,
-        help="Whether to calculate time eating complex features"
+        help="Whether to calculate complexity features (ApEn, LZ, CTM, SampEn, DFA)"
+    )
+
+    parser.add_argument(
+        "-mc", "--memmap_cache",
+        type=bool,
+        required=False,
+        default=False,
+        help="Whether to keep cleaned signals in one memory-mapped file per dataset instead of per-file parquet"
+    )
+
+    parser.add_argument(
+        "-sc", "--scratch_to",
+        type=str,
+        required=False,
+        default=None,
+        help="Directory (e.g. the tmpfs /dev/shm) where each EDF is staged while it is cleaned, so only cleaned outputs are written to --download_to"
+    )
+
+    parser.add_argument(
+        "-io", "--io_threads",
+        type=int,
+        required=False,
+        default=None,
+        help="Run download, clean and engineer as overlapped stages with this many download workers and --max_threads workers per CPU stage"
+    )
+
+    parser.add_argument(
+        "-mp", "--multiprocessing",
+        type=bool,
+        required=False,
+        default=False,
+        help="Whether to clean and engineer in worker processes (--max_threads of them) instead of threads"
+    )
+
+    parser.add_argument(
+        "-cc", "--cleaned_cache",
+        type=str,
+        required=False,
+        default=None,
+        help="Directory of a cache of cleaned signals keyed by the raw signal and cleaning parameters, so re-runs only clean what changed"
+    )
+
+    parser.add_argument(
+        "-ccs", "--cleaned_cache_max_bytes",
+        type=int,
+        required=False,
+        default=10 * 2**30,
+        help="Size limit of --cleaned_cache in bytes, least recently used entries are evicted beyond it"
+    )
+
+    parser.add_argument(
+        "-fs", "--feature_shards",
+        type=bool,
+        required=False,
+        default=False,
+        help="Whether features are written to one new shard file per recording without locking, merged into extracted_N_features.parquet and .csv at the end, instead of rewriting the CSV under a lock"
     )
 
     # Parse the command line arguments
@@ -110,11 +166,16 @@ def main():
         raise ValueError("one of '--start and --end' or --list should be provided")
     
     runner = Run(
-        downloader=DownloaderNSRR(),
+        downloader=DownloaderNSRR(pool_size=args.max_threads),
         reader=DataLoader(PandasDataLoader()),
         cleaner=CleanFeatures(CleanSpO2()),
         plotter=PlotGraphs(PlotGraphsNSRR()),
-        engineer=EngineerFeatures(EngineerOdi())
+        engineer=EngineerFeatures(EngineerOdi()),
+        signal_cache=SignalCache(MemmapSignalCache()) if args.memmap_cache else None,
+        processes=args.multiprocessing,
+        scratch_to=args.scratch_to,
+        cleaned_cache=CleanedCache(DiskCleanedCache(args.cleaned_cache, max_bytes=args.cleaned_cache_max_bytes)) if args.cleaned_cache else None,
+        feature_sink=FeatureSink(ShardedFeatureSink()) if args.feature_shards else None,
         )
 
     if args.list:
@@ -128,16 +189,29 @@ def main():
 
     print(files_to_download)
     
-    runner.run_all_steps_parallel(
-        dataset=args.dataset, 
-        file_names=files_to_download, 
-        token=os.environ["NSRR_TOKEN"], 
-        download_from=args.download_from,
-        download_to=args.download_to,
-        spo2_channel_name=args.spo2_channel_name,
-        max_threads=args.max_threads,
-        complex_features=args.complex_features,
-        )
+    if args.io_threads:
+        runner.run_all_steps_staged(
+            dataset=args.dataset, 
+            file_names=files_to_download, 
+            token=os.environ["NSRR_TOKEN"], 
+            download_from=args.download_from,
+            download_to=args.download_to,
+            spo2_channel_name=args.spo2_channel_name,
+            io_threads=args.io_threads,
+            cpu_threads=args.max_threads,
+            complex_features=args.complex_features,
+            )
+    else:
+        runner.run_all_steps_parallel(
+            dataset=args.dataset, 
+            file_names=files_to_download, 
+            token=os.environ["NSRR_TOKEN"], 
+            download_from=args.download_from,
+            download_to=args.download_to,
+            spo2_channel_name=args.spo2_channel_name,
+            max_threads=args.max_threads,
+            complex_features=args.complex_features,
+            )
 
 if __name__ == "__main__":
     main()
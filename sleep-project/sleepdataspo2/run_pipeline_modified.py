@@ -6,17 +6,33 @@ Last Modified: 2025/06/29 by Eshan Jayasundara
 """
 
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Union
+from collections import Counter
 import pandas as pd
 import os
-from filelock import FileLock, Timeout
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from sleepdataspo2 import BASE_URL, SPO2_CHANNEL_NAMES, MIN_RECORDING_DURATION
 
 from sleepdataspo2.load_data import *
 from sleepdataspo2.engineer_features import *
+from sleepdataspo2.epoch_features import *
+from sleepdataspo2.feature_sink import *
 from sleepdataspo2.clean_features import *
 from sleepdataspo2.plot_graphs import *
 from sleepdataspo2.download_data import  *
+from sleepdataspo2.cache_signals import *
+from sleepdataspo2.catalog_edfs import *
+from sleepdataspo2.staged_pipeline import *
+from sleepdataspo2.cleaned_cache import *
+
+def _init_process_worker() -> None:
+    # pay for the heavy imports once per worker process instead of once per recording
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot
+    import mne
+    import pobm.prep
+    import pobm.obm.desat, pobm.obm.burden, pobm.obm.complex, pobm.obm.general, pobm.obm.periodicity
 
 class RunInterface(ABC):
     @abstractmethod
@@ -29,18 +45,21 @@ class RunInterface(ABC):
     def delete_edf(self, dataset, download_from, download_to, file_name) -> None:
         pass
     @abstractmethod
-    def clean_signal(self, dataset, download_from, download_to, file_name,  spo2_channel_name) -> str:
+    def clean_signal(self, dataset, download_from, download_to, file_name,  spo2_channel_name, read_from) -> Union[str, SkippedSignal]:
         pass
     @abstractmethod
     def engineer_features(self, dataset, download_from, download_to, file_name, spo2_channel_name, complex_features) -> str:
         pass
     @abstractmethod
-    def run_all_steps(self, dataset:str, file_name: str, token: str, download_from:str, download_to: str, spo2_channel_name: str, complex_features: bool) -> None:
+    def run_all_steps(self, dataset:str, file_name: str, token: str, download_from:str, download_to: str, spo2_channel_name: str, complex_features: bool) -> Union[None, SkippedSignal]:
         pass
     @abstractmethod
     def run_downloader_parallel(self, dataset: str, file_names: List[str], token: str, download_from: str, download_to: str, max_threads: int) -> None:
         pass
     @abstractmethod
+    def run_downloader_async(self, dataset: str, file_names: List[str], token: str, download_from: str, download_to: str) -> None:
+        pass
+    @abstractmethod
     def run_cleaner_parallel(self, dataset: str, file_names: List[str], download_from: str, download_to: str, spo2_channel_name: str, max_threads: int) -> None:
         pass
     @abstractmethod
@@ -50,31 +69,85 @@ class RunInterface(ABC):
     def run_engineer_parallel(self, dataset: str, file_names: List[str], download_from: str, download_to: str, spo2_channel_name: str, complex_features: bool, max_threads: int) -> None:
         pass
     @abstractmethod
+    def run_engineer_batch(self, dataset: str, file_names: List[str], download_from: str, download_to: str, complex_features: bool, batch_size: int) -> None:
+        pass
+    @abstractmethod
+    def compact_features(self, dataset: str, download_from: str, download_to: str) -> List[str]:
+        pass
+    @abstractmethod
+    def engineer_epochs(self, dataset, download_from, download_to, file_name, window, hop) -> str:
+        pass
+    @abstractmethod
+    def run_epochs_parallel(self, dataset: str, file_names: List[str], download_from: str, download_to: str, window: int, hop: int, max_threads: int) -> None:
+        pass
+    @abstractmethod
     def run_all_steps_parallel(self, dataset: str, file_names: List[str], token: str, download_from: str, download_to: str, spo2_channel_name: str, max_threads: int, complex_features: bool) -> pd.Series:
         pass
+    @abstractmethod
+    def run_all_steps_staged(self, dataset: str, file_names: List[str], token: str, download_from: str, download_to: str, spo2_channel_name: str, io_threads: int, cpu_threads: int, complex_features: bool) -> None:
+        pass
 
 class Run(RunInterface):
     def __init__(
         self,
-        downloader: DownloaderNSRR = None,
+        downloader: DownloaderInterface = None,
         reader: DataLoader = None,
         cleaner: CleanFeatures = None,
         plotter: PlotGraphs = None,
         engineer: EngineerFeatures = None,
+        signal_cache: SignalCache = None,
+        catalog: EdfCatalog = None,
+        scratch_to: str = None,
+        processes: bool = False,
+        cleaned_cache: CleanedCache = None,
+        epochs: EpochFeatures = None,
+        feature_sink: FeatureSink = None,
     ):
         self._downloader = downloader
         self._reader = reader
         self._cleaner = cleaner
         self._plotter = plotter
         self._engineer = engineer
+        self._signal_cache = signal_cache
+        self._catalog = catalog
+        # when set, run_all_steps stages each EDF here (e.g. a tmpfs like /dev/shm) instead of in download_to
+        self._scratch_to = scratch_to
+        # cleaning and feature extraction are mostly GIL-bound, so they can run in worker processes instead
+        self._processes = processes
+        # when set, cleaned signals are reused by hash of the raw channel and the cleaning parameters
+        self._cleaned_cache = cleaned_cache
+        self._epochs = epochs
+        # where engineered features go; by default the locked extracted_{N}_features.csv rewrite
+        self._feature_sink = feature_sink if feature_sink is not None else FeatureSink(CsvFeatureSink())
+
+    def _cpu_executor(self, max_workers: int):
+        if self._processes:
+            return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_process_worker)
+        return ThreadPoolExecutor(max_workers=max_workers)
+
+    def _is_cleaned(self, path: str, name: str) -> bool:
+        if self._signal_cache is not None and self._signal_cache.contains(path, name):
+            return True
+        return os.path.exists(f"{path}/{name}_cleaned.parquet")
+
+    def _report_skips(self, skipped: List[SkippedSignal]) -> Counter:
+        counts = Counter(skip.reason for skip in skipped)
+        if counts:
+            print(f"[ℹ️] Skipped {sum(counts.values())} recording(s): " + ", ".join(f"{reason} {count}" for reason, count in sorted(counts.items())))
+        return counts
+
+    def _report_cleaned_cache(self) -> None:
+        if self._cleaned_cache is not None:
+            stats = self._cleaned_cache.stats()
+            print(f"[ℹ️] Cleaned cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions, "
+                  f"{stats['entries']} entries ({stats['bytes'] / 2**20:.1f} MiB)")
 
     def preapre_csv(self, dataset, download_from, download_to, file_name, spo2_channel_name) -> None:
         path = f"{download_to}/{dataset}/{download_from}"
         try:
             df = self._reader.read_edf(file_path=f"{path}/{file_name}.edf")
             
-            possible_names = ["SaO2", "SpO2", "SPO2", "Sao2", "PulseOx", "OXI_SAT"]
-            for name in possible_names:
+            for name in SPO2_CHANNEL_NAMES:
                 if name in df.columns:
                     spo2_channel_name = name
                     print(f"[ℹ️] Auto-selected SpO2 channel: '{name}'")
@@ -93,8 +166,7 @@ class Run(RunInterface):
         try:
             df = self._reader.read_edf(file_path=f"{path}/{file_name}.edf")
             
-            possible_names = ["SaO2", "SpO2", "SPO2", "Sao2", "PulseOx", "OXI_SAT"]
-            for name in possible_names:
+            for name in SPO2_CHANNEL_NAMES:
                 if name in df.columns:
                     spo2_channel_name = name
                     print(f"[ℹ️] Auto-selected SpO2 channel: '{name}'")
@@ -120,12 +192,23 @@ class Run(RunInterface):
             print(f"{self.__class__}/delete_edf", e)
         
 
-    def clean_signal(self, dataset, download_from, download_to, file_name,  spo2_channel_name) -> str:
+    def clean_signal(self, dataset, download_from, download_to, file_name,  spo2_channel_name, read_from: str = None) -> Union[str, SkippedSignal]:
         path = f"{download_to}/{dataset}/{download_from}"
-        file_path = f"{path}/{file_name}"
+        # the raw file may live outside download_to (see scratch_to), the cleaned output never does
+        file_path = f"{read_from if read_from is not None else download_to}/{dataset}/{download_from}/{file_name}"
         file_exists_flag = os.path.exists(file_path)
+        original_frequency = None
         if file_path.endswith(".edf") and file_exists_flag:
-            df = self._reader.read_edf(file_path=file_path)
+            # decode only the SpO2 channel and take its frequency from the header
+            header = self._reader.read_edf_header(file_path=file_path)
+            if header["duration"] < MIN_RECORDING_DURATION:
+                print(f"[✘] Skipped {file_name}: recording lasts {header['duration']:.0f} s, less than {MIN_RECORDING_DURATION} s")
+                return SkippedSignal("too_short", f"recording lasts {header['duration']:.0f} s")
+            labels = [signal["label"] for signal in header["signals"]]
+            channels = [name for name in SPO2_CHANNEL_NAMES if name in labels][:1]
+            if not channels:
+                raise KeyError(f"No known SpO2 channel found in columns: {labels}")
+            df, original_frequency = self._reader.read_edf_channels(file_path=file_path, channel_names=channels)
         elif file_path.endswith(".csv") and file_exists_flag:
             df = self._reader.read_csv(file_path=file_path)
         elif file_path.endswith(".parquet") and file_exists_flag:
@@ -133,15 +216,16 @@ class Run(RunInterface):
         else:
             raise FileNotFoundError(f"{file_path} does not exists...")
 
-        intervals = df['time'].diff().dropna()
-        if not np.allclose(intervals, intervals.iloc[0]):
-            raise ValueError("Warning: Irregular sampling intervals detected!")
-        if 1 / intervals.iloc[0] != int(1 / intervals.iloc[0]):
-            raise ValueError(f"original_frequency = {1 / intervals.iloc[0]} is impossible. It should be an integer.")
-        original_frequency = int(1 / intervals.iloc[0])
+        if original_frequency is None:
+            intervals = df['time'].diff().dropna()
+            if not np.allclose(intervals, intervals.iloc[0]):
+                raise ValueError("Warning: Irregular sampling intervals detected!")
+            original_frequency = 1 / intervals.iloc[0]
+        if original_frequency != int(original_frequency):
+            raise ValueError(f"original_frequency = {original_frequency} is impossible. It should be an integer.")
+        original_frequency = int(original_frequency)
         
-        possible_names = ["SaO2", "SpO2", "SPO2", "Sao2", "PulseOx", "OXI_SAT"]
-        for name in possible_names:
+        for name in SPO2_CHANNEL_NAMES:
             if name in df.columns:
                 spo2_channel_name = name
                 print(f"[ℹ️] Auto-selected SpO2 channel: '{name}'")
@@ -149,89 +233,82 @@ class Run(RunInterface):
         else:
             raise KeyError(f"No known SpO2 channel found in columns: {df.columns.tolist()}")
         
-        spo2 = self._cleaner.clean_single(df[spo2_channel_name], original_frequency)
+        spo2, key = None, None
+        if self._cleaned_cache is not None:
+            key = self._cleaned_cache.key(df[spo2_channel_name].to_numpy(), original_frequency, self._cleaner.config())
+            spo2 = self._cleaned_cache.get(key)
+        if spo2 is None:
+            spo2 = self._cleaner.clean_single(df[spo2_channel_name], original_frequency)
+            if key is not None:
+                self._cleaned_cache.put(key, spo2)
+        if isinstance(spo2, SkippedSignal):
+            print(f"[✘] Skipped {file_name}: {spo2.detail}")
+            return spo2
 
         name = file_name.split(".")[0]
 
-        pd.DataFrame({
-                "time": [i for i in range(len(spo2))],
-                "SaO2": spo2.tolist()
-            }).set_index("time").to_parquet(path=f"{path}/{name}_cleaned.parquet")
+        os.makedirs(path, exist_ok=True)
+        if self._signal_cache is not None:
+            self._signal_cache.write(path, name, np.asarray(spo2))
+        else:
+            pd.DataFrame({
+                    "time": [i for i in range(len(spo2))],
+                    "SaO2": spo2.tolist()
+                }).set_index("time").to_parquet(path=f"{path}/{name}_cleaned.parquet")
         
         self._plotter.plot_one_signal(signal=df[spo2_channel_name], title=f"{name} Original Signal", save_path=f"{download_to}/{dataset}/images/original", name=name)
         self._plotter.plot_one_signal(signal=spo2, title=f"{name} Cleaned Signal", save_path=f"{download_to}/{dataset}/images/cleaned", name=name)
         
         return name
 
-    def engineer_features(self, dataset, download_from, download_to, file_name,  spo2_channel_name, complex_features: bool) -> str:
-        path = f"{download_to}/{dataset}/{download_from}"
-
+    def _read_cleaned(self, path: str, file_name: str) -> pd.Series:
         file_path = f"{path}/{file_name}_cleaned.parquet"
-        if file_path.endswith(".parquet") and os.path.exists(file_path):
+        if self._signal_cache is not None and self._signal_cache.contains(path, file_name):
+            # memory-mapped row instead of a per-file parquet decode
+            df = pd.DataFrame({"SaO2": self._signal_cache.read(path, file_name)})
+        elif file_path.endswith(".parquet") and os.path.exists(file_path):
             df = self._reader.read_parquet(file_path=file_path)
         else:
             raise FileNotFoundError(f"{file_path} does not exists...")
         
-        possible_names = ["SaO2", "SpO2", "SPO2", "Sao2", "PulseOx", "OXI_SAT"]
-        for name in possible_names:
+        for name in SPO2_CHANNEL_NAMES:
             if name in df.columns:
-                spo2_channel_name = name
                 print(f"[ℹ️] Auto-selected SpO2 channel: '{name}'")
-                break
-        else:
-            raise KeyError(f"No known SpO2 channel found in columns: {df.columns.tolist()}")
-        
-        features = self._engineer.compute_single(spo2=df[spo2_channel_name], complex_features=complex_features)
-        
-        csv_path = os.path.join(path, f"extracted_{len(features)}_features.csv")
-        lock_path = csv_path + ".lock"
+                return df[name]
+        raise KeyError(f"No known SpO2 channel found in columns: {df.columns.tolist()}")
 
-        # Extract just the numeric part of the file_name (e.g., "200001" from "shhs1-200001")
-        nsrr_id = file_name.split("-")[-1]
+    def engineer_features(self, dataset, download_from, download_to, file_name,  spo2_channel_name, complex_features: bool) -> str:
+        path = f"{download_to}/{dataset}/{download_from}"
+        spo2 = self._read_cleaned(path, file_name)
 
-        # Use a file lock to avoid concurrent write issues
-        lock = FileLock(lock_path, timeout=180)  # waits up to 180 seconds
+        features = self._engineer.compute_single(spo2=spo2, complex_features=complex_features)
 
-        try:
-            # 1. Lock is acquired at the start of the with block
-            # 2. If an exception occurs inside the block:
-            #       The with statement guarantees that __exit__() is called.
-            #       This automatically releases the lock, even if the block was exited due to an error.
-            with lock:
-                if os.path.exists(csv_path):
-                    df = pd.read_csv(csv_path, index_col="nsrrid")
-                    df.index = df.index.astype(str).str.strip()  # enforce string + trim whitespace
-                    df = df[~df.index.duplicated(keep='last')]   # drop any existing duplicates
-                else:
-                    df = pd.DataFrame(columns=features.keys())
-                    df.index.name = "nsrrid"
-                    df.index = df.index.astype(str).str.strip()
-
-                df.loc[nsrr_id] = features
-                # print(type(nsrr_id))
-                df = df[~df.index.duplicated(keep='last')] # ensure no duplicates
-                df.to_csv(csv_path)
-                print(f"[✔] Updated: {csv_path}")
-
-        except Timeout:
-            print(f"[✘] Timeout while waiting for the lock: {lock_path}")
-        except Exception as e:
-            print(f"[✘] Error during preprocessing for {file_name}: {e}")
+        # Extract just the numeric part of the file_name (e.g., "200001" from "shhs1-200001")
+        nsrr_id = file_name.split("-")[-1]
+        self._feature_sink.write(path, pd.DataFrame([features], index=pd.Index([nsrr_id], name="nsrrid")))
     
-    def run_all_steps(self, dataset:str, file_name: str, token: str, download_from:str, download_to: str, spo2_channel_name:str, complex_features: bool) -> None:
-            download_path = f"{download_to}/{dataset}/{download_from}"
+    def run_all_steps(self, dataset:str, file_name: str, token: str, download_from:str, download_to: str, spo2_channel_name:str, complex_features: bool) -> Union[None, SkippedSignal]:
+            # the EDF is only scratch space, so it can be staged outside download_to
+            stage_to = self._scratch_to if self._scratch_to is not None else download_to
+            download_path = f"{stage_to}/{dataset}/{download_from}"
             os.makedirs(download_path, exist_ok=True)
             # check if the file already downloaded
             file_loc = f"{download_path}/{file_name}.edf"
             if os.path.exists(file_loc):
                 print(f"[✔] Download terminated, file already exists: {file_loc}")
-                self.clean_signal(dataset=dataset, download_from=download_from, download_to=download_to, file_name=f"{file_name}.edf",  spo2_channel_name=spo2_channel_name)
-                self.delete_edf(dataset=dataset, download_from=download_from, download_to=download_to, file_name=file_name)
-                self.engineer_features(dataset=dataset, download_from=download_from, download_to=download_to, file_name=file_name, spo2_channel_name=spo2_channel_name, complex_features=complex_features)
-                return
-            self._downloader.download(dataset=dataset, file_name=file_name, token=token, download_from=download_from, download_to=download_to)
-            self.clean_signal(dataset=dataset, download_from=download_from, download_to=download_to, file_name=f"{file_name}.edf",  spo2_channel_name=spo2_channel_name)
-            self.delete_edf(dataset=dataset, download_from=download_from, download_to=download_to, file_name=file_name)
+            else:
+                self._downloader.download(dataset=dataset, file_name=file_name, token=token, download_from=download_from, download_to=stage_to)
+            try:
+                cleaned = self.clean_signal(dataset=dataset, download_from=download_from, download_to=download_to, file_name=f"{file_name}.edf",  spo2_channel_name=spo2_channel_name, read_from=stage_to)
+            except Exception:
+                # a staged EDF left behind by a failed clean would hold scratch space (e.g. RAM with /dev/shm) until the end,
+                # while one in download_to is kept so the recording can be retried without downloading it again
+                if self._scratch_to is not None:
+                    self.delete_edf(dataset=dataset, download_from=download_from, download_to=stage_to, file_name=file_name)
+                raise
+            self.delete_edf(dataset=dataset, download_from=download_from, download_to=stage_to, file_name=file_name)
+            if isinstance(cleaned, SkippedSignal):
+                return cleaned
             self.engineer_features(dataset=dataset, download_from=download_from, download_to=download_to, file_name=file_name, spo2_channel_name=spo2_channel_name, complex_features=complex_features)
 
     def run_downloader_parallel(self, dataset: str, file_names: List[str], token: str, download_from: str, download_to: str, max_threads: int) -> None:
@@ -252,22 +329,55 @@ class Run(RunInterface):
                     print(f"Error downloading: {e}")
                     traceback.print_exc()
 
+    def run_downloader_async(self, dataset: str, file_names: List[str], token: str, download_from: str, download_to: str) -> None:
+        # concurrency and bandwidth limits belong to the AsyncDownloaderNSRR given to Run
+        downloader = self._downloader
+        if not isinstance(downloader, AsyncDownloaderNSRR):
+            # a Run built for threaded downloads still gets one event loop, with the default limits
+            downloader = AsyncDownloaderNSRR(base_url=getattr(downloader, "_base_url", BASE_URL))
+        download_path = f"{download_to}/{dataset}/{download_from}"
+        os.makedirs(download_path, exist_ok=True)
+        downloader.download_many(
+            dataset,
+            [
+                file_name for file_name in file_names
+                # if ".edf" already exists don't download it again
+                if not os.path.exists(f"{download_path}/{file_name}.edf")
+            ],
+            token,
+            download_from,
+            download_to,
+        )
+
     def run_cleaner_parallel(self, dataset: str, file_names: List[str], download_from: str, download_to: str, spo2_channel_name: str, max_threads: int) -> None:
         download_path = f"{download_to}/{dataset}/{download_from}"
-        with ThreadPoolExecutor(max_workers=max_threads) as executor:
+        skipped = []
+        if self._catalog is not None:
+            # reject short or SpO2-less recordings from their headers before loading them
+            self._catalog.build(download_path)
+            selected = self._catalog.select(download_path, file_names)
+            skipped += [SkippedSignal("catalog", "rejected from its EDF header") for _ in range(len(file_names) - len(selected))]
+            file_names = selected
+        with self._cpu_executor(max_workers=max_threads) as executor:
             futures = [
                         executor.submit(self.clean_signal, dataset, download_from, download_to, f"{file_name}.edf", spo2_channel_name)
                         for file_name in file_names
-                        # if "<>_cleaned.parquet" already exists don't clean original signal again
-                        if not os.path.exists(f"{download_path}/{file_name}_cleaned.parquet")
+                        # if "<>_cleaned.parquet" (or its cached row) already exists don't clean original signal again,
+                        # unless the cleaned cache can tell from the EDF (if not flushed yet) whether it is still up to date
+                        if not self._is_cleaned(download_path, file_name)
+                        or (self._cleaned_cache is not None and os.path.exists(f"{download_path}/{file_name}.edf"))
                     ]
 
             for future in as_completed(futures):
                 try:
-                    future.result()  # To raise exceptions if any
+                    result = future.result()  # To raise exceptions if any
+                    if isinstance(result, SkippedSignal):
+                        skipped.append(result)
                 except Exception as e:
                     print(f"Error cleaning: {e}")
                     traceback.print_exc()
+        self._report_skips(skipped)
+        self._report_cleaned_cache()
 
     def run_flusher_parallel(self, dataset: str, file_names: List[str], download_from: str, download_to: str, max_threads: int) -> None:
         download_path = f"{download_to}/{dataset}/{download_from}"
@@ -288,12 +398,12 @@ class Run(RunInterface):
 
     def run_engineer_parallel(self, dataset: str, file_names: List[str], download_from: str, download_to: str, spo2_channel_name: str, complex_features: bool, max_threads: int) -> None:
         download_path = f"{download_to}/{dataset}/{download_from}"
-        with ThreadPoolExecutor(max_workers=max_threads) as executor:
+        with self._cpu_executor(max_workers=max_threads) as executor:
             futures = [
                         executor.submit(self.engineer_features, dataset, download_from, download_to, file_name, spo2_channel_name, complex_features)
                         for file_name in file_names
-                        # if "<>_cleaned.parquet" exists, do feature engineering
-                        if os.path.exists(f"{download_path}/{file_name}_cleaned.parquet")
+                        # if "<>_cleaned.parquet" (or its cached row) exists, do feature engineering
+                        if self._is_cleaned(download_path, file_name)
                     ]
 
             for future in as_completed(futures):
@@ -302,6 +412,71 @@ class Run(RunInterface):
                 except Exception as e:
                     print(f"Error deleting: {e}")
                     traceback.print_exc()
+        self.compact_features(dataset, download_from, download_to)
+
+    def run_engineer_batch(self, dataset: str, file_names: List[str], download_from: str, download_to: str, complex_features: bool, batch_size: int) -> None:
+        """
+        Engineers features for batch_size cleaned recordings at a time with one compute_batch call
+        per batch. Recordings whose cleaned length differs from the rest go through engineer_features.
+        """
+        path = f"{download_to}/{dataset}/{download_from}"
+        # if "<>_cleaned.parquet" (or its cached row) exists, do feature engineering
+        file_names = [file_name for file_name in file_names if self._is_cleaned(path, file_name)]
+        for start in range(0, len(file_names), batch_size):
+            batch = []
+            for file_name in file_names[start:start + batch_size]:
+                try:
+                    batch.append((file_name, self._read_cleaned(path, file_name).to_numpy(dtype=np.float64)))
+                except Exception as e:
+                    print(f"[✘] Error reading {file_name}: {e}")
+            if not batch:
+                continue
+
+            # every cleaned signal is CLEANED_SIGNAL_LENGTH long unless cleaned with other settings
+            length = Counter(len(signal) for _, signal in batch).most_common(1)[0][0]
+            for file_name, signal in batch:
+                if len(signal) != length:
+                    self.engineer_features(dataset, download_from, download_to, file_name, None, complex_features)
+            batch = [(file_name, signal) for file_name, signal in batch if len(signal) == length]
+
+            # Extract just the numeric part of the file_name (e.g., "200001" from "shhs1-200001")
+            nsrr_ids = [file_name.split("-")[-1] for file_name, _ in batch]
+            features = self._engineer.compute_batch(spo2=np.stack([signal for _, signal in batch]), nsrr_ids=nsrr_ids, complex_features=complex_features)
+            self._feature_sink.write(path, features)
+        self.compact_features(dataset, download_from, download_to)
+
+    def compact_features(self, dataset: str, download_from: str, download_to: str) -> List[str]:
+        # merges what the feature sink appended since the last compaction (a no-op for the CSV sink)
+        return self._feature_sink.compact(f"{download_to}/{dataset}/{download_from}")
+
+    def engineer_epochs(self, dataset, download_from, download_to, file_name, window: int, hop: int = None) -> str:
+        path = f"{download_to}/{dataset}/{download_from}"
+        spo2 = self._read_cleaned(path, file_name)
+
+        epochs = self._epochs.compute_epochs(spo2=spo2, window=window, hop=hop)
+
+        # next to the cleaned signal, one file per window length
+        epochs_path = f"{path}/{file_name}_epochs_{window}s.parquet"
+        epochs.to_parquet(path=epochs_path)
+        print(f"[✔] Created: {epochs_path}")
+        return epochs_path
+
+    def run_epochs_parallel(self, dataset: str, file_names: List[str], download_from: str, download_to: str, window: int, hop: int, max_threads: int) -> None:
+        download_path = f"{download_to}/{dataset}/{download_from}"
+        with self._cpu_executor(max_workers=max_threads) as executor:
+            futures = [
+                        executor.submit(self.engineer_epochs, dataset, download_from, download_to, file_name, window, hop)
+                        for file_name in file_names
+                        # if "<>_cleaned.parquet" (or its cached row) exists, compute its epoch table
+                        if self._is_cleaned(download_path, file_name)
+                    ]
+
+            for future in as_completed(futures):
+                try:
+                    future.result()  # To raise exceptions if any
+                except Exception as e:
+                    print(f"Error computing epochs: {e}")
+                    traceback.print_exc()
 
     def run_all_steps_parallel(self, dataset: str, file_names: List[str], token: str, download_from: str, download_to: str, spo2_channel_name: str, max_threads: int, complex_features: bool) -> None:
         with ThreadPoolExecutor(max_workers=max_threads) as executor:
@@ -310,9 +485,79 @@ class Run(RunInterface):
                         for file_name in file_names
                     ]
 
+            skipped = []
             for future in as_completed(futures):
                 try:
-                    future.result()  # To raise exceptions if any
+                    result = future.result()  # To raise exceptions if any
+                    if isinstance(result, SkippedSignal):
+                        skipped.append(result)
                 except Exception as e:
                     print(f"Error: {e}")
                     traceback.print_exc()
+        self._report_skips(skipped)
+        self._report_cleaned_cache()
+        self.compact_features(dataset, download_from, download_to)
+
+    def run_all_steps_staged(self, dataset: str, file_names: List[str], token: str, download_from: str, download_to: str, spo2_channel_name: str, io_threads: int, cpu_threads: int, complex_features: bool, queue_size: int = None) -> None:
+        # same steps as run_all_steps, but each one has its own workers and downloads run ahead of cleaning
+        stage_to = self._scratch_to if self._scratch_to is not None else download_to
+        download_path = f"{stage_to}/{dataset}/{download_from}"
+        os.makedirs(download_path, exist_ok=True)
+
+        def download(file_name):
+            if os.path.exists(f"{download_path}/{file_name}.edf"):
+                print(f"[✔] Download terminated, file already exists: {download_path}/{file_name}.edf")
+                return
+            if self._downloader.download(dataset=dataset, file_name=file_name, token=token, download_from=download_from, download_to=stage_to) == "fail":
+                raise RuntimeError(f"download of {file_name}.edf failed")
+
+        # with processes, each CPU stage thread only waits on its recording's task in the shared pool
+        cpu_pool = ProcessPoolExecutor(max_workers=cpu_threads, initializer=_init_process_worker) if self._processes else None
+
+        # rejected recordings still pass through delete, but are not engineered
+        skipped = {}
+
+        def clean(file_name):
+            try:
+                if cpu_pool is not None:
+                    result = cpu_pool.submit(self.clean_signal, dataset, download_from, download_to, f"{file_name}.edf", spo2_channel_name, stage_to).result()
+                else:
+                    result = self.clean_signal(dataset=dataset, download_from=download_from, download_to=download_to, file_name=f"{file_name}.edf", spo2_channel_name=spo2_channel_name, read_from=stage_to)
+            except Exception:
+                # a failed item never reaches the delete stage, so its staged EDF is removed here
+                # (an EDF in download_to is kept for a retry, see run_all_steps)
+                if self._scratch_to is not None:
+                    delete(file_name)
+                raise
+            if isinstance(result, SkippedSignal):
+                skipped[file_name] = result
+
+        def delete(file_name):
+            self.delete_edf(dataset=dataset, download_from=download_from, download_to=stage_to, file_name=file_name)
+
+        def engineer(file_name):
+            if file_name in skipped:
+                return
+            if cpu_pool is not None:
+                cpu_pool.submit(self.engineer_features, dataset, download_from, download_to, file_name, spo2_channel_name, complex_features).result()
+            else:
+                self.engineer_features(dataset=dataset, download_from=download_from, download_to=download_to, file_name=file_name, spo2_channel_name=spo2_channel_name, complex_features=complex_features)
+
+        pipeline = StagedPipeline(
+            stages=[
+                Stage("download", download, workers=io_threads),
+                Stage("clean", clean, workers=cpu_threads),
+                Stage("delete", delete, workers=1),
+                Stage("engineer", engineer, workers=cpu_threads),
+            ],
+            # bounds how many downloaded EDFs can wait for a cleaner
+            queue_size=queue_size if queue_size is not None else 2 * cpu_threads,
+        )
+        try:
+            pipeline.run(file_names)
+        finally:
+            if cpu_pool is not None:
+                cpu_pool.shutdown()
+        self._report_skips(list(skipped.values()))
+        self._report_cleaned_cache()
+        self.compact_features(dataset, download_from, download_to)
@@ -0,0 +1,111 @@
+"""
+Author: Eshan Jayasundara
+Co-Author 1: 
+Co-Author 2:
+Last Modified: 2025/06/29 by Eshan Jayasundara
+"""
+
+from typing import Callable, List
+import threading
+import traceback
+import queue
+import time
+
+class Stage:
+    """One step of a `StagedPipeline`: `func(item)` runs on `workers` threads and its result is passed on."""
+    def __init__(self, name: str, func: Callable, workers: int):
+        if workers <= 0:
+            raise ValueError(f"Stage '{name}' needs at least one worker")
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.done = 0
+        self.failed = 0
+        self.busy = 0
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.done += 1
+            else:
+                self.failed += 1
+
+class StagedPipeline:
+    """
+    Producer/consumer chain of stages connected by bounded queues.
+
+    Every stage has its own worker threads, so a slow stage only back-pressures its
+    producers once its input queue is full, and network-bound and CPU-bound stages
+    overlap instead of competing for the same slots. An item whose stage raises is
+    reported and dropped; the rest keep flowing.
+    """
+    _sentinel = object()
+
+    def __init__(self, stages: List[Stage], queue_size: int=8, report_every: float=30.0):
+        self._stages = stages
+        self._queues = [queue.Queue()] + [queue.Queue(maxsize=queue_size) for _ in stages[1:]]
+        self._report_every = report_every
+        self._started = None
+
+    def _work(self, index: int) -> None:
+        stage = self._stages[index]
+        inbox = self._queues[index]
+        outbox = self._queues[index + 1] if index + 1 < len(self._stages) else None
+        while True:
+            item = inbox.get()
+            if item is self._sentinel:
+                return
+            with stage._lock:
+                stage.busy += 1
+            try:
+                result = stage.func(item)
+                stage.record(ok=True)
+                if outbox is not None:
+                    outbox.put(item if result is None else result)
+            except Exception as e:
+                stage.record(ok=False)
+                print(f"[✘] Stage '{stage.name}' failed for {item}: {e}")
+                traceback.print_exc()
+            finally:
+                with stage._lock:
+                    stage.busy -= 1
+
+    def report(self) -> str:
+        elapsed = max(time.time() - self._started, 1e-9)
+        lines = []
+        for stage, inbox in zip(self._stages, self._queues):
+            lines.append(
+                f"{stage.name:>10}: queued {inbox.qsize():>4} | busy {stage.busy:>3}/{stage.workers:<3} | "
+                f"done {stage.done:>5} | failed {stage.failed:>4} | {stage.done / elapsed * 60:7.2f} items/min"
+            )
+        return "\n".join(lines)
+
+    def run(self, items: List) -> None:
+        self._started = time.time()
+        finished = threading.Event()
+
+        def reporter():
+            while not finished.wait(self._report_every):
+                print(f"[ℹ️] Pipeline status after {time.time() - self._started:.0f}s\n{self.report()}")
+
+        threading.Thread(target=reporter, daemon=True).start()
+
+        pools = []
+        for index, stage in enumerate(self._stages):
+            threads = [threading.Thread(target=self._work, args=(index,), daemon=True) for _ in range(stage.workers)]
+            for thread in threads:
+                thread.start()
+            pools.append(threads)
+
+        for item in items:
+            self._queues[0].put(item)
+        # close each stage only after every worker of the previous one has drained
+        for index, threads in enumerate(pools):
+            for _ in threads:
+                self._queues[index].put(self._sentinel)
+            for thread in threads:
+                thread.join()
+
+        finished.set()
+        print(f"[✔] Pipeline finished in {time.time() - self._started:.0f}s\n{self.report()}")
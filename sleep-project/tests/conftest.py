@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+def write_edf(path, signals, record_duration=1.0):
+    """
+    Minimal EDF writer for tests.
+
+    :param signals: list of dicts with label, unit, physical_min, physical_max, digital_min,
+        digital_max, n_samples (per record) and digital (int16 samples, a multiple of n_samples long)
+    """
+    n_records = len(signals[0]["digital"]) // signals[0]["n_samples"]
+    ns = len(signals)
+
+    def field(value, width):
+        return str(value).ljust(width)[:width].encode("latin-1")
+
+    header = b"".join([
+        field(0, 8), field("X X X X", 80), field("Startdate 01-JAN-2000 X X X", 80),
+        field("01.01.00", 8), field("00.00.00", 8), field(256 + 256 * ns, 8), field("", 44),
+        field(n_records, 8), field(record_duration, 8), field(ns, 4),
+    ])
+    for key, width in [("label", 16), ("transducer", 80), ("unit", 8), ("physical_min", 8), ("physical_max", 8),
+                       ("digital_min", 8), ("digital_max", 8), ("prefilter", 80), ("n_samples", 8), ("reserved", 32)]:
+        header += b"".join(field(signal.get(key, ""), width) for signal in signals)
+
+    records = np.concatenate([
+        np.asarray(signal["digital"], dtype="<i2").reshape(n_records, signal["n_samples"]) for signal in signals
+    ], axis=1)
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(records.tobytes())
+    return str(path)
+
+def spo2_channel(percent, n_samples=1, digital_min=-32768, digital_max=32767, physical_min=0.0, physical_max=100.0):
+    """SaO2 channel quantized over the given digital range"""
+    percent = np.asarray(percent, dtype=np.float64)
+    scale = (digital_max - digital_min) / (physical_max - physical_min)
+    digital = np.clip(np.round((percent - physical_min) * scale + digital_min), digital_min, digital_max).astype(np.int16)
+    return {"label": "SaO2", "unit": "%", "physical_min": physical_min, "physical_max": physical_max,
+            "digital_min": digital_min, "digital_max": digital_max, "n_samples": n_samples, "digital": digital}
+
+@pytest.fixture
+def full_range_edf(tmp_path):
+    """
+    EDF whose 1 Hz SaO2 channel uses the full int16 digital range, stored after a Pleth channel
+    in 4 s data records (mne resamples channels of different rates, so both are 1 Hz)
+    """
+    rng = np.random.default_rng(0)
+    seconds = 600
+    other = {"label": "Pleth", "unit": "", "physical_min": -1.0, "physical_max": 1.0,
+             "digital_min": -32768, "digital_max": 32767, "n_samples": 4,
+             "digital": rng.integers(-32768, 32768, seconds).astype(np.int16)}
+    spo2 = spo2_channel(np.clip(95 + np.cumsum(rng.normal(0, 0.3, seconds)), 70, 100), n_samples=4)
+    return write_edf(tmp_path / "full-range.edf", [other, spo2], record_duration=4)
+
+def night_spo2(seconds, frequency=1, seed=0, nan_fraction=0.0):
+    """
+    Raw night-like SpO2 at `frequency` Hz: a slow walk around 95 % with desaturation dips,
+    dropouts to 0, out-of-range spikes and optionally NaN samples
+    """
+    rng = np.random.default_rng(seed)
+    n = seconds * frequency
+    t = np.arange(n) / frequency
+    spo2 = 95 + np.cumsum(rng.normal(0, 0.02, n)).clip(-4, 3)
+    for start in rng.uniform(0, seconds, seconds // 240):
+        spo2 -= rng.uniform(3, 10) * np.exp(-0.5 * ((t - start) / rng.uniform(20, 60)) ** 2)
+    spo2 = np.round(spo2 + rng.normal(0, 0.3, n)).clip(60, 100)
+    for start in rng.integers(0, n, 5):
+        spo2[start:start + 30 * frequency] = 0
+    spo2[rng.integers(0, n, 20)] = 120
+    spo2[rng.random(n) < nan_fraction] = np.nan
+    return spo2
+
+def desaturating_night(seed, seconds, dip_every, nan_gaps=0, interpolated=False):
+    """Cleaned 1 Hz SpO2 with a desaturation of 3-15 % about every `dip_every` seconds"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(seconds)
+    signal = 95 + np.cumsum(rng.normal(0, 0.03, seconds)).clip(-3, 3)
+    for start in np.arange(rng.uniform(0, dip_every), seconds, dip_every) + rng.uniform(-10, 10, int(seconds / dip_every) + 1)[:len(np.arange(rng.uniform(0, dip_every), seconds, dip_every))]:
+        signal -= rng.uniform(3, 15) * np.exp(-0.5 * ((t - start) / rng.uniform(5, 20)) ** 2)
+    signal = np.round(signal + rng.normal(0, 0.3, seconds)).clip(60, 100)
+    if interpolated:
+        # gaps filled by the cleaner's interpolation leave fractional values
+        for start in rng.integers(0, seconds - 40, 20):
+            signal[start:start + 30] = np.linspace(signal[start], signal[start + 30], 31)[:30]
+    for start in rng.integers(0, seconds - 30, nan_gaps):
+        signal[start:start + rng.integers(1, 30)] = np.nan
+    return signal
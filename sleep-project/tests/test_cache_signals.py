@@ -0,0 +1,82 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from sleepdataspo2.cache_signals import MemmapSignalCache
+
+LENGTH = 16
+
+def signal(value):
+    return np.arange(LENGTH, dtype=np.float64) + value
+
+def test_write_read_round_trip(tmp_path):
+    cache = MemmapSignalCache(length=LENGTH)
+    cache.write(str(tmp_path), "rec-1", signal(0))
+    cache.write(str(tmp_path), "rec-2", signal(100))
+
+    assert cache.contains(str(tmp_path), "rec-1") and not cache.contains(str(tmp_path), "rec-3")
+    np.testing.assert_array_equal(cache.read(str(tmp_path), "rec-2"), signal(100).astype(np.float32))
+    matrix, names = cache.read_all(str(tmp_path))
+    assert names == ["rec-1", "rec-2"]
+    assert matrix.dtype == np.float32 and matrix.shape == (2, LENGTH)
+    np.testing.assert_array_equal(matrix[0], signal(0))
+
+def test_empty_and_missing(tmp_path):
+    cache = MemmapSignalCache(length=LENGTH)
+    matrix, names = cache.read_all(str(tmp_path))
+    assert matrix.shape == (0, LENGTH) and names == []
+    with pytest.raises(KeyError):
+        cache.read(str(tmp_path), "rec-1")
+    with pytest.raises(ValueError):
+        cache.write(str(tmp_path), "rec-1", np.zeros(LENGTH + 1))
+
+def test_overwriting_an_id_reuses_its_row(tmp_path):
+    cache = MemmapSignalCache(length=LENGTH)
+    cache.write(str(tmp_path), "rec-1", signal(0))
+    cache.write(str(tmp_path), "rec-2", signal(100))
+    cache.write(str(tmp_path), "rec-1", signal(50))
+
+    matrix, names = cache.read_all(str(tmp_path))
+    assert names == ["rec-1", "rec-2"]
+    assert os.path.getsize(tmp_path / "cleaned_signals.f32") == 2 * LENGTH * 4
+    np.testing.assert_array_equal(matrix[0], signal(50))
+    np.testing.assert_array_equal(matrix[1], signal(100))
+
+def test_index_is_replaced_atomically(tmp_path, monkeypatch):
+    cache = MemmapSignalCache(length=LENGTH)
+    cache.write(str(tmp_path), "rec-1", signal(0))
+    with open(tmp_path / "cleaned_signals.json") as f:
+        before = f.read()
+
+    def failing_dump(obj, f):
+        f.write('{"length": ')
+        raise OSError("disk full")
+
+    monkeypatch.setattr(json, "dump", failing_dump)
+    with pytest.raises(OSError):
+        cache.write(str(tmp_path), "rec-2", signal(100))
+    monkeypatch.undo()
+
+    # the half-written index never replaced the published one
+    with open(tmp_path / "cleaned_signals.json") as f:
+        assert f.read() == before
+    assert not cache.contains(str(tmp_path), "rec-2")
+    np.testing.assert_array_equal(cache.read(str(tmp_path), "rec-1"), signal(0))
+
+def test_length_mismatch_is_rejected(tmp_path):
+    MemmapSignalCache(length=LENGTH).write(str(tmp_path), "rec-1", signal(0))
+    with pytest.raises(ValueError):
+        MemmapSignalCache(length=LENGTH * 2).read(str(tmp_path), "rec-1")
+
+def test_import_parquet(tmp_path):
+    for name, value in [("rec-1", 0), ("rec-2", 100)]:
+        pd.DataFrame({"SpO2": signal(value)}).to_parquet(tmp_path / f"{name}_cleaned.parquet")
+    cache = MemmapSignalCache(length=LENGTH)
+
+    imported = cache.import_parquet(str(tmp_path), ["rec-1", "rec-missing", "rec-2"])
+
+    assert imported == ["rec-1", "rec-2"]
+    matrix, names = cache.read_all(str(tmp_path))
+    assert names == ["rec-1", "rec-2"]
+    np.testing.assert_array_equal(matrix[1], signal(100))
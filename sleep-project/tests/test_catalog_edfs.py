@@ -0,0 +1,88 @@
+import os
+import numpy as np
+from sleepdataspo2.catalog_edfs import ParquetEdfCatalog
+from sleepdataspo2.load_data import DataLoader, PandasDataLoader
+from conftest import write_edf, spo2_channel
+
+class CountingLoader(PandasDataLoader):
+    """Records which files had their header read and fails if any sample data is read"""
+    def __init__(self):
+        super().__init__()
+        self.headers = []
+
+    def read_edf_header(self, file_path):
+        self.headers.append(os.path.basename(file_path))
+        return super().read_edf_header(file_path)
+
+    def read_edf(self, file_path):
+        raise AssertionError("the catalog must not read sample data")
+
+    def read_edf_channels(self, file_path, channel_names):
+        raise AssertionError("the catalog must not read sample data")
+
+def pleth(n_records, n_samples=1):
+    return {"label": "Pleth", "physical_min": -1.0, "physical_max": 1.0, "digital_min": -32768,
+            "digital_max": 32767, "n_samples": n_samples, "digital": np.zeros(n_records * n_samples, dtype=np.int16)}
+
+def catalog_with(tmp_path):
+    loader = CountingLoader()
+    return ParquetEdfCatalog(reader=DataLoader(loader)), loader
+
+def test_build_writes_one_header_row_per_channel(tmp_path):
+    write_edf(tmp_path / "rec-1.edf", [pleth(10, n_samples=16), spo2_channel(np.full(10, 95.0))], record_duration=4)
+    (tmp_path / "notes.txt").write_text("not an edf")
+    catalog, loader = catalog_with(tmp_path)
+
+    rows = catalog.build(str(tmp_path))
+
+    assert loader.headers == ["rec-1.edf"]
+    assert list(rows.columns) == ParquetEdfCatalog.columns
+    assert list(rows["channel"]) == ["Pleth", "SaO2"]
+    assert list(rows["sampling_frequency"]) == [4.0, 0.25]
+    assert set(rows["n_records"]) == {10} and set(rows["record_duration"]) == {4.0} and set(rows["duration"]) == {40.0}
+    assert set(rows["size"]) == {os.path.getsize(tmp_path / "rec-1.edf")}
+    # and it is what load() returns afterwards
+    assert catalog.load(str(tmp_path)).equals(rows)
+
+def test_rebuild_only_rereads_changed_files(tmp_path):
+    write_edf(tmp_path / "rec-1.edf", [spo2_channel(np.full(30, 95.0))])
+    write_edf(tmp_path / "rec-2.edf", [spo2_channel(np.full(30, 95.0))])
+    write_edf(tmp_path / "rec-3.edf", [spo2_channel(np.full(30, 95.0))])
+    catalog, loader = catalog_with(tmp_path)
+    catalog.build(str(tmp_path))
+    assert loader.headers == ["rec-1.edf", "rec-2.edf", "rec-3.edf"]
+
+    loader.headers.clear()
+    assert len(catalog.build(str(tmp_path))) == 3
+    assert loader.headers == []
+
+    # rec-1 grows, rec-2 only has its mtime changed, rec-3 is deleted, rec-4 is new
+    write_edf(tmp_path / "rec-1.edf", [spo2_channel(np.full(60, 95.0))])
+    stat = os.stat(tmp_path / "rec-2.edf")
+    os.utime(tmp_path / "rec-2.edf", (stat.st_atime, stat.st_mtime + 10))
+    os.remove(tmp_path / "rec-3.edf")
+    write_edf(tmp_path / "rec-4.edf", [spo2_channel(np.full(30, 95.0))])
+    rows = catalog.build(str(tmp_path))
+
+    assert loader.headers == ["rec-1.edf", "rec-2.edf", "rec-4.edf"]
+    assert list(rows["name"]) == ["rec-1", "rec-2", "rec-4"]
+    assert list(rows["duration"]) == [60.0, 30.0, 30.0]
+
+def test_select_drops_short_recordings_and_recordings_without_spo2(tmp_path):
+    write_edf(tmp_path / "good.edf", [pleth(100), spo2_channel(np.full(100, 95.0))])
+    write_edf(tmp_path / "short.edf", [spo2_channel(np.full(99, 95.0))])
+    write_edf(tmp_path / "no-spo2.edf", [pleth(100)])
+    other = spo2_channel(np.full(100, 95.0))
+    other["label"] = "SpO2"
+    write_edf(tmp_path / "other-name.edf", [other])
+    catalog, _ = catalog_with(tmp_path)
+    catalog.build(str(tmp_path))
+
+    selected = catalog.select(str(tmp_path), ["good", "short", "no-spo2", "other-name", "not-catalogued"], min_duration=100)
+
+    # recordings the catalog has not seen are left for the cleaner to judge
+    assert selected == ["good", "other-name", "not-catalogued"]
+
+def test_select_without_a_catalog_keeps_everything(tmp_path):
+    catalog, _ = catalog_with(tmp_path)
+    assert catalog.select(str(tmp_path), ["rec-1", "rec-2"]) == ["rec-1", "rec-2"]
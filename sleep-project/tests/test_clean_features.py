@@ -0,0 +1,234 @@
+import tracemalloc
+import numpy as np
+import pandas as pd
+import pytest
+from hypothesis import given, settings, strategies as st
+from hypothesis.extra.numpy import arrays
+from sleepdataspo2 import CLEANED_SIGNAL_LENGTH
+from sleepdataspo2.clean_features import CleanSpO2, SkippedSignal
+from conftest import night_spo2
+
+# near-zero reference values overflow the percentage drop in both versions
+pytestmark = pytest.mark.filterwarnings("ignore:overflow encountered:RuntimeWarning")
+
+def dfilter_loop(signal, Diff=4):
+    """The delta filter as the original per-sample loop"""
+    signal_filtered = []
+    for i, data in enumerate(signal):
+        if i == 0:
+            signal_filtered.append(data)
+        else:
+            if (((signal_filtered[-1] - data) / signal_filtered[-1]) * 100) < Diff:
+                signal_filtered.append(data)
+    return np.array(signal_filtered)
+
+def assert_same_as_loop(signal, Diff):
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        expected = dfilter_loop(signal, Diff)
+    result = CleanSpO2().dfilter(signal, Diff)
+    if signal.shape[0] > 0:
+        assert result.dtype == expected.dtype
+    np.testing.assert_array_equal(result, expected)
+
+spo2_values = st.one_of(
+    st.floats(min_value=0, max_value=120, width=64),
+    st.sampled_from([0.0, 50.0, 95.0, 100.0, np.nan, np.inf, -np.inf]),
+)
+
+@settings(max_examples=500, deadline=None)
+@given(signal=arrays(np.float64, st.integers(0, 300), elements=spo2_values), Diff=st.sampled_from([0.5, 2, 4, 10, 50]))
+def test_dfilter_matches_loop_on_floats_with_nan_and_inf(signal, Diff):
+    assert_same_as_loop(signal, Diff)
+
+@settings(max_examples=300, deadline=None)
+@given(signal=arrays(st.sampled_from([np.int16, np.int32, np.int64]), st.integers(0, 300), elements=st.integers(0, 120)),
+       Diff=st.sampled_from([1, 4, 10]))
+def test_dfilter_matches_loop_on_integers(signal, Diff):
+    assert_same_as_loop(signal, Diff)
+
+@settings(max_examples=200, deadline=None)
+@given(signal=arrays(np.float32, st.integers(0, 300), elements=st.floats(0, 120, width=32)), Diff=st.sampled_from([2, 4]))
+def test_dfilter_matches_loop_on_float32(signal, Diff):
+    assert_same_as_loop(signal, Diff)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_dfilter_matches_loop_on_artifact_heavy_signals(seed):
+    # long runs below the last kept value exercise the forward search past its first blocks
+    rng = np.random.default_rng(seed)
+    n = 5000
+    signal = np.round(95 + np.cumsum(rng.normal(0, 0.5, n))).clip(60, 100)
+    for start in rng.integers(0, n, 15):
+        signal[start:start + rng.integers(1, 700)] = rng.choice([0, 40, np.nan])
+    signal[rng.integers(0, n, 50)] = rng.choice([np.inf, 120, 0], 50)
+    assert_same_as_loop(signal, 4)
+
+# clean_array filters in float32 and writes float32, so it matches clean_single to float32 precision
+RTOL = 1e-5
+
+HOURS = 60 * 60
+
+@pytest.mark.parametrize("hours, frequency, nan_fraction", [
+    (5, 1, 0.0),    # padded to 7 hours
+    (8, 1, 0.0),    # truncated to 7 hours
+    (6, 4, 0.0),
+    (7.5, 2, 0.01),
+    (4.5, 1, 0.05),
+])
+def test_matches_clean_single(hours, frequency, nan_fraction):
+    raw = night_spo2(int(hours * HOURS), frequency, seed=int(hours * 10) + frequency, nan_fraction=nan_fraction)
+    cleaner = CleanSpO2()
+
+    expected = np.asarray(cleaner.clean_single(pd.Series(raw), frequency))
+    result = cleaner.clean_array(raw, frequency)
+
+    assert result.dtype == np.float32 and result.shape == (CLEANED_SIGNAL_LENGTH,)
+    np.testing.assert_allclose(result, expected, rtol=RTOL)
+
+def test_out_with_wrong_shape_is_rejected():
+    raw = night_spo2(5 * HOURS)
+    with pytest.raises(ValueError, match="out should have shape"):
+        CleanSpO2().clean_array(raw, 1, out=np.empty(CLEANED_SIGNAL_LENGTH - 1, dtype=np.float32))
+
+def test_out_is_filled_and_reused_across_calls():
+    cleaner = CleanSpO2()
+    long_night = night_spo2(8 * HOURS, seed=1)
+    short_night = night_spo2(5 * HOURS, seed=2)
+    out = np.full(CLEANED_SIGNAL_LENGTH, -1, dtype=np.float32)
+
+    assert cleaner.clean_array(long_night, 1, out=out) is out
+    np.testing.assert_array_equal(out, cleaner.clean_array(long_night, 1))
+    # the shorter night is padded, so nothing of the previous contents may survive
+    assert cleaner.clean_array(short_night, 1, out=out) is out
+    np.testing.assert_array_equal(out, cleaner.clean_array(short_night, 1))
+
+def test_report_memory(capsys):
+    cleaner = CleanSpO2()
+    raw = night_spo2(8 * HOURS, frequency=4, seed=3)
+
+    cleaner.clean_array(raw, 4, report_memory=True)
+
+    assert "clean_array peak allocation" in capsys.readouterr().out
+    # tracing was started for this call only
+    assert not tracemalloc.is_tracing()
+
+    series = pd.Series(raw)
+    tracemalloc.start()
+    try:
+        cleaner.clean_single(series, 4)
+        single_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    # one float32 working copy plus the masks and the median filter output
+    assert 0 < cleaner.last_peak_bytes < 3 * raw.nbytes
+    assert cleaner.last_peak_bytes < 0.7 * single_peak
+
+def test_report_memory_keeps_existing_tracing():
+    cleaner = CleanSpO2()
+    tracemalloc.start()
+    try:
+        cleaner.clean_array(night_spo2(5 * HOURS), 1, report_memory=True)
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+# 5 minutes are trimmed at both ends
+TRIM = 2 * 5 * 60
+
+@pytest.mark.parametrize("frequency", [1, 4])
+def test_too_short(frequency):
+    cleaner = CleanSpO2()
+    enough = np.full((4 * HOURS + TRIM) * frequency, 95.0)
+    enough[::7] = 96
+
+    assert cleaner.precheck(enough, frequency) is None
+    skipped = cleaner.precheck(enough[:-2 * frequency], frequency)
+    assert isinstance(skipped, SkippedSignal) and skipped.reason == "too_short"
+
+def test_no_signal():
+    raw = night_spo2(6 * HOURS, seed=1)
+    # more than 2 of the 6 hours outside 50-100 %
+    raw[HOURS:3 * HOURS + 60] = 0
+    raw[4 * HOURS:4 * HOURS + 60] = np.nan
+
+    assert CleanSpO2().precheck(raw, 1).reason == "no_signal"
+
+def test_flat():
+    raw = np.full(6 * HOURS, 97.0)
+    # out-of-range samples do not count as variation
+    raw[::100] = 0
+
+    assert CleanSpO2().precheck(raw, 1).reason == "flat"
+
+def test_usable_night_passes():
+    assert CleanSpO2().precheck(night_spo2(6 * HOURS, frequency=2, seed=2), 2) is None
+
+@pytest.mark.parametrize("raw", [
+    np.full(4 * HOURS, 95.0),
+    np.concatenate([np.full(2 * HOURS, 95.0), np.zeros(3 * HOURS)]),
+    np.full(6 * HOURS, 97.0),
+], ids=["too_short", "no_signal", "flat"])
+def test_clean_single_and_clean_array_skip_alike(raw):
+    cleaner = CleanSpO2()
+    out = np.full(7 * HOURS, -1, dtype=np.float32)
+
+    single = cleaner.clean_single(pd.Series(raw), 1)
+    array = cleaner.clean_array(raw, 1, out=out)
+
+    assert isinstance(single, SkippedSignal) and isinstance(array, SkippedSignal)
+    assert (array.reason, array.detail) == (single.reason, single.detail)
+    assert (out == -1).all()
+
+def test_clean_array_skips_when_too_little_survives_the_delta_filter():
+    # passes the precheck, but every other sample is a drop the delta filter rejects
+    raw = np.full(6 * HOURS, 95.0)
+    raw[1::2] = 80
+    cleaner = CleanSpO2()
+    assert cleaner.precheck(raw, 1) is None
+
+    single = cleaner.clean_single(pd.Series(raw), 1)
+    array = cleaner.clean_array(raw, 1)
+
+    assert isinstance(single, SkippedSignal) and isinstance(array, SkippedSignal)
+    assert single.reason == array.reason == "too_short"
+
+def mixed_nights():
+    frequencies = [1, 4, 1, 2, 4, 1, 2, 1, 2]
+    signals = [night_spo2(int(hours * HOURS), frequency, seed=seed)
+               for seed, (hours, frequency) in enumerate(zip([8, 6, 4.5, 7, 5, 6, 7.5, 5, 6], frequencies))]
+    signals[2] = np.full(4 * HOURS, 95.0)                    # too short before cleaning
+    signals[5][HOURS:4 * HOURS] = 0                          # no signal
+    signals[6] = np.full(6 * HOURS * 2, 95.0)
+    signals[6][1::2] = 80                                    # too short after the delta filter
+    return signals, frequencies
+
+@pytest.mark.parametrize("batch_samples", [1 << 22, 30_000, 1])
+def test_clean_many_matches_clean_array(batch_samples):
+    cleaner = CleanSpO2()
+    signals, frequencies = mixed_nights()
+
+    out, skipped = cleaner.clean_many(signals, frequencies, batch_samples=batch_samples)
+
+    assert out.shape == (len(signals), CLEANED_SIGNAL_LENGTH) and out.dtype == np.float32
+    for i, (signal, frequency) in enumerate(zip(signals, frequencies)):
+        expected = cleaner.clean_array(signal, frequency)
+        if isinstance(expected, SkippedSignal):
+            assert isinstance(skipped[i], SkippedSignal) and skipped[i].reason == expected.reason
+            assert np.isnan(out[i]).all()
+        else:
+            assert skipped[i] is None
+            # the zero gaps between recordings reproduce each one's own median filter padding exactly
+            np.testing.assert_array_equal(out[i], expected)
+    # the last night starts on a dropout, and nothing after an out-of-range first sample passes the delta filter
+    assert [s.reason if s else None for s in skipped] == [None, None, "too_short", None, None, "no_signal", "too_short", "too_short", None]
+
+def test_clean_many_fills_out_and_checks_arguments():
+    cleaner = CleanSpO2()
+    signals, frequencies = mixed_nights()
+    out = np.zeros((len(signals), CLEANED_SIGNAL_LENGTH), dtype=np.float32)
+
+    assert cleaner.clean_many(signals, frequencies, out=out)[0] is out
+    with pytest.raises(ValueError, match="out should have shape"):
+        cleaner.clean_many(signals, frequencies, out=out[1:])
+    with pytest.raises(ValueError, match="frequencies"):
+        cleaner.clean_many(signals, frequencies[1:])
+    with pytest.raises(ValueError, match="should be an integer"):
+        cleaner.clean_many(signals[:1], [2.5])
@@ -0,0 +1,34 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sleepdataspo2.cleaned_cache import DiskCleanedCache
+
+def lookup_in_worker(root, key):
+    return DiskCleanedCache(root).get(key) is not None
+
+def test_lookups_do_not_write_stats_until_stats_is_called(tmp_path):
+    cache = DiskCleanedCache(str(tmp_path))
+    key = cache.key(np.arange(10.0), 1, {})
+    cache.put(key, np.ones(3))
+
+    assert cache.get(key) is not None
+    assert cache.get("0" * 40) is None
+    assert not os.path.exists(tmp_path / "stats.json")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    # merged once: a second call does not count them again
+    assert cache.stats()["hits"] == 1
+
+def test_counts_of_worker_processes_are_merged_when_they_exit(tmp_path):
+    cache = DiskCleanedCache(str(tmp_path))
+    key = cache.key(np.arange(10.0), 1, {})
+    cache.put(key, np.ones(3))
+    cache.get(key)
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        hits = list(executor.map(lookup_in_worker, [str(tmp_path)] * 6, [key] * 4 + ["0" * 40] * 2))
+
+    assert hits == [True] * 4 + [False] * 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (5, 2)
@@ -0,0 +1,157 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import re
+import threading
+import pytest
+import sleepdataspo2.download_data as download_data
+from sleepdataspo2.download_data import DownloaderNSRR, AsyncDownloaderNSRR
+from sleepdataspo2.run_pipeline_modified import Run
+
+PAYLOAD = os.urandom(300_000)
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """
+    Serves PAYLOAD for every path, honours "Range: bytes=N-" unless `ignore_range`,
+    and drops the connection after `truncate_after` body bytes of each response.
+    """
+    def do_GET(self):
+        server = self.server
+        server.ranges.append(self.headers.get("Range"))
+        start = 0
+        match = re.match(r"bytes=(\d+)-$", self.headers.get("Range") or "")
+        if match and not server.ignore_range:
+            start = int(match.group(1))
+            if start >= len(server.payload):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(server.payload)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(server.payload) - 1}/{len(server.payload)}")
+        else:
+            self.send_response(200)
+        body = server.payload[start:]
+        # the advertised length is the full remainder, so a truncated body is a broken transfer
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if server.truncate_after is not None:
+            body = body[:server.truncate_after]
+        self.wfile.write(body)
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    server.daemon_threads = True
+    server.payload = PAYLOAD
+    server.truncate_after = None
+    server.ignore_range = False
+    server.ranges = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(download_data, "_backoff", lambda attempt: 0)
+
+def url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+DOWNLOADERS = {
+    "threads": lambda base_url: DownloaderNSRR(base_url=base_url),
+    "pooled": lambda base_url: DownloaderNSRR(pool_size=2, base_url=base_url),
+    "async": lambda base_url: AsyncDownloaderNSRR(max_concurrency=2, base_url=base_url),
+}
+
+@pytest.fixture(params=list(DOWNLOADERS))
+def kind(request):
+    return request.param
+
+def download(server, tmp_path, kind):
+    os.makedirs(tmp_path / "shhs" / "edfs", exist_ok=True)
+    downloader = DOWNLOADERS[kind](url(server))
+    result = downloader.download(dataset="shhs", file_name="shhs1-200001", token="token", download_from="edfs", download_to=str(tmp_path))
+    return result, tmp_path / "shhs" / "edfs" / "shhs1-200001.edf"
+
+def test_resumes_after_dropped_connections(server, tmp_path, kind):
+    server.truncate_after = 80_000
+
+    result, edf = download(server, tmp_path, kind)
+
+    assert result == len(PAYLOAD)
+    assert edf.read_bytes() == PAYLOAD
+    assert not os.path.exists(f"{edf}.part")
+    # every retry asks for the bytes after what is already on disk (the chunk in flight when
+    # the connection drops is lost, so offsets fall on chunk boundaries)
+    assert server.ranges[0] is None and len(server.ranges) > 1
+    offsets = [int(re.match(r"bytes=(\d+)-$", r).group(1)) for r in server.ranges[1:]]
+    assert all(0 < a < b for a, b in zip(offsets, offsets[1:])) and offsets[0] > 0
+
+def test_gives_up_and_keeps_the_part_file(server, tmp_path, kind):
+    server.truncate_after = 10_000
+
+    result, edf = download(server, tmp_path, kind)
+
+    assert result == "fail"
+    assert not edf.exists()
+    part = f"{edf}.part"
+    kept = os.path.getsize(part)
+    assert kept > 0 and open(part, "rb").read() == PAYLOAD[:kept]
+
+    # the next run resumes from the kept part file
+    server.truncate_after = None
+    server.ranges = []
+    result, edf = download(server, tmp_path, kind)
+    assert result == len(PAYLOAD) and edf.read_bytes() == PAYLOAD
+    assert server.ranges == [f"bytes={kept}-"]
+
+def test_complete_part_file_is_renamed_on_416(server, tmp_path, kind):
+    os.makedirs(tmp_path / "shhs" / "edfs")
+    with open(tmp_path / "shhs" / "edfs" / "shhs1-200001.edf.part", "wb") as f:
+        f.write(PAYLOAD)
+
+    result, edf = download(server, tmp_path, kind)
+
+    assert result == len(PAYLOAD) and edf.read_bytes() == PAYLOAD
+    assert server.ranges == [f"bytes={len(PAYLOAD)}-"]
+
+def test_stale_part_file_is_restarted_on_416(server, tmp_path, kind):
+    os.makedirs(tmp_path / "shhs" / "edfs")
+    with open(tmp_path / "shhs" / "edfs" / "shhs1-200001.edf.part", "wb") as f:
+        f.write(PAYLOAD + b"stale")
+
+    result, edf = download(server, tmp_path, kind)
+
+    assert result == len(PAYLOAD) and edf.read_bytes() == PAYLOAD
+    assert server.ranges == [f"bytes={len(PAYLOAD) + 5}-", None]
+
+def test_server_ignoring_range_restarts_from_zero(server, tmp_path, kind):
+    os.makedirs(tmp_path / "shhs" / "edfs")
+    with open(tmp_path / "shhs" / "edfs" / "shhs1-200001.edf.part", "wb") as f:
+        f.write(PAYLOAD[:1000])
+    server.ignore_range = True
+
+    result, edf = download(server, tmp_path, kind)
+
+    assert result == len(PAYLOAD) and edf.read_bytes() == PAYLOAD
+    assert server.ranges == ["bytes=1000-"]
+
+def test_async_run_with_the_threaded_downloader(server, tmp_path):
+    server.truncate_after = 80_000
+    os.makedirs(tmp_path / "shhs" / "edfs")
+    with open(tmp_path / "shhs" / "edfs" / "shhs1-200002.edf", "wb") as f:
+        f.write(b"already here")
+    runner = Run(downloader=DownloaderNSRR(base_url=url(server)))
+
+    runner.run_downloader_async(dataset="shhs", file_names=["shhs1-200001", "shhs1-200002"], token="token",
+                                download_from="edfs", download_to=str(tmp_path))
+
+    assert (tmp_path / "shhs" / "edfs" / "shhs1-200001.edf").read_bytes() == PAYLOAD
+    assert (tmp_path / "shhs" / "edfs" / "shhs1-200002.edf").read_bytes() == b"already here"
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import desaturating_night
+from sleepdataspo2.engineer_features import EngineerOdi, DEFAULT_FEATURES, DEFAULT_COMPLEX_FEATURES, DEFAULT_PRSA_WINDOWS, ODI_FEATURES
+
+# the batch statistics, PRSA and PSD features are matrix reductions, which may sum in another order
+# than the per-recording pobm calls; everything else is computed by the same code
+RTOL, ATOL = 1e-9, 1e-9
+
+def recordings():
+    """
+    Equal-length cleaned recordings: plain nights, one with NaN gaps, one with NaN over whole DI
+    windows (a NaN row for the PSD fallback) and a flat one without PRSA anchors
+    """
+    length = 2 * 3600 + 5
+    rows = [desaturating_night(20, length, 240), desaturating_night(21, length, 120),
+            desaturating_night(22, length, 200, nan_gaps=10)]
+    gap = desaturating_night(23, length, 300)
+    gap[1200:1300] = np.nan
+    rows.append(gap)
+    rows.append(np.full(length, 92.0))
+    return np.stack(rows), ["a", "b", "c", "d", "e"]
+
+def assert_rows_match_compute_single(engineer, signals, nsrr_ids, complex_features):
+    table = engineer.compute_batch(signals, nsrr_ids, complex_features=complex_features)
+
+    assert table.index.tolist() == nsrr_ids
+    assert table.index.name == "nsrrid"
+    for row, nsrr_id in enumerate(nsrr_ids):
+        expected = engineer.compute_single(pd.Series(signals[row]), complex_features=complex_features)
+        assert table.columns.tolist() == list(expected)
+        for name, value in expected.items():
+            assert table.loc[nsrr_id, name] == pytest.approx(value, rel=RTOL, abs=ATOL, nan_ok=True), (nsrr_id, name)
+    return table
+
+def test_compute_batch_matches_compute_single_row_by_row():
+    signals, nsrr_ids = recordings()
+    assert np.isnan(signals).any(axis=1).tolist() == [False, False, True, True, False]
+
+    table = assert_rows_match_compute_single(EngineerOdi(), signals, nsrr_ids, complex_features=False)
+
+    assert table.columns.tolist() == DEFAULT_FEATURES
+
+def test_compute_batch_matches_compute_single_with_complex_features():
+    signals, nsrr_ids = recordings()
+    signals, nsrr_ids = signals[[0, 2]], ["a", "c"]
+
+    table = assert_rows_match_compute_single(EngineerOdi(), signals, nsrr_ids, complex_features=True)
+
+    assert table.columns.tolist() == DEFAULT_COMPLEX_FEATURES
+
+def test_compute_batch_matches_compute_single_for_every_prsa_window_and_statistic():
+    signals, nsrr_ids = recordings()
+    names = ODI_FEATURES.names(["statistics", "psd"] + [f"prsa_{window}" for window in (5, 10, 20, 40, 60)])
+
+    table = assert_rows_match_compute_single(EngineerOdi(feature_names=names), signals, nsrr_ids, complex_features=False)
+
+    assert table.columns.tolist() == names
+    assert {"DI", "PRSAc_win5", "PRSAc_win60", "PSD_total"} <= set(names)
+
+def test_compute_batch_rejects_a_matrix_that_does_not_match_the_ids():
+    signals, nsrr_ids = recordings()
+    with pytest.raises(ValueError):
+        EngineerOdi().compute_batch(signals, nsrr_ids[:-1])
+    with pytest.raises(ValueError):
+        EngineerOdi().compute_batch(signals[0], nsrr_ids[:1])
+
+@pytest.mark.parametrize("windows", [(5,), (10, 20), (5, 40), (20, 60)])
+def test_anchor_points_are_gathered_for_the_largest_selected_prsa_window(windows):
+    signals, _ = recordings()
+    names = ODI_FEATURES.names([f"prsa_{window}" for window in windows]) + ["AV"]
+    engineer = EngineerOdi(feature_names=names)
+
+    anchors = engineer._registry(names)._producers["prsa_anchors"][1]
+    assert anchors.keywords == {"largest_window": max(windows)}
+    assert anchors(signals[0]).prefix.shape[0] == 2 * max(windows)
+    # same values as with the anchors gathered for every computable window
+    features = engineer.compute_single(pd.Series(signals[0]))
+    assert features == pytest.approx(ODI_FEATURES.compute(signals[0], names), rel=RTOL, abs=ATOL)
+
+def test_default_features_gather_anchor_points_for_the_default_prsa_windows():
+    anchors = EngineerOdi._registry(DEFAULT_FEATURES)._producers["prsa_anchors"][1]
+    assert anchors.keywords == {"largest_window": max(DEFAULT_PRSA_WINDOWS)}
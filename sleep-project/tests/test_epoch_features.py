@@ -0,0 +1,89 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+from pobm.obm.burden import HypoxicBurdenMeasures
+from pobm.obm.desat import DesaturationsMeasures
+from pobm.obm.general import OverallGeneralMeasures
+from pobm._ResultsClasses import DesatMethodEnum
+from conftest import desaturating_night
+from sleepdataspo2.epoch_features import SlidingEpochFeatures
+
+# the running statistics are computed in float64 and returned as float32
+RTOL = 1e-6
+
+def nights():
+    plain = desaturating_night(30, 3 * 3600, 240)
+    gaps = desaturating_night(31, 3 * 3600, 200, nan_gaps=15)
+    # longer than the largest window, so some epochs are all NaN
+    gaps[5000:5400] = np.nan
+    return {"plain": plain, "nan_gaps": gaps}
+
+def night_grid_di(block_means, start, end, di_window):
+    # mean absolute change between neighbouring blocks of the night's DI_Window grid that lie inside the epoch
+    inside = block_means[-(-start // di_window):end // di_window]
+    changes = [abs(b - a) for a, b in zip(inside, inside[1:]) if not (np.isnan(a) or np.isnan(b))]
+    return np.mean(changes) if changes else np.nan
+
+def per_window(signal, window, hop):
+    """Every epoch recomputed on its own: pobm's statistics and CT of the epoch, whole-night pobm desaturations counted by start"""
+    begins = np.asarray(DesaturationsMeasures(ODI_Threshold=3, threshold_method=DesatMethodEnum.Relative).compute(signal).begin)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        block_means = [np.nanmean(signal[block:block + 12]) for block in range(0, signal.shape[0] - 11, 12)]
+    rows = []
+    for start in range(0, signal.shape[0] - window + 1, hop):
+        epoch = signal[start:start + window]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            general = OverallGeneralMeasures(ZC_Baseline=90, DI_Window=12).compute(epoch) if window > 12 else None
+            av, minimum = np.nanmean(epoch), np.nanmin(epoch)
+        if general is not None and not np.isnan(epoch).all():
+            assert (general.AV, general.Min) == (av, minimum)
+        # pobm's delta index splits the epoch itself into DI_Window blocks, the night grid when epochs start on it
+        di = general.DI if general is not None and start % 12 == 0 else night_grid_di(block_means, start, start + window, 12)
+        rows.append({
+            "start": start,
+            "ODI": ((start <= begins) & (begins < start + window)).sum() * 3600 / window,
+            "CT90": HypoxicBurdenMeasures(np.array([], dtype=int), np.array([], dtype=int), CT_Threshold=90, CA_Baseline=90).compute(epoch).CT,
+            "AV": av,
+            "Min": minimum,
+            "DI": di,
+        })
+    return pd.DataFrame(rows), begins
+
+@pytest.mark.parametrize("name", ["plain", "nan_gaps"])
+@pytest.mark.parametrize("window, hop", [(30, None), (30, 30), (60, 60), (120, 36), (300, 17), (45, 45), (31, 19),
+                                         # hop > window: samples between epochs belong to none
+                                         (24, 48), (10, 25), (60, 301)])
+def test_compute_epochs_matches_per_window_recomputation(name, window, hop):
+    signal = nights()[name]
+
+    epochs = SlidingEpochFeatures(relative_threshold=3, CT_Threshold=90, DI_Window=12).compute_epochs(pd.Series(signal), window=window, hop=hop)
+    expected, begins = per_window(signal, window, window if hop is None else hop)
+
+    assert len(begins) < 128
+    assert epochs.index.tolist() == list(range(len(expected)))
+    assert epochs["start"].dtype == np.int32
+    np.testing.assert_array_equal(epochs["start"], expected["start"])
+    assert epochs["start"].iloc[-1] + window <= signal.shape[0]
+    for column in ("ODI", "CT90", "AV", "Min", "DI"):
+        assert epochs[column].dtype == np.float32, column
+        np.testing.assert_allclose(epochs[column], expected[column], rtol=RTOL, atol=0, equal_nan=True, err_msg=column)
+
+def test_nan_gaps_leave_all_nan_epochs():
+    epochs = SlidingEpochFeatures().compute_epochs(pd.Series(nights()["nan_gaps"]), window=300, hop=300)
+    gap = epochs[(epochs["start"] >= 5000) & (epochs["start"] + 300 <= 5400)]
+    assert len(gap) == 1
+    assert gap[["AV", "Min", "DI"]].isna().all().all()
+    assert (gap[["ODI", "CT90"]] == 0).all().all()
+
+def test_a_signal_shorter_than_the_window_has_no_epochs():
+    epochs = SlidingEpochFeatures().compute_epochs(pd.Series(nights()["plain"][:100]), window=300)
+    assert epochs.empty
+    assert epochs.columns.tolist() == ["start", "ODI", "CT90", "AV", "Min", "DI"]
+
+@pytest.mark.parametrize("window, hop", [(0, 30), (30, 0), (-30, None)])
+def test_compute_epochs_rejects_non_positive_window_or_hop(window, hop):
+    with pytest.raises(ValueError):
+        SlidingEpochFeatures().compute_epochs(pd.Series(nights()["plain"]), window=window, hop=hop)
@@ -0,0 +1,215 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import pobm.obm.desat
+import sleepdataspo2.feature_kernels as feature_kernels
+from pobm.obm.complex import ComplexityMeasures
+from pobm.obm.desat import DesaturationsMeasures
+from pobm.obm.burden import HypoxicBurdenMeasures
+from pobm.obm.general import OverallGeneralMeasures
+from pobm.obm.periodicity import PRSAMeasures, PSDMeasures
+from pobm._ResultsClasses import DesatMethodEnum
+from conftest import desaturating_night
+from sleepdataspo2.feature_kernels import (complexity_measures, desaturations_multi, general_measures_batch,
+                                           psd_measures_batch, prsa_measures_batch, prsa_anchors, prsa_window,
+                                           prsa_multi, prsa_anchors_batch, prsa_window_batch)
+
+PARAMETERS = dict(CTM_Threshold=0.25, DFA_Window=20, M_Sampen=3, R_Sampen=0.2, M_ApEn=2, R_ApEn=0.25)
+
+def cleaned_spo2(seed, n, nan_gap=False):
+    rng = np.random.default_rng(seed)
+    signal = np.round(95 + np.cumsum(rng.normal(0, 0.4, n))).clip(70, 100)
+    if nan_gap:
+        signal[n // 3:n // 3 + 25] = np.nan
+    return signal
+
+@pytest.mark.parametrize("seed, n, nan_gap", [(0, 400, False), (1, 617, False), (2, 500, True), (3, 800, True)])
+def test_complexity_measures_match_pobm(seed, n, nan_gap):
+    signal = cleaned_spo2(seed, n, nan_gap)
+
+    expected = ComplexityMeasures(**PARAMETERS).compute(signal)
+    result = complexity_measures(signal, **PARAMETERS)
+
+    # template counts are exact; DFA differs from linregress fits by rounding only
+    for field in ("ApEn", "LZ", "CTM", "SampEn"):
+        assert getattr(result, field) == pytest.approx(getattr(expected, field), rel=0, abs=0, nan_ok=True), field
+    assert result.DFA == pytest.approx(expected.DFA, rel=1e-12)
+
+DESAT_SIGNALS = {
+    "night": dict(seed=0, seconds=3 * 3600, dip_every=240),
+    "interpolated": dict(seed=1, seconds=3 * 3600, dip_every=180, interpolated=True),
+    "nan_gaps": dict(seed=2, seconds=3 * 3600, dip_every=200, nan_gaps=12),
+    # more than 127 events: pobm numbers meta events in an int8 array, which wraps around
+    "many_events": dict(seed=3, seconds=4 * 3600, dip_every=60),
+    "many_events_nan_gaps": dict(seed=4, seconds=4 * 3600, dip_every=50, nan_gaps=30),
+}
+
+def assert_same_results(result, expected):
+    for field, value in vars(expected).items():
+        if field in ("begin", "end"):
+            np.testing.assert_array_equal(np.asarray(getattr(result, field)), np.asarray(value), err_msg=field)
+        else:
+            # slopes are fitted in closed form and means are summed in another order
+            assert getattr(result, field) == pytest.approx(value, rel=1e-9, abs=1e-12, nan_ok=True), field
+
+class _WrappingInt8(np.ndarray):
+    # numpy 1.21 (the pinned version) stores 128 in an int8 array as -128; numpy 2 raises instead
+    def __setitem__(self, key, value):
+        super().__setitem__(key, (int(value) + 128) % 256 - 128)
+
+class _Numpy121:
+    def __getattr__(self, name):
+        return getattr(np, name)
+
+    def zeros(self, shape, dtype=float):
+        if dtype is np.int8:
+            return np.zeros(shape, dtype=dtype).view(_WrappingInt8)
+        return np.zeros(shape, dtype=dtype)
+
+@pytest.fixture
+def pobm_int8_wraps(monkeypatch):
+    monkeypatch.setattr(pobm.obm.desat, "np", _Numpy121())
+
+@pytest.mark.parametrize("name", list(DESAT_SIGNALS))
+def test_desaturations_multi_matches_pobm(name, pobm_int8_wraps):
+    signal = desaturating_night(**DESAT_SIGNALS[name])
+
+    results = desaturations_multi(signal, relative_thresholds=(3, 5), hard_thresholds=(83, 85, 90), CT_Threshold=90, CA_Baseline=90)
+
+    assert list(results) == [("relative", 3), ("relative", 5), ("hard", 83), ("hard", 85), ("hard", 90)]
+    for (method, threshold), (desat, burden) in results.items():
+        if method == "relative":
+            expected_desat = DesaturationsMeasures(ODI_Threshold=threshold, threshold_method=DesatMethodEnum.Relative).compute(signal)
+        else:
+            expected_desat = DesaturationsMeasures(hard_threshold=threshold, threshold_method=DesatMethodEnum.Hard).compute(signal)
+        expected_burden = HypoxicBurdenMeasures(expected_desat.begin, expected_desat.end, CT_Threshold=90, CA_Baseline=90).compute(signal)
+        assert_same_results(desat, expected_desat)
+        assert_same_results(burden, expected_burden)
+
+def test_many_events_signals_pass_the_int8_meta_event_limit():
+    for name in ("many_events", "many_events_nan_gaps"):
+        signal = desaturating_night(**DESAT_SIGNALS[name])
+        results = desaturations_multi(signal)
+        assert results[("relative", 3)][0].ODI * signal.shape[0] / 3600 > 127, name
+
+# 2 h rows, not a multiple of the DI window
+BATCH_LENGTH = 7205
+
+def batch_signals():
+    """
+    Equal-length cleaned recordings for the batch kernels: plain nights, rows with NaN gaps (one
+    covering whole DI windows), a flat row at the ZC baseline (no PRSA anchors) and an all-NaN row
+    """
+    rows = [desaturating_night(seed, BATCH_LENGTH, dip_every) for seed, dip_every in [(10, 240), (11, 120)]]
+    rows.append(desaturating_night(12, BATCH_LENGTH, 200, nan_gaps=10))
+    gap = desaturating_night(13, BATCH_LENGTH, 300)
+    gap[1200:1300] = np.nan
+    rows.append(gap)
+    rows.append(np.full(BATCH_LENGTH, 90.0))
+    rows.append(np.full(BATCH_LENGTH, np.nan))
+    return np.stack(rows)
+
+def test_batch_signals_cover_the_nan_and_flat_cases():
+    signals = batch_signals()
+    assert np.isnan(signals).any(axis=1).tolist() == [False, False, True, True, False, True]
+    assert BATCH_LENGTH % 12 != 0
+
+def test_general_measures_batch_matches_pobm_per_row():
+    signals = batch_signals()
+
+    batch = general_measures_batch(signals, ZC_Baseline=90, percentile=1, M_Threshold=2, DI_Window=12)
+
+    for row, signal in enumerate(signals):
+        expected = OverallGeneralMeasures(ZC_Baseline=90, percentile=1, M_Threshold=2, DI_Window=12).compute(signal)
+        for field in ("AV", "MED", "Min", "SD", "RG", "P", "M", "ZC", "DI"):
+            # nanmean / nanstd along a matrix axis may sum in another order than over one row
+            assert getattr(batch, field)[row] == pytest.approx(getattr(expected, field), rel=1e-12, abs=1e-12, nan_ok=True), (row, field)
+
+@pytest.mark.parametrize("di_window", [12, 7, 1])
+def test_general_measures_batch_delta_index_uses_only_full_windows(di_window):
+    signals = batch_signals()[:4]
+    batch = general_measures_batch(signals, ZC_Baseline=90, DI_Window=di_window)
+    for row, signal in enumerate(signals):
+        expected = OverallGeneralMeasures(ZC_Baseline=90, DI_Window=di_window).compute(signal)
+        assert batch.DI[row] == pytest.approx(expected.DI, rel=1e-12), row
+
+def test_psd_measures_batch_matches_pobm_per_row():
+    # the all-NaN row is left out: pobm's Welch estimate needs samples
+    signals = batch_signals()[:5]
+
+    batch = psd_measures_batch(signals)
+
+    for row, signal in enumerate(signals):
+        expected = PSDMeasures().compute(signal)
+        for field in ("PSD_total", "PSD_band", "PSD_ratio", "PSD_peak"):
+            assert getattr(batch, field)[row] == pytest.approx(getattr(expected, field), rel=1e-9, abs=1e-15, nan_ok=True), (row, field)
+
+def test_psd_measures_batch_estimates_nan_rows_on_their_own():
+    signals = batch_signals()[:4]
+    # rows with NaN fall back to a Welch estimate of their remaining samples, whatever the other rows are
+    alone = psd_measures_batch(signals[2:4])
+    together = psd_measures_batch(signals)
+    for field in ("PSD_total", "PSD_band", "PSD_ratio", "PSD_peak"):
+        np.testing.assert_array_equal(getattr(together, field)[2:4], getattr(alone, field), err_msg=field)
+
+PRSA_WINDOWS = [5, 10, 20, 40, 60]
+PRSA_FIELDS = ("PRSAc", "PRSAad", "PRSAos", "PRSAsb", "PRSAsa", "AC")
+
+def prsa_signals():
+    """batch_signals plus a row whose only anchor points are closer to the ends than any window keeps"""
+    edges = np.full(BATCH_LENGTH, 95.0)
+    edges[1] = edges[-2] = 90.0
+    return np.concatenate([batch_signals(), edges[None, :]])
+
+def assert_same_prsa(result, expected, context):
+    for field in PRSA_FIELDS:
+        # anchor sums are prefix-sum differences or masked matrix sums, slopes closed-form fits
+        assert getattr(result, field) == pytest.approx(getattr(expected, field), rel=1e-9, abs=1e-9, nan_ok=True), (context, field)
+
+def test_prsa_signals_cover_nan_and_no_anchors():
+    signals = prsa_signals()
+    drops = prsa_anchors_batch(signals).drops
+    for window in PRSA_WINDOWS:
+        kept = drops[:, window - 1:BATCH_LENGTH - window].sum(axis=1)
+        assert kept[[4, 5, 6]].tolist() == [0, 0, 0]
+        assert (kept[:4] > 0).all()
+
+@pytest.mark.parametrize("window", PRSA_WINDOWS)
+def test_prsa_measures_batch_matches_pobm_per_row(window):
+    signals = prsa_signals()
+
+    batch = prsa_measures_batch(signals, PRSA_Window=window, K_AC=2)
+    shared = prsa_window_batch(signals, prsa_anchors_batch(signals), PRSA_Window=window, K_AC=2)
+
+    for row, signal in enumerate(signals):
+        expected = PRSAMeasures(PRSA_Window=window, K_AC=2).compute(signal)
+        assert_same_prsa(SimpleNamespace(**{field: getattr(batch, field)[row] for field in PRSA_FIELDS}), expected, row)
+        assert_same_prsa(SimpleNamespace(**{field: getattr(shared, field)[row] for field in PRSA_FIELDS}), expected, row)
+
+@pytest.mark.parametrize("window", PRSA_WINDOWS)
+def test_prsa_window_matches_pobm_for_every_anchor_size(window):
+    for row, signal in enumerate(prsa_signals()):
+        expected = PRSAMeasures(PRSA_Window=window, K_AC=2).compute(signal)
+        for largest_window in [size for size in PRSA_WINDOWS if size >= window]:
+            shared = prsa_anchors(signal, largest_window=largest_window)
+            assert shared.prefix.shape[0] == 2 * largest_window
+            assert_same_prsa(prsa_window(signal, shared, PRSA_Window=window, K_AC=2), expected, (row, largest_window))
+
+def test_prsa_window_refuses_a_window_larger_than_the_anchors_were_gathered_for():
+    signal = prsa_signals()[0]
+    with pytest.raises(ValueError):
+        prsa_window(signal, prsa_anchors(signal, largest_window=20), PRSA_Window=40)
+
+def test_prsa_multi_matches_pobm_and_gathers_for_its_largest_window(monkeypatch):
+    gathered = []
+    def recording_anchors(spo2, largest_window):
+        gathered.append(largest_window)
+        return prsa_anchors(spo2, largest_window)
+    monkeypatch.setattr(feature_kernels, "prsa_anchors", recording_anchors)
+    for row, signal in enumerate(prsa_signals()):
+        for windows in [(10, 20), (5, 40), tuple(PRSA_WINDOWS)]:
+            results = prsa_multi(signal, windows=windows, K_AC=2)
+            assert list(results) == list(windows)
+            for window, result in results.items():
+                assert_same_prsa(result, PRSAMeasures(PRSA_Window=window, K_AC=2).compute(signal), (row, window))
+            assert gathered.pop() == max(windows)
@@ -0,0 +1,122 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import pytest
+from sleepdataspo2.feature_registry import FeatureRegistry
+
+class CountingRegistry:
+    """
+    base -> (mean, spread) -> ratio, plus an independent per-row `peak`; every producer call is recorded
+    """
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+        self.registry = FeatureRegistry()
+        registry = self.registry
+        registry.add_producer("base", self._counted("base", lambda spo2: np.asarray(spo2, dtype=np.float64)),
+                              compute_batch=self._counted("base", lambda signals: signals))
+        registry.add_producer("mean", self._counted("mean", lambda spo2, base: SimpleNamespace(mean=base.mean(), first=base[0])),
+                              depends_on=["base"],
+                              compute_batch=self._counted("mean", lambda signals, base: SimpleNamespace(mean=base.mean(axis=1), first=base[:, 0])))
+        registry.add_producer("spread", self._counted("spread", lambda spo2, base: base.max() - base.min()), depends_on=["base"],
+                              compute_batch=self._counted("spread", lambda signals, base: base.max(axis=1) - base.min(axis=1)))
+        registry.add_producer("ratio", self._counted("ratio", lambda spo2, mean, spread: spread / mean.mean), depends_on=["mean", "spread"],
+                              compute_batch=self._counted("ratio", lambda signals, mean, spread: spread / mean.mean))
+        registry.add_producer("peak", self._counted("peak", lambda spo2: float(np.max(spo2))))
+        registry.add_feature("Mean", "mean", lambda result: result.mean)
+        registry.add_feature("First", "mean", lambda result: result.first)
+        registry.add_feature("Spread", "spread", lambda result: result)
+        registry.add_feature("Ratio", "ratio", lambda result: result)
+        registry.add_feature("Peak", "peak", lambda result: result)
+
+    def _counted(self, name, compute):
+        def counted(*args):
+            with self._lock:
+                self.calls.append(name)
+            return compute(*args)
+        return counted
+
+SIGNAL = np.array([95.0, 93.0, 97.0, 90.0])
+SIGNALS = np.array([[95.0, 93.0, 97.0, 90.0], [98.0, 96.0, 96.0, 97.0], [92.0, 88.0, 94.0, 91.0]])
+EXPECTED = {"Mean": 93.75, "First": 95.0, "Spread": 7.0, "Ratio": 7.0 / 93.75, "Peak": 97.0}
+
+def test_names_in_registration_order_and_by_producer():
+    registry = CountingRegistry().registry
+    assert registry.names() == ["Mean", "First", "Spread", "Ratio", "Peak"]
+    assert registry.names(["spread", "mean"]) == ["Mean", "First", "Spread"]
+    assert registry.names([]) == []
+
+@pytest.mark.parametrize("names, producers", [
+    (["Peak"], ["peak"]),
+    (["First"], ["base", "mean"]),
+    (["Ratio", "Peak"], ["base", "mean", "spread", "ratio", "peak"]),
+    (["Spread", "Ratio"], ["base", "spread", "mean", "ratio"]),
+])
+def test_producers_for_returns_only_the_needed_producers_dependencies_first(names, producers):
+    assert CountingRegistry().registry.producers_for(names) == producers
+
+@pytest.mark.parametrize("threads", [None, 3])
+@pytest.mark.parametrize("names", [["Ratio"], ["Peak", "First"], ["Spread", "Mean", "Ratio", "First", "Peak"]])
+def test_compute_runs_each_needed_producer_once_in_dependency_order(names, threads):
+    counting = CountingRegistry()
+    if threads is None:
+        features = counting.registry.compute(SIGNAL, names)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            features = counting.registry.compute(SIGNAL, names, executor=executor)
+
+    assert list(features) == names
+    assert features == pytest.approx({name: EXPECTED[name] for name in names})
+    needed = counting.registry.producers_for(names)
+    # "base" feeds "mean" and "spread" but runs once
+    assert sorted(counting.calls) == sorted(needed)
+    for producer in counting.calls:
+        for dependency in counting.registry._producers[producer][0]:
+            assert counting.calls.index(dependency) < counting.calls.index(producer)
+
+def test_compute_batch_runs_batch_producers_once_and_the_others_per_row():
+    counting = CountingRegistry()
+    names = ["Ratio", "Peak", "Mean"]
+
+    table = counting.registry.compute_batch(SIGNALS, ["a", "b", "c"], names)
+
+    assert sorted(counting.calls) == sorted(["base", "mean", "spread", "ratio"] + ["peak"] * len(SIGNALS))
+    expected = pd.DataFrame([CountingRegistry().registry.compute(signal, names) for signal in SIGNALS],
+                            index=pd.Index(["a", "b", "c"], name="nsrrid"))
+    pd.testing.assert_frame_equal(table, expected)
+
+def test_unknown_names_raise_key_error():
+    registry = CountingRegistry().registry
+    with pytest.raises(KeyError, match="Missing"):
+        registry.producers_for(["Mean", "Missing"])
+    with pytest.raises(KeyError, match="Missing"):
+        registry.compute(SIGNAL, ["Missing"])
+    with pytest.raises(KeyError, match="Missing"):
+        registry.compute_batch(SIGNALS, ["a", "b", "c"], ["Peak", "Missing"])
+    with pytest.raises(KeyError, match="missing"):
+        registry.add_feature("Other", "missing", lambda result: result)
+    with pytest.raises(KeyError, match="missing"):
+        registry.add_producer("other", lambda spo2, missing: missing, depends_on=["missing"])
+
+def test_batch_and_per_row_producers_cannot_depend_on_each_other():
+    registry = CountingRegistry().registry
+    with pytest.raises(ValueError):
+        registry.add_producer("per_row", lambda spo2, base: base, depends_on=["base"])
+    with pytest.raises(ValueError):
+        registry.add_producer("batch", lambda spo2, peak: peak, depends_on=["peak"], compute_batch=lambda signals, peak: peak)
+
+def test_progress_goes_to_log_only(capsys):
+    registry = CountingRegistry().registry
+    registry.compute(SIGNAL, ["Peak"])
+    registry.compute_batch(SIGNALS, ["a", "b", "c"], ["Mean"])
+    assert capsys.readouterr().out == ""
+
+    messages = []
+    registry.compute(SIGNAL, ["Peak"], log=messages.append)
+    registry.compute_batch(SIGNALS, ["a", "b", "c"], ["Spread"], log=messages.append)
+    assert messages == ["Computing peak features", "Completed computing peak features",
+                        "Computing base features for 3 recordings", "Completed computing base features for 3 recordings",
+                        "Computing spread features for 3 recordings", "Completed computing spread features for 3 recordings"]
+    assert capsys.readouterr().out == ""
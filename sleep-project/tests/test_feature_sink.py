@@ -0,0 +1,131 @@
+import contextlib
+import glob
+import io
+import os
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+from sleepdataspo2.feature_sink import CsvFeatureSink, ShardedFeatureSink
+
+def features(nsrr_ids, seed=0, n_features=5):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(len(nsrr_ids), n_features)) * 10.0 ** rng.integers(-8, 6, size=(len(nsrr_ids), n_features))
+    return pd.DataFrame(values, index=pd.Index([str(i) for i in nsrr_ids], name="nsrrid"), columns=[f"f{i}" for i in range(n_features)])
+
+def quiet(func, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+def test_compact_merges_shards_exactly_and_keeps_latest_row(tmp_path):
+    sink = ShardedFeatureSink()
+    first = features(range(10), seed=0)
+    first.iloc[3, 2] = np.nan
+    second = features([2, 10], seed=1)
+    for i in range(10):
+        quiet(sink.write, str(tmp_path), first.iloc[[i]])
+    quiet(sink.write, str(tmp_path), second)
+
+    assert quiet(sink.compact, str(tmp_path)) == [str(tmp_path / "extracted_5_features.parquet")]
+
+    expected = pd.concat([first.drop(index="2"), second]).sort_index()
+    table = pd.read_parquet(tmp_path / "extracted_5_features.parquet").sort_index()
+    pd.testing.assert_frame_equal(table, expected, check_exact=True)
+    csv = pd.read_csv(tmp_path / "extracted_5_features.csv", index_col="nsrrid", dtype={"nsrrid": str}).sort_index()
+    # to_csv may drop the last digit, as with CsvFeatureSink
+    pd.testing.assert_frame_equal(csv, expected, check_exact=False, rtol=1e-15)
+    assert os.listdir(tmp_path / "feature_shards") == []
+
+def test_compact_starts_from_a_csv_written_by_the_csv_sink(tmp_path):
+    quiet(CsvFeatureSink().write, str(tmp_path), features(range(6), seed=0))
+    sink = ShardedFeatureSink()
+    quiet(sink.write, str(tmp_path), features(range(4, 8), seed=1))
+
+    quiet(sink.compact, str(tmp_path))
+
+    table = pd.read_parquet(tmp_path / "extracted_5_features.parquet")
+    assert sorted(table.index) == [str(i) for i in range(8)]
+    pd.testing.assert_frame_equal(table.loc[["4", "5"]], features(range(4, 8), seed=1).loc[["4", "5"]], check_exact=True)
+
+def test_no_row_is_lost_when_compacting_during_writes(tmp_path):
+    sink = ShardedFeatureSink()
+    writers, rows_per_writer = 4, 150
+    done = threading.Event()
+
+    def write(writer):
+        for i in range(rows_per_writer):
+            sink.write(str(tmp_path), features([writer * rows_per_writer + i], seed=i))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        threads = [threading.Thread(target=write, args=(writer,)) for writer in range(writers)]
+        for thread in threads:
+            thread.start()
+        compactions = 0
+        while any(thread.is_alive() for thread in threads) or compactions == 0:
+            sink.compact(str(tmp_path))
+            compactions += 1
+        for thread in threads:
+            thread.join()
+        sink.compact(str(tmp_path))
+
+    table = pd.read_parquet(tmp_path / "extracted_5_features.parquet")
+    assert sorted(table.index, key=int) == [str(i) for i in range(writers * rows_per_writer)]
+    assert glob.glob(str(tmp_path / "feature_shards" / "*")) + glob.glob(str(tmp_path / "feature_shards" / ".*")) == []
+
+def test_compact_aligns_rows_written_in_another_column_order(tmp_path):
+    sink = ShardedFeatureSink()
+    first = features(range(4), seed=0)
+    quiet(sink.write, str(tmp_path), first)
+    quiet(sink.compact, str(tmp_path))
+    second = features(range(3, 6), seed=1)
+    quiet(sink.write, str(tmp_path), second[second.columns[::-1]])
+
+    quiet(sink.compact, str(tmp_path))
+
+    table = pd.read_parquet(tmp_path / "extracted_5_features.parquet")
+    expected = pd.concat([first.drop(index="3"), second])
+    pd.testing.assert_frame_equal(table, expected, check_exact=True)
+
+def test_compact_refuses_rows_with_other_feature_names(tmp_path):
+    sink = ShardedFeatureSink()
+    quiet(sink.write, str(tmp_path), features(range(4), seed=0))
+    quiet(sink.compact, str(tmp_path))
+    table_before = pd.read_parquet(tmp_path / "extracted_5_features.parquet")
+    other = features(range(4, 6), seed=1).rename(columns={"f1": "g1"})
+    quiet(sink.write, str(tmp_path), other)
+
+    with pytest.raises(ValueError, match=r"missing columns \['f1'\], unexpected columns \['g1'\]"):
+        quiet(sink.compact, str(tmp_path))
+
+    # nothing merged and nothing lost
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "extracted_5_features.parquet"), table_before)
+    assert len(os.listdir(tmp_path / "feature_shards")) == 1
+
+def test_compact_refuses_shards_with_other_feature_names(tmp_path):
+    sink = ShardedFeatureSink()
+    quiet(sink.write, str(tmp_path), features(range(4), seed=0))
+    quiet(sink.write, str(tmp_path), features(range(4, 6), seed=1).rename(columns={"f4": "g4"}))
+
+    with pytest.raises(ValueError, match="extracted_5_features.parquet"):
+        quiet(sink.compact, str(tmp_path))
+
+    assert not (tmp_path / "extracted_5_features.parquet").exists()
+    assert len(os.listdir(tmp_path / "feature_shards")) == 2
+
+def test_csv_sink_aligns_columns_and_refuses_other_feature_names(tmp_path):
+    sink = CsvFeatureSink()
+    first = features(range(4), seed=0)
+    quiet(sink.write, str(tmp_path), first)
+    second = features(range(3, 6), seed=1)
+    quiet(sink.write, str(tmp_path), second[second.columns[::-1]])
+    csv_path = tmp_path / "extracted_5_features.csv"
+    expected = pd.concat([first.drop(index="3"), second])
+    table = pd.read_csv(csv_path, index_col="nsrrid", dtype={"nsrrid": str})
+    pd.testing.assert_frame_equal(table, expected, check_exact=False, rtol=1e-15)
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        sink.write(str(tmp_path), features([9], seed=2).rename(columns={"f0": "g0"}))
+
+    assert "missing columns ['f0'], unexpected columns ['g0']" in output.getvalue()
+    pd.testing.assert_frame_equal(pd.read_csv(csv_path, index_col="nsrrid", dtype={"nsrrid": str}), table)
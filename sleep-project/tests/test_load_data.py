@@ -0,0 +1,33 @@
+import mne
+import numpy as np
+from sleepdataspo2.load_data import PandasDataLoader
+
+from conftest import spo2_channel, write_edf
+
+def mne_channel(path, name):
+    raw = mne.io.read_raw_edf(path, preload=True, verbose="ERROR")
+    return raw.get_data(picks=[name])[0]
+
+def test_read_edf_channels_matches_mne_on_full_int16_range(full_range_edf):
+    df, sampling_frequency = PandasDataLoader().read_edf_channels(full_range_edf, ["SaO2"])
+
+    assert sampling_frequency == 1
+    np.testing.assert_allclose(df["SaO2"].to_numpy(), mne_channel(full_range_edf, "SaO2"), rtol=0, atol=1e-9)
+    assert df["SaO2"].between(70 - 1e-3, 100).all()
+
+def test_read_edf_channels_decodes_95_percent(tmp_path):
+    path = write_edf(tmp_path / "95.edf", [spo2_channel(np.full(60, 95.0))])
+
+    df, _ = PandasDataLoader().read_edf_channels(path, ["SaO2"])
+
+    np.testing.assert_allclose(df["SaO2"].to_numpy(), mne_channel(path, "SaO2"), rtol=0, atol=1e-9)
+    np.testing.assert_allclose(df["SaO2"].to_numpy(), 95.0, atol=1e-3)
+
+def test_iter_edf_channel_matches_mne_on_full_int16_range(full_range_edf):
+    expected = mne_channel(full_range_edf, "SaO2")
+
+    for block_size in (1, 7, 60, 3600):
+        blocks = list(PandasDataLoader().iter_edf_channel(full_range_edf, "SaO2", block_size=block_size))
+
+        assert [offset for offset, _ in blocks] == list(range(0, len(expected), block_size))
+        np.testing.assert_allclose(np.concatenate([block for _, block in blocks]), expected, rtol=0, atol=1e-9)
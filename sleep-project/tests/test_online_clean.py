@@ -0,0 +1,106 @@
+import tracemalloc
+import numpy as np
+import pytest
+from sleepdataspo2.clean_features import CleanSpO2
+from sleepdataspo2.load_data import PandasDataLoader
+from sleepdataspo2.online_clean import OnlineSpO2Cleaner
+from sleepdataspo2.prep_kernels import set_range, median_spo2, block_data, resamp_spo2
+from conftest import night_spo2
+
+HOURS = 60 * 60
+
+def offline(raw, frequency):
+    """The clean_single chain over the whole span, without its trim, length check and 7 h pad"""
+    cleaner = CleanSpO2()
+    signal = set_range(raw, Range_min=50, Range_max=100)
+    signal = cleaner.dfilter(signal, Diff=8)
+    signal = median_spo2(signal, FilterLength=9)
+    signal = block_data(signal, treshold=50)
+    signal = resamp_spo2(signal, OriginalFreq=frequency)
+    return cleaner.safe_nan_interp(signal)
+
+def stream(raw, frequency, n_chunks, **kwargs):
+    cleaner = OnlineSpO2Cleaner(original_frequency=frequency, skip_start=0, **kwargs)
+    return np.concatenate(list(cleaner.clean_blocks(np.array_split(raw, n_chunks))))
+
+@pytest.mark.parametrize("frequency", [1, 4])
+@pytest.mark.parametrize("n_chunks", [1, 7, 997])
+def test_chunking_does_not_change_the_output(frequency, n_chunks):
+    raw = night_spo2(2 * HOURS, frequency, seed=frequency, nan_fraction=0.01)
+    np.testing.assert_array_equal(stream(raw, frequency, n_chunks), stream(raw, frequency, 1))
+
+def test_clean_blocks_from_streamed_full_range_channel(full_range_edf):
+    loader = PandasDataLoader()
+    df, _ = loader.read_edf_channels(full_range_edf, ["SaO2"])
+    streamed = np.concatenate(list(OnlineSpO2Cleaner(original_frequency=1, skip_start=0).clean_blocks(
+        block for _, block in loader.iter_edf_channel(full_range_edf, "SaO2", block_size=37))))
+    whole = np.concatenate(list(OnlineSpO2Cleaner(original_frequency=1, skip_start=0).clean_blocks([df["SaO2"].to_numpy()])))
+
+    assert streamed.shape[0] > 0 and np.all((streamed >= 50) & (streamed <= 100))
+    np.testing.assert_allclose(streamed, whole)
+
+@pytest.mark.parametrize("frequency", [1, 4])
+def test_matches_offline_chain_when_no_block_is_removed(frequency):
+    # dips of at most 3 % can not bring a 100-sample block under 94 % of any mean,
+    # so only the range, delta, median, resampling and interpolation steps act
+    rng = np.random.default_rng(frequency)
+    raw = np.round(95 + np.cumsum(rng.normal(0, 0.05, 3 * HOURS * frequency)).clip(-2, 2))
+    raw[rng.integers(0, raw.shape[0], 50)] = rng.choice([0, 120, np.nan], 50)
+    raw[1000:1000 + 60 * frequency] = 0
+
+    expected = offline(raw, frequency)
+    assert not np.isnan(block_data(median_spo2(CleanSpO2().dfilter(set_range(raw), Diff=8)))).any()
+    np.testing.assert_allclose(stream(raw, frequency, 101, max_gap=10**9), expected, rtol=0, atol=1e-9)
+
+# Documented difference from the offline chain on real-looking nights: blocks are compared with
+# the running mean of the signal so far instead of the whole-night mean, so a block near the
+# 94 % threshold can be removed (and interpolated over) by one chain and kept by the other.
+# Everything else matches (see above); measured on these nights at most 12.3 % of the seconds
+# differ, moving the night's mean by at most 0.23 points.
+MAX_DIFFERENT_SECONDS = 0.15
+MAX_MEAN_DIFFERENCE = 0.5
+
+@pytest.mark.parametrize("frequency", [1, 4])
+@pytest.mark.parametrize("seed", range(4))
+def test_stays_close_to_offline_chain(frequency, seed):
+    raw = night_spo2(6 * HOURS, frequency, seed=seed, nan_fraction=0.01)
+
+    expected = offline(raw, frequency)
+    result = stream(raw, frequency, 97, max_gap=10**9)
+
+    assert result.shape == expected.shape
+    different = result != expected
+    assert different.mean() <= MAX_DIFFERENT_SECONDS
+    assert abs(result.mean() - expected.mean()) <= MAX_MEAN_DIFFERENCE
+    assert np.all((result >= 50) & (result <= 100))
+
+def steady_signal(seconds, frequency):
+    # no artifacts, so every input second comes out as one cleaned second
+    rng = np.random.default_rng(0)
+    return np.round(95 + np.cumsum(rng.normal(0, 0.05, seconds * frequency)).clip(-1, 2))
+
+def test_release_delay_and_memory_stay_bounded_over_many_pushes():
+    frequency = 4
+    raw = steady_signal(2 * HOURS, frequency)
+    cleaner = OnlineSpO2Cleaner(original_frequency=frequency, skip_start=0)
+    n_pushes = raw.shape[0] // frequency
+    delay = np.zeros(n_pushes, dtype=np.int64)
+    traced = np.zeros(n_pushes // 1000, dtype=np.int64)
+
+    tracemalloc.start()
+    try:
+        released = 0
+        for k in range(n_pushes):
+            released += cleaner.push(raw[k*frequency:(k + 1)*frequency]).shape[0]
+            delay[k] = k + 1 - released
+            if k % 1000 == 999:
+                traced[k // 1000] = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    # about 114 + original_frequency samples are held back (median, block look-ahead, current block, second)
+    assert delay.max() <= (114 + frequency) // frequency + 1
+    # the state does not grow with the length of the stream
+    assert traced.max() < 256 * 1024
+    assert traced[-1] <= traced[0] + 64 * 1024
+    assert released + cleaner.flush().shape[0] == 2 * HOURS
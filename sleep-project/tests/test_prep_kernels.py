@@ -0,0 +1,97 @@
+import time
+import numpy as np
+import pytest
+from hypothesis import given, settings, strategies as st
+from hypothesis.extra.numpy import arrays
+import pobm.prep
+from sleepdataspo2 import prep_kernels
+
+# pobm warns on the degenerate inputs generated below (all-NaN means, filters longer than the signal)
+pytestmark = [
+    pytest.mark.filterwarnings("ignore::RuntimeWarning"),
+    pytest.mark.filterwarnings("ignore:kernel_size exceeds volume extent:UserWarning"),
+]
+
+def assert_same(result, expected):
+    expected = np.asarray(expected)
+    assert result.dtype == expected.dtype
+    np.testing.assert_array_equal(result, expected)
+
+def raw_spo2(seed, n, nan_fraction=0.0):
+    # integer-valued SpO2 with out-of-range samples, dropouts and low blocks
+    rng = np.random.default_rng(seed)
+    signal = np.round(95 + np.cumsum(rng.normal(0, 0.4, n))).clip(30, 110)
+    for start in rng.integers(0, max(n, 1), 1 + n // 500):
+        signal[start:start + rng.integers(1, 150)] = rng.choice([0, 45, 80])
+    signal[rng.random(n) < nan_fraction] = np.nan
+    return signal
+
+spo2_values = st.one_of(st.integers(0, 127).map(float), st.floats(0, 127, width=64), st.just(np.nan))
+
+@settings(max_examples=100, deadline=None)
+@given(signal=arrays(np.float64, st.integers(0, 400), elements=spo2_values))
+def test_set_range_matches_pobm(signal):
+    assert_same(prep_kernels.set_range(signal), pobm.prep.set_range(signal))
+
+@settings(max_examples=100, deadline=None)
+@given(signal=arrays(np.int64, st.integers(1, 400), elements=st.integers(0, 127)))
+def test_set_range_matches_pobm_on_integers(signal):
+    assert_same(prep_kernels.set_range(signal), pobm.prep.set_range(signal))
+
+@settings(max_examples=100, deadline=None)
+@given(signal=arrays(np.float64, st.integers(1, 400), elements=st.floats(0, 127, width=64)),
+       FilterLength=st.sampled_from([3, 9, 31]))
+def test_median_spo2_matches_pobm(signal, FilterLength):
+    # the cleaner runs it after the delta filter, which drops NaNs
+    assert_same(prep_kernels.median_spo2(signal, FilterLength), pobm.prep.median_spo2(signal, FilterLength))
+
+@settings(max_examples=100, deadline=None)
+@given(signal=arrays(np.float64, st.integers(0, 1200), elements=spo2_values), treshold=st.sampled_from([50, 90]))
+def test_block_data_matches_pobm(signal, treshold):
+    assert_same(prep_kernels.block_data(signal, treshold), pobm.prep.block_data(signal, treshold))
+
+@pytest.mark.parametrize("seed", range(20))
+def test_block_data_matches_pobm_on_long_signals(seed):
+    signal = raw_spo2(seed, 3000 + 37 * seed, nan_fraction=0.01 * (seed % 3))
+    assert_same(prep_kernels.block_data(signal), pobm.prep.block_data(signal))
+
+@settings(max_examples=100, deadline=None)
+@given(signal=arrays(np.float64, st.integers(0, 400), elements=spo2_values), OriginalFreq=st.sampled_from([1, 3, 8, 25, 32]))
+def test_resamp_spo2_matches_pobm(signal, OriginalFreq):
+    assert_same(prep_kernels.resamp_spo2(signal, OriginalFreq), pobm.prep.resamp_spo2(signal, OriginalFreq))
+
+@pytest.mark.parametrize("OriginalFreq", [1, 3, 8, 25, 32])
+def test_cleaning_chain_matches_pobm(OriginalFreq):
+    # the stages in clean_single order, the delta filter in between dropping NaNs
+    signal = raw_spo2(OriginalFreq, 2 * 3600 * OriginalFreq + 5)
+    ours = prep_kernels.set_range(signal)
+    theirs = pobm.prep.set_range(signal)
+    assert_same(ours, theirs)
+    ours = theirs = ours[~np.isnan(ours)]
+    for kernel, reference, args in [
+        (prep_kernels.median_spo2, pobm.prep.median_spo2, (9,)),
+        (prep_kernels.block_data, pobm.prep.block_data, (50,)),
+        (prep_kernels.resamp_spo2, pobm.prep.resamp_spo2, (OriginalFreq,)),
+    ]:
+        ours, theirs = kernel(ours, *args), reference(theirs, *args)
+        assert_same(ours, theirs)
+
+def best_of(repeat, func, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+@pytest.mark.parametrize("name, args", [
+    ("set_range", ()),
+    ("block_data", ()),
+    ("resamp_spo2", (32,)),
+])
+def test_kernels_are_faster_than_pobm(name, args):
+    # 1 h at 32 Hz; the margins measured are 20x or more, 3x leaves room for noisy machines
+    signal = raw_spo2(0, 3600 * 32)
+    ours = best_of(3, getattr(prep_kernels, name), signal, *args)
+    theirs = best_of(1, getattr(pobm.prep, name), signal, *args)
+    assert ours * 3 < theirs, f"{name}: {ours:.4f}s vs pobm {theirs:.4f}s"
@@ -0,0 +1,92 @@
+import os
+import pytest
+from sleepdataspo2.run_pipeline_modified import Run
+
+def stage_edf(scratch, file_name="shhs1-200001"):
+    path = scratch / "shhs" / "edfs"
+    os.makedirs(path, exist_ok=True)
+    (path / f"{file_name}.edf").write_bytes(b"0" * 256)
+    return path / f"{file_name}.edf"
+
+def test_run_all_steps_removes_staged_edf_when_cleaning_raises(tmp_path, monkeypatch):
+    edf = stage_edf(tmp_path / "scratch")
+    run = Run(scratch_to=str(tmp_path / "scratch"))
+    def clean_signal(**kwargs):
+        raise KeyError("No known SpO2 channel found")
+    monkeypatch.setattr(run, "clean_signal", clean_signal)
+
+    with pytest.raises(KeyError):
+        run.run_all_steps(dataset="shhs", file_name="shhs1-200001", token="token", download_from="edfs",
+                          download_to=str(tmp_path / "data"), spo2_channel_name="SaO2", complex_features=False)
+
+    assert not edf.exists()
+
+def test_run_all_steps_keeps_downloaded_edf_when_cleaning_raises_without_scratch(tmp_path, monkeypatch):
+    edf = stage_edf(tmp_path / "data")
+    run = Run()
+    def clean_signal(**kwargs):
+        raise KeyError("No known SpO2 channel found")
+    monkeypatch.setattr(run, "clean_signal", clean_signal)
+
+    with pytest.raises(KeyError):
+        run.run_all_steps(dataset="shhs", file_name="shhs1-200001", token="token", download_from="edfs",
+                          download_to=str(tmp_path / "data"), spo2_channel_name="SaO2", complex_features=False)
+
+    # the user's only copy stays for a retry
+    assert edf.exists()
+
+def test_run_all_steps_staged_removes_staged_edf_when_cleaning_raises(tmp_path, monkeypatch):
+    good = stage_edf(tmp_path / "scratch", "shhs1-200001")
+    bad = stage_edf(tmp_path / "scratch", "shhs1-200002")
+    run = Run(scratch_to=str(tmp_path / "scratch"))
+    def clean_signal(file_name, **kwargs):
+        if file_name == "shhs1-200002.edf":
+            raise KeyError("No known SpO2 channel found")
+        return file_name
+    engineered = []
+    monkeypatch.setattr(run, "clean_signal", clean_signal)
+    monkeypatch.setattr(run, "engineer_features", lambda file_name, **kwargs: engineered.append(file_name))
+
+    run.run_all_steps_staged(dataset="shhs", file_names=["shhs1-200001", "shhs1-200002"], token="token", download_from="edfs",
+                             download_to=str(tmp_path / "data"), spo2_channel_name="SaO2", io_threads=1, cpu_threads=2,
+                             complex_features=False)
+
+    assert not good.exists() and not bad.exists()
+    assert engineered == ["shhs1-200001"]
+
+def test_run_all_steps_staged_keeps_downloaded_edf_when_cleaning_raises_without_scratch(tmp_path, monkeypatch):
+    good = stage_edf(tmp_path / "data", "shhs1-200001")
+    bad = stage_edf(tmp_path / "data", "shhs1-200002")
+    run = Run()
+    def clean_signal(file_name, **kwargs):
+        if file_name == "shhs1-200002.edf":
+            raise KeyError("No known SpO2 channel found")
+        return file_name
+    monkeypatch.setattr(run, "clean_signal", clean_signal)
+    monkeypatch.setattr(run, "engineer_features", lambda file_name, **kwargs: None)
+
+    run.run_all_steps_staged(dataset="shhs", file_names=["shhs1-200001", "shhs1-200002"], token="token", download_from="edfs",
+                             download_to=str(tmp_path / "data"), spo2_channel_name="SaO2", io_threads=1, cpu_threads=2,
+                             complex_features=False)
+
+    assert not good.exists() and bad.exists()
+
+def test_run_cleaner_parallel_with_cache_skips_flushed_recordings(tmp_path, monkeypatch):
+    from sleepdataspo2.cleaned_cache import CleanedCache, DiskCleanedCache
+    path = tmp_path / "data" / "shhs" / "edfs"
+    os.makedirs(path)
+    # cleaned and flushed: only the parquet is left
+    (path / "shhs1-200001_cleaned.parquet").write_bytes(b"")
+    # cleaned, EDF still there: the cache decides whether it is up to date
+    (path / "shhs1-200002_cleaned.parquet").write_bytes(b"")
+    stage_edf(tmp_path / "data", "shhs1-200002")
+    # not cleaned yet
+    stage_edf(tmp_path / "data", "shhs1-200003")
+    run = Run(cleaned_cache=CleanedCache(DiskCleanedCache(str(tmp_path / "cache"))))
+    cleaned = []
+    monkeypatch.setattr(run, "clean_signal", lambda dataset, download_from, download_to, file_name, *args: cleaned.append(file_name))
+
+    run.run_cleaner_parallel(dataset="shhs", file_names=["shhs1-200001", "shhs1-200002", "shhs1-200003"], download_from="edfs",
+                             download_to=str(tmp_path / "data"), spo2_channel_name="SaO2", max_threads=2)
+
+    assert sorted(cleaned) == ["shhs1-200002.edf", "shhs1-200003.edf"]